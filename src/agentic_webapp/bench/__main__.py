@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite: graph overhead, SSE rendering and /chatstream latency, offline.
+
+Writes the results as JSON and compares them against the stored baseline,
+exiting with status 1 when a metric regressed by more than the tolerance.
+
+    python -m agentic_webapp.bench --output data/bench.json
+    python -m agentic_webapp.bench --save-baseline
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from agentic_webapp.bench import chatstream_latency, graph_overhead, sse_render
+from agentic_webapp.bench.results import BASELINE_PATH, BenchmarkResults
+
+
+SUITES = ("graph", "sse", "chatstream")
+
+
+def run_suites(suites, quick: bool) -> BenchmarkResults:
+    results = BenchmarkResults()
+    if "graph" in suites:
+        asyncio.run(graph_overhead.run(results, turns=50 if quick else 200))
+    if "sse" in suites:
+        sse_render.run(results, number=2_000 if quick else 20_000)
+    if "chatstream" in suites:
+        asyncio.run(
+            chatstream_latency.run(
+                results, clients=10 if quick else 20, rounds=2 if quick else 5
+            )
+        )
+    return results
+
+
+def main(args) -> int:
+    results = run_suites(args.suite or SUITES, args.quick)
+    if args.output:
+        results.save(args.output)
+    if args.save_baseline:
+        results.save(args.baseline)
+        results.print_report()
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    baseline = BenchmarkResults.load(args.baseline) if args.baseline.exists() else None
+    results.print_report(baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}, nothing to compare")
+        return 0
+    regressions = results.compare(baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--suite", action="append", choices=SUITES)
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction a metric may be worse than the baseline",
+    )
+    sys.exit(main(parser.parse_args()))
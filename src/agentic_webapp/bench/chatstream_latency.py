@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: /chatstream TTFB, total latency and memory under concurrent clients.
+
+Serves the weather webapp with uvicorn in process, against the mock LLM and the
+weather stub, and opens N SSE streams at once, each with its own prompt. Memory
+per stream is the traced peak over the idle baseline while the N streams run,
+divided by N. The coalesced rounds send the same prompt on every stream, so
+they share one generation.
+
+    python -m agentic_webapp.bench.chatstream_latency --clients 20 --rounds 5
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from typing import List, Tuple
+
+import httpx
+import uvicorn
+
+from agentic_webapp.bench.results import BenchmarkResults, offline, quiet, summarize
+
+
+PROMPT = "What's the weather like in Abidjan?"
+
+
+async def start_server(app) -> Tuple[uvicorn.Server, asyncio.Task, str]:
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    return server, task, f"http://{host}:{port}"
+
+
+async def stream_chat(client: httpx.AsyncClient, prompt: str) -> Tuple[float, float]:
+    started = time.perf_counter()
+    ttfb = None
+    async with client.stream("GET", "/chatstream", params=dict(prompt=prompt)) as r:
+        async for chunk in r.aiter_raw():
+            if ttfb is None and chunk:
+                ttfb = time.perf_counter() - started
+            if b"event: Terminate" in chunk:
+                break
+    return ttfb, time.perf_counter() - started
+
+
+async def run_round(
+    base_url: str, clients: int, coalesced: bool = False
+) -> List[Tuple[float, float]]:
+    # One client per stream, so each gets its own session and thread.
+    limits = httpx.Limits(max_connections=clients)
+    connections = [
+        httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits)
+        for _ in range(clients)
+    ]
+    prompts = [PROMPT if coalesced else f"{PROMPT} ({i})" for i in range(clients)]
+    try:
+        return await asyncio.gather(
+            *(stream_chat(c, p) for c, p in zip(connections, prompts))
+        )
+    finally:
+        await asyncio.gather(*(c.aclose() for c in connections))
+
+
+async def run(results: BenchmarkResults, clients: int = 20, rounds: int = 5):
+    offline()
+    from agentic_webapp.webapp import app
+
+    with quiet():
+        server, task, base_url = await start_server(app)
+        try:
+            await run_round(base_url, 2)
+            timings, coalesced = [], []
+            for _ in range(rounds):
+                timings += await run_round(base_url, clients)
+                coalesced += await run_round(base_url, clients, coalesced=True)
+            tracemalloc.start()
+            try:
+                idle, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                await run_round(base_url, clients)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            server.should_exit = True
+            await task
+    summarize(results, "chatstream.ttfb", [t * 1000 for t, _ in timings], "ms")
+    summarize(results, "chatstream.total", [t * 1000 for _, t in timings], "ms")
+    summarize(
+        results, "chatstream.coalesced.total", [t * 1000 for _, t in coalesced], "ms"
+    )
+    results.add("chatstream.memory_per_stream", (peak - idle) / clients / 1024, "KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    results = BenchmarkResults()
+    asyncio.run(run(results, args.clients, args.rounds))
+    results.print_report()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Load test: N concurrent weather chat streams on a single event loop.
+
+Compares the blocking path (iterating the sync graph stream inside an async
+generator, as `/chatstream` used to) against `Agent.astream`. The LLM and the
+weather tool are replaced by fakes with fixed latencies, so no network or API
+credits are needed.
+
+    python -m agentic_webapp.bench.concurrent_streams --clients 20
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import StructuredTool
+
+from agentic_webapp.dmbr.agent import Agent
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.mock_llm import MockChatModel
+
+
+def slow_weather_prediction_tool(latency: float) -> StructuredTool:
+    def weather_prediction(city: str) -> Any:
+        """
+        Weather Prediction: Get the prediction for the weather
+        """
+        time.sleep(latency)
+        return dict(city=city, weather="sunny")
+
+    async def aweather_prediction(city: str) -> Any:
+        """
+        Weather Prediction: Get the prediction for the weather
+        """
+        await asyncio.sleep(latency)
+        return dict(city=city, weather="sunny")
+
+    return StructuredTool.from_function(
+        func=weather_prediction,
+        coroutine=aweather_prediction,
+        name="weather_prediction",
+    )
+
+
+def build_agent(llm_latency: float, tool_latency: float) -> Agent:
+    # The graph is built against a real model, then the bound LLM is swapped for
+    # the fake one; the key only has to satisfy the client constructor.
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    # The fake models are not rate limited like the real ones.
+    os.environ.setdefault("RATE_LIMITS", "none")
+    agent = Agent(
+        "weather_predictor",
+        LLMModel.GPT4_Omni,
+        "As a Weather Service Agent, I can provide weather information to users.",
+        [slow_weather_prediction_tool(tool_latency)],
+    )
+    # Calls weather_prediction, then answers; replies arrive whole after latency.
+    agent.llm = MockChatModel(latency=llm_latency, tokens_per_second=0).bind_tools(
+        list(agent.tools.values())
+    )
+    return agent
+
+
+async def blocking_stream(agent: Agent, prompt: str):
+    for event in agent(HumanMessage(content=prompt), stream=True):
+        yield event
+
+
+async def async_stream(agent: Agent, prompt: str):
+    async for event in agent.astream(HumanMessage(content=prompt)):
+        yield event
+
+
+async def run_client(stream, agent: Agent, started: float) -> float:
+    ttfb = None
+    async for _ in stream(agent, "What's the weather like in Abidjan?"):
+        if ttfb is None:
+            ttfb = time.perf_counter() - started
+    return ttfb
+
+
+async def run_load(stream, agent: Agent, clients: int) -> dict:
+    started = time.perf_counter()
+    ttfbs = await asyncio.gather(
+        *(run_client(stream, agent, started) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+    return dict(
+        clients=clients,
+        elapsed=elapsed,
+        streams_per_second=clients / elapsed,
+        mean_ttfb=sum(ttfbs) / len(ttfbs),
+        max_ttfb=max(ttfbs),
+    )
+
+
+def print_report(label: str, report: dict):
+    print(
+        f"{label:>10}: {report['clients']} streams in {report['elapsed']:.2f}s "
+        f"({report['streams_per_second']:.2f} streams/s, "
+        f"mean TTFB {report['mean_ttfb']:.2f}s, max TTFB {report['max_ttfb']:.2f}s)"
+    )
+
+
+async def main(clients: int, llm_latency: float, tool_latency: float):
+    agent = build_agent(llm_latency, tool_latency)
+    print_report("blocking", await run_load(blocking_stream, agent, clients))
+    print_report("astream", await run_load(async_stream, agent, clients))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.llm_latency, args.tool_latency))
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Benchmark: weather director turn latency, per-call agents vs the agent registry.
+
+"per-call" is how weather_big_team used to delegate: tools that build a new
+predictor/describer Agent (StateGraph compile, tool binding, structured output
+runnable) on every call. "registry" is the director built by get_agent, whose
+delegates are sub-graph nodes compiled once. The LLMs are replaced by scripted
+fakes, so the difference is the construction overhead alone.
+
+    python -m agentic_webapp.bench.director_latency --turns 50
+"""
+
+import argparse
+import os
+import statistics
+import time
+from typing import List
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import tool
+
+from agentic_webapp.dmbr.agent import Agent
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.mock_llm import MockChatModel
+from agentic_webapp.dmbr.supervisor import delegate_result
+
+PREDICTION = {
+    "List of Weather Predictions": [
+        {
+            "city": "Abidjan",
+            "country": "CI",
+            "predictions": [
+                {
+                    "humidity": 78,
+                    "temperature": 301.1,
+                    "description": "broken clouds",
+                    "icon url": "https://openweathermap.org/img/wn/04d@2x.png",
+                }
+            ],
+        }
+    ]
+}
+
+DESCRIPTION = {
+    "city": "Abidjan",
+    "country": "CI",
+    "descriptions": [
+        {
+            "highly detailed": "A warm and humid day under broken clouds.",
+            "concise": "Warm, humid and cloudy.",
+            "terse": "Cloudy",
+            "large image url": "https://openweathermap.org/img/wn/04d@4x.png",
+            "small image url": "https://openweathermap.org/img/wn/04d@2x.png",
+        }
+    ],
+}
+
+
+def scripted(latency: float, *script: tuple) -> MockChatModel:
+    return MockChatModel(script=list(script), latency=latency, tokens_per_second=0)
+
+
+def predictor_llm(latency: float) -> MockChatModel:
+    return scripted(latency, ("MultiLocationWeatherPrediction", PREDICTION))
+
+
+def describer_llm(latency: float) -> MockChatModel:
+    return scripted(latency, ("WeatherPredictionDescriptions", DESCRIPTION))
+
+
+def director_llm(latency: float, predict: str, describe: str) -> MockChatModel:
+    return scripted(
+        latency,
+        (predict, dict(task="Predict the weather in Abidjan")),
+        (describe, dict(task="Describe the weather in Abidjan")),
+    )
+
+
+def per_call_director(latency: float) -> Agent:
+    from agentic_webapp.dmbr.weather_big_team import (
+        weather_describer,
+        weather_predictor,
+    )
+
+    @tool("predict_weather")
+    def predict_weather(task: str) -> str:
+        """
+        Weather Prediction: Get the prediction for the weather
+        """
+        agent = weather_predictor()
+        agent.llm = predictor_llm(latency)
+        return delegate_result(agent(HumanMessage(content=task)))
+
+    @tool("describe_weather")
+    def describe_weather(task: str) -> str:
+        """
+        Weather Description: Describe the weather from the provided prediction data
+        """
+        agent = weather_describer()
+        agent.llm = describer_llm(latency)
+        return delegate_result(agent(HumanMessage(content=task)))
+
+    director = Agent(
+        "weather_director",
+        LLMModel.GPT4_Omni,
+        tools=[predict_weather, describe_weather],
+    )
+    director.llm = director_llm(latency, "predict_weather", "describe_weather")
+    return director
+
+
+def registry_director(latency: float) -> Agent:
+    from agentic_webapp.dmbr.registry import get_agent
+    import agentic_webapp.dmbr.weather_big_team  # noqa: F401, registers the team
+
+    director = get_agent("weather_director")
+    director.llm = director_llm(latency, "weather_predictor", "weather_describer")
+    director.delegates["weather_predictor"].agent.llm = predictor_llm(latency)
+    director.delegates["weather_describer"].agent.llm = describer_llm(latency)
+    return director
+
+
+def run_turns(director: Agent, turns: int) -> List[float]:
+    latencies = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        result = director(HumanMessage(content="What's the weather like in Abidjan?"))
+        latencies.append(time.perf_counter() - started)
+        assert result["messages"][-1].content, "the director did not answer"
+    return latencies
+
+
+def print_report(label: str, latencies: List[float]):
+    print(
+        f"{label:>10}: {len(latencies)} turns, "
+        f"mean {statistics.mean(latencies) * 1000:.1f}ms, "
+        f"median {statistics.median(latencies) * 1000:.1f}ms, "
+        f"max {max(latencies) * 1000:.1f}ms"
+    )
+
+
+def main(turns: int, llm_latency: float):
+    # The agents are built against a real model, then the LLM is swapped for the
+    # scripted one; the key only has to satisfy the client constructor.
+    os.environ.setdefault("OPENAI_API_KEY", "sk-load-test")
+    # The fake models are not rate limited like the real ones.
+    os.environ.setdefault("RATE_LIMITS", "none")
+    print_report("per-call", run_turns(per_call_director(llm_latency), turns))
+    print_report("registry", run_turns(registry_director(llm_latency), turns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    main(args.turns, args.llm_latency)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-node overhead of an Agent graph with a zero-latency model.
+
+Runs the weather predictor (llm -> action -> llm -> respond) against the
+mock-instant LLM and the weather stub, timing every node through a callback
+handler; "framework" is the turn time not spent inside any node.
+
+    python -m agentic_webapp.bench.graph_overhead --turns 200
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from agentic_webapp.bench.results import BenchmarkResults, offline, quiet, summarize
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Node Timer: Wall time of each graph node run, by node name
+    """
+
+    # Called on the event loop rather than in an executor, to not add overhead.
+    run_inline = True
+
+    def __init__(self):
+        self.started: Dict[UUID, tuple] = {}
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, tags=None, **kwargs):
+        # Node runs are the ones LangGraph tags with their superstep.
+        if any(tag.startswith("graph:step:") for tag in tags or []):
+            self.started[run_id] = (kwargs.get("name"), time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.started:
+            name, started = self.started.pop(run_id)
+            self.timings[name].append(time.perf_counter() - started)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.started.pop(run_id, None)
+
+
+def build_agent():
+    from agentic_webapp.dmbr.agent import Agent
+    from agentic_webapp.dmbr.llm import LLMModel
+    from agentic_webapp.dmbr.tools import weather_icon, weather_prediction
+    from agentic_webapp.dmbr.weather_team import MultiLocationWeatherPrediction
+
+    return Agent(
+        "weather_predictor",
+        LLMModel.GPT4_Omni,
+        "As a Weather Service Agent, I can provide weather information to users.",
+        [weather_icon, weather_prediction],
+        output_structure=MultiLocationWeatherPrediction,
+    )
+
+
+async def run(results: BenchmarkResults, turns: int = 200, warmup: int = 10):
+    offline()
+    agent = build_agent()
+    timer = NodeTimer()
+    turn_times = []
+    with quiet():
+        for turn in range(warmup + turns):
+            if turn == warmup:
+                timer.timings.clear()
+            started = time.perf_counter()
+            await agent.graph.ainvoke(
+                dict(messages=[HumanMessage(content="Weather in Abidjan?")]),
+                dict(callbacks=[timer]),
+            )
+            if turn >= warmup:
+                turn_times.append(time.perf_counter() - started)
+    us = [t * 1e6 for t in turn_times]
+    summarize(results, "graph.turn", us, "us")
+    node_total = 0.0
+    for name, timings in sorted(timer.timings.items()):
+        node_total += sum(timings)
+        summarize(results, f"graph.node.{name}", [t * 1e6 for t in timings], "us")
+    framework = (sum(turn_times) - node_total) / len(turn_times)
+    results.add("graph.framework.mean", framework * 1e6, "us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+    results = BenchmarkResults()
+    asyncio.run(run(results, args.turns))
+    results.print_report()
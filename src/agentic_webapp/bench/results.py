@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from agentic_webapp.dmbr.term import logger
+
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+
+class BenchmarkResults:
+    """
+    Benchmark Results: Named measurements, saved as JSON and compared against a
+    baseline run of the same suites
+    """
+
+    def __init__(self, metrics: Optional[Dict[str, dict]] = None, meta: dict = None):
+        self.metrics = metrics or {}
+        self.meta = meta or dict(
+            python=platform.python_version(),
+            platform=platform.platform(),
+            created=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        )
+
+    def add(self, name: str, value: float, unit: str, better: str = "lower"):
+        self.metrics[name] = dict(value=value, unit=unit, better=better)
+
+    def to_dict(self) -> dict:
+        return dict(meta=self.meta, metrics=self.metrics)
+
+    def save(self, path: Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    @classmethod
+    def load(cls, path: Path) -> "BenchmarkResults":
+        data = json.loads(Path(path).read_text())
+        return cls(data["metrics"], data["meta"])
+
+    def compare(self, baseline: "BenchmarkResults", tolerance: float) -> List[str]:
+        """
+        Regressions: Metrics worse than the baseline by more than tolerance
+        (a fraction); metrics missing from either run are not compared
+        """
+        regressions = []
+        for name, metric in self.metrics.items():
+            base = baseline.metrics.get(name)
+            if base is None or not base["value"]:
+                continue
+            change = (metric["value"] - base["value"]) / base["value"]
+            if metric["better"] == "higher":
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{name}: {metric['value']:.4g}{metric['unit']} vs baseline "
+                    f"{base['value']:.4g}{base['unit']} ({change:+.0%})"
+                )
+        return regressions
+
+    def print_report(self, baseline: Optional["BenchmarkResults"] = None):
+        for name, metric in self.metrics.items():
+            line = f"{name:>40}: {metric['value']:14.2f} {metric['unit']}"
+            base = baseline.metrics.get(name) if baseline else None
+            if base and base["value"]:
+                change = (metric["value"] - base["value"]) / base["value"]
+                line += f"  ({change:+.1%} vs baseline)"
+            print(line)
+
+
+def summarize(results: BenchmarkResults, prefix: str, samples: List[float], unit: str):
+    """
+    Summarize: Mean, median and p95 of the samples
+    """
+    ordered = sorted(samples)
+    results.add(f"{prefix}.mean", statistics.mean(ordered), unit)
+    results.add(f"{prefix}.median", statistics.median(ordered), unit)
+    results.add(f"{prefix}.p95", ordered[int(0.95 * (len(ordered) - 1))], unit)
+
+
+@contextmanager
+def quiet():
+    # Measure with the production log level, and keep the report readable.
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(level)
+
+
+def offline():
+    """
+    Offline: Point every model at the mock LLM and the weather and dog clients at
+    their stubs, unless the caller configured them already; call before importing
+    the apps
+    """
+    os.environ.setdefault("LLM_OVERRIDE", "mock-instant")
+    # The stubs have no rate limits; calls still go through the scheduler.
+    os.environ.setdefault("RATE_LIMITS", "none")
+    os.environ.setdefault("OPENWEATHERMAP_MOCK", "1")
+    os.environ.setdefault("OPENWEATHERMAP_MOCK_LATENCY", "0")
+    os.environ.setdefault("DOG_CEO_MOCK", "1")
+    os.environ.setdefault("DOG_CEO_MOCK_LATENCY", "0")
+    if "agentic_webapp.dmbr.llm" in sys.modules:
+        sys.modules["agentic_webapp.dmbr.llm"].get_llm.cache_clear()
+    if "agentic_webapp.dmbr.scheduler" in sys.modules:
+        sys.modules["agentic_webapp.dmbr.scheduler"].get_scheduler.cache_clear()
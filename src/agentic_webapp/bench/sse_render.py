@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: SSE frame encoding throughput of the weather webapp.
+
+Encodes the kinds of frames /chatstream sends (a streamed token, a status
+update, the terminate event, the weather cards of a two-city answer) with the
+shared encoder of agentic_webapp.sse, and with the per-frame f-string renderer
+the apps used before it, for comparison.
+
+    python -m agentic_webapp.bench.sse_render --number 20000
+"""
+
+import argparse
+import timeit
+
+from agentic_webapp.bench.results import BenchmarkResults, offline
+
+
+def legacy_render_sse_html_chunk(event: str, id: str, chunk, hx_swap_oob="true"):
+    # The renderer the apps had before agentic_webapp.sse, as the reference.
+    from fasthtml import Div
+    from fasthtml.common import to_xml
+
+    html = to_xml(Div(chunk, id=id, hx_swap_oob=hx_swap_oob))
+    data = "".join(f"data: {line}\n" for line in html.splitlines())
+    return f"event: {event}\n{data}\n".encode("utf-8")
+
+
+def weather_answer():
+    from agentic_webapp.dmbr.weather_team import MultiLocationWeatherPrediction
+
+    prediction = dict(
+        humidity=78,
+        temperature=301.1,
+        description="broken clouds",
+        icon_url="https://openweathermap.org/img/wn/04d@2x.png",
+    )
+    return MultiLocationWeatherPrediction(
+        predictions_list=[
+            dict(city="Abidjan", country="CI", predictions=[prediction]),
+            dict(city="Paris", country="FR", predictions=[prediction]),
+        ]
+    )
+
+
+def run(results: BenchmarkResults, number: int = 20_000):
+    offline()
+    from agentic_webapp.sse import html_frame, static_html_frame
+    from agentic_webapp.webapp import weather_cards
+
+    answer = weather_answer()
+    frames = dict(
+        token=(
+            lambda: html_frame("Token", "Token", "Abidjan ", hx_swap_oob="beforeend"),
+            lambda: legacy_render_sse_html_chunk(
+                "Token", "Token", "Abidjan ", hx_swap_oob="beforeend"
+            ),
+        ),
+        status=(
+            lambda: static_html_frame("Status", "Status", "Sending..."),
+            lambda: legacy_render_sse_html_chunk("Status", "Status", "Sending..."),
+        ),
+        terminate=(
+            lambda: static_html_frame("Terminate", "Terminate", ""),
+            lambda: legacy_render_sse_html_chunk("Terminate", "Terminate", ""),
+        ),
+        cards=(
+            lambda: html_frame(
+                "Chat", "Chat", weather_cards(answer), hx_swap_oob="beforeend"
+            ),
+            lambda: legacy_render_sse_html_chunk(
+                "Chat", "Chat", weather_cards(answer), hx_swap_oob="beforeend"
+            ),
+        ),
+    )
+    for name, (render, legacy) in frames.items():
+        if render() != legacy():
+            raise AssertionError(f"{name} frames differ from the legacy renderer")
+        # Cards build a component tree per frame, so they get fewer iterations.
+        n = number if name != "cards" else max(1, number // 10)
+        best = min(timeit.repeat(render, number=n, repeat=3)) / n
+        legacy_best = min(timeit.repeat(legacy, number=n, repeat=3)) / n
+        results.add(f"sse.render.{name}.per_chunk", best * 1e6, "us")
+        results.add(f"sse.render.{name}.throughput", 1 / best, "chunks/s", "higher")
+        results.add(f"sse.render.{name}.legacy_per_chunk", legacy_best * 1e6, "us")
+        results.add(f"sse.render.{name}.speedup", legacy_best / best, "x", "higher")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+    results = BenchmarkResults()
+    run(results, args.number)
+    results.print_report()
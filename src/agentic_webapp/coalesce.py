@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import asyncio
+import re
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+)
+
+from agentic_webapp.dmbr.term import print_debug_msg
+from agentic_webapp.dmbr.tracing import current_span
+
+
+_current_broadcast: ContextVar[Optional["Broadcast"]] = ContextVar(
+    "current_broadcast", default=None
+)
+
+
+def prompt_key(prompt: str) -> str:
+    """
+    Prompt Key: The prompt with case, punctuation and spacing evened out, so
+    retyped copies of the same question match
+    """
+    return " ".join(re.sub(r"[^\w\s']", " ", prompt.casefold()).split())
+
+
+class Broadcast:
+    """
+    Broadcast: The frames of one running generation, kept for late joiners
+    """
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.frames: List[bytes] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        # What the generation answered, for the subscribers that joined it
+        self.result: Any = None
+        self.subscribers = 0
+        self.producer: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        # Wakes the subscribers waiting now; later waits take the new event.
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def produce(self, frames: AsyncIterator[bytes]):
+        try:
+            async for frame in frames:
+                self.frames.append(frame)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            if hasattr(frames, "aclose"):
+                await frames.aclose()
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.frames):
+                yield self.frames[sent]
+                sent += 1
+            if self.done:
+                break
+            await changed.wait()
+        if self.error is not None:
+            raise self.error
+
+
+def publish_result(result: Any):
+    """
+    Publish Result: Called while generating frames, hands what was answered to the
+    requests that joined the generation
+    """
+    broadcast = _current_broadcast.get()
+    if broadcast is not None:
+        broadcast.result = result
+
+
+class StreamCoalescer:
+    """
+    Stream Coalescer: Identical requests arriving while one is being generated
+    subscribe to it instead of generating again; late joiners get the frames
+    sent so far first, then the rest as they come
+    """
+
+    def __init__(self):
+        self.inflight: Dict[Hashable, Broadcast] = {}
+        self.generations = 0
+        self.joined = 0
+
+    async def stream(
+        self,
+        key: Optional[Hashable],
+        frames: Callable[[], AsyncIterator[bytes]],
+        joined: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream: The frames of the generation running for key, started from
+        frames() when there is none; a None key never coalesces. A request that
+        joined a generation gets its published result passed to joined() once all
+        frames are sent, to record the exchange as its own
+        """
+        if key is None:
+            async for frame in frames():
+                yield frame
+            return
+        broadcast = self.inflight.get(key)
+        leader = broadcast is None
+        if leader:
+            broadcast = self.inflight[key] = Broadcast(key)
+            # Its own task, so it outlives the client that started it; the task
+            # copies the context, so publish_result finds the broadcast.
+            token = _current_broadcast.set(broadcast)
+            try:
+                broadcast.producer = asyncio.create_task(
+                    broadcast.produce(frames())
+                )
+            finally:
+                _current_broadcast.reset(token)
+            broadcast.producer.add_done_callback(lambda _: self._finished(broadcast))
+            self.generations += 1
+        else:
+            self.joined += 1
+            print_debug_msg("Joining in-flight generation for %s", key)
+            span = current_span()
+            if span is not None:
+                span.set("coalesced", True)
+        broadcast.subscribers += 1
+        try:
+            async for frame in broadcast.subscribe():
+                yield frame
+            if not leader and joined is not None and broadcast.result is not None:
+                await joined(broadcast.result)
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Every client went away; nobody is left to generate for.
+                self._finished(broadcast)
+                broadcast.producer.cancel()
+
+    def _finished(self, broadcast: Broadcast):
+        # Requests from now on start a new generation.
+        if self.inflight.get(broadcast.key) is broadcast:
+            del self.inflight[broadcast.key]
+
+    def stats(self) -> dict:
+        return dict(
+            inflight=len(self.inflight),
+            subscribers=sum(b.subscribers for b in self.inflight.values()),
+            generations=self.generations,
+            joined=self.joined,
+        )
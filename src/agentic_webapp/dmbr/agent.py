@@ -1,114 +1,714 @@
 #!/usr/bin/env python3
 
-import operator
-from typing import Annotated, Any, Iterator, TypedDict, Dict
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.messages.tool import ToolMessage, tool_call
+import time
+from functools import partial
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Iterator,
+    TypedDict,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.tool import ToolMessage
 from langchain_core.messages.utils import AnyMessage
-from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import merge_configs
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph import graph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.constants import END
 from langgraph.graph import add_messages
-from agentic_webapp.dmbr.llm import get_llm, LLMModel
-from agentic_webapp.dmbr.term import (
-    print_user_msg,
-    print_assistant_msg,
-    print_debug_msg,
-    print_error_msg,
+from pydantic import ValidationError
+from agentic_webapp.dmbr.context import ContextWindow, approximate_tokens
+from agentic_webapp.dmbr.llm import get_llm, llm_provider, LLMModel
+from agentic_webapp.dmbr.memory import thread_config
+from agentic_webapp.dmbr.model_router import ModelRouter
+from agentic_webapp.dmbr.scheduler import Scheduler, get_scheduler
+from agentic_webapp.dmbr.semantic_cache import SemanticCache, is_first_turn
+from agentic_webapp.dmbr.streaming import astream_graph_tokens
+from agentic_webapp.dmbr.supervisor import (
+    Delegate,
+    arun_delegate_calls,
+    delegate_result,
+    run_delegate_calls,
+)
+from agentic_webapp.dmbr.tool_calls import (
+    answer_tool_calls,
+    arun_tool_calls,
+    missing_tool_results,
+    run_tool_calls,
 )
+from agentic_webapp.dmbr.tracing import tracing_config
+from agentic_webapp.dmbr.term import print_debug_msg, print_warning_msg
+
+
+# Tokens a reply is assumed to take until the provider reports its usage
+COMPLETION_TOKENS = 512
+
+# Invalid answers a model is asked to fix when there is no larger one to ask
+ANSWER_RETRIES = 2
+
+
+def thread_session(config: Optional[RunnableConfig]) -> Optional[str]:
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def used_tokens(message) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage["total_tokens"] if usage else None
 
 
 class AgentState(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
+    summary: str
+    summarized: int
+    # Validated output_structure instance of the latest run
+    output: Any
+    # Model tier the router picked for the current turn
+    tier: int
+
+
+def delegate_tool(name: str, delegate: Delegate) -> dict:
+    """
+    Delegate Tool: The tool spec the supervising LLM calls to hand a task to a delegate
+    """
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": delegate.description or f"Hand a task to the {name} agent",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "task": {
+                        "type": "string",
+                        "description": "Self-contained instructions for the agent",
+                    }
+                },
+                "required": ["task"],
+            },
+        },
+    }
 
 
 class Agent:
     def __init__(
         self,
         name,
-        model: LLMModel,
+        model: Union[LLMModel, Tuple[LLMModel, ...]],
         system="",
         tools=[],
         output_structure=None,
-        delegates: Dict[str, Any] = None,
+        delegates: Dict[str, Union["Agent", Delegate]] = None,
+        max_concurrency: int = 4,
+        tool_timeout: Optional[float] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        context: Optional[ContextWindow] = None,
+        description: str = "",
+        semantic_cache: Optional[SemanticCache] = None,
+        temperature: Optional[float] = None,
+        router: Optional[ModelRouter] = None,
+        scheduler: Optional[Scheduler] = None,
     ):
-        print_debug_msg(f"Initializing agent with model {model}")
+        print_debug_msg("Initializing agent with model %s", model)
+        self.name = name
         self.system = system
-        llm = get_llm(model)
+        self.description = description
+        self.max_concurrency = max_concurrency
+        self.tool_timeout = tool_timeout
+        self.context = context
+        self.semantic_cache = semantic_cache
+        self.router = router
+        # Every LLM and tool call waits for its provider's rate limits here.
+        self.scheduler = scheduler or get_scheduler()
+        # Plain agents get the default per-delegate concurrency limit.
+        self.delegates = {
+            delegate_name: d if isinstance(d, Delegate) else Delegate(d)
+            for delegate_name, d in (delegates or {}).items()
+        }
+        # With a router, model is replaced by the router's tiers.
+        self.models = router.tiers if router is not None else (model,)
+        llms = [get_llm(m, temperature) for m in self.models]
+        self.output_structure = output_structure
+        self.output_tool = None
         graph_builder = graph.StateGraph(AgentState)
-        graph_builder.add_node(name, self.call_llm)
-        graph_builder.add_node("action", self.act)
-        # if delegates:
-        #     for delegate_name, delegate in delegates.items():
-        #         graph_builder.add_node(delegate_name, delegate)
-        #     for delegate_name in delegates.keys():
-        #         graph_builder.add_edge(delegate_name, name)
-        #         graph_builder.add_edge(name, delegate_name)
+        graph_builder.add_node(
+            name, RunnableLambda(self.call_llm, afunc=self.acall_llm)
+        )
+        if router is not None:
+            graph_builder.add_node("router", self.route_model)
+            graph_builder.add_edge("router", name)
+        graph_builder.add_node("action", RunnableLambda(self.act, afunc=self.aact))
+        graph_builder.add_edge("action", name)
+        # Each delegate is a sub-graph node, compiled once with its Agent; delegates
+        # called in the same turn run side by side, as do the tasks of each one.
+        for delegate_name in self.delegates:
+            graph_builder.add_node(
+                delegate_name,
+                RunnableLambda(
+                    partial(self.delegate, delegate_name),
+                    afunc=partial(self.adelegate, delegate_name),
+                ),
+            )
+            graph_builder.add_edge(delegate_name, name)
+        destinations = ["action", *self.delegates]
         if output_structure:
-            graph_builder.add_node("output_parser", self.output_parser)
-            graph_builder.add_conditional_edges(
-                name, self.should_act, {True: "action", False: "output_parser"}
+            # The schema is offered as a terminal tool, so the final answer comes
+            # out of the same LLM call; output_parser only runs if it is skipped.
+            self.output_tool = convert_to_openai_tool(output_structure)["function"][
+                "name"
+            ]
+            self.structured_llms = [
+                llm.with_structured_output(output_structure) for llm in llms
+            ]
+            self.structured_llm = self.structured_llms[-1]
+            graph_builder.add_node("respond", self.respond)
+            graph_builder.add_node(
+                "output_parser",
+                RunnableLambda(self.output_parser, afunc=self.aoutput_parser),
             )
-            graph_builder.set_finish_point("output_parser")
-        else:
+            # An answer failing validation goes back to a model to fix it.
             graph_builder.add_conditional_edges(
-                name, self.should_act, {True: "action", False: END}
+                "respond", self.route_answer, [name, END]
             )
-        graph_builder.add_edge("action", name)
-        graph_builder.set_entry_point(name)
-        self.graph = graph_builder.compile()
-        if len(tools) > 0:
-            self.tools = {tool.name: tool for tool in tools}
-            self.llm = llm.bind_tools(tools)
+            graph_builder.set_finish_point("output_parser")
+            destinations += ["respond", "output_parser"]
         else:
-            self.llm = llm
-        self.output_structure = output_structure
+            destinations.append(END)
+        graph_builder.add_conditional_edges(name, self.route, destinations)
+        graph_builder.set_entry_point(name if router is None else "router")
+        self.graph = graph_builder.compile(checkpointer=checkpointer)
+        self.tools = {tool.name: tool for tool in tools}
+        bound_tools = tools + [
+            delegate_tool(delegate_name, delegate)
+            for delegate_name, delegate in self.delegates.items()
+        ]
+        self.llms = [self._bind(llm, bound_tools) for llm in llms]
+        self.llm = self.llms[-1]
+
+    def _bind(self, llm, tools):
+        if self.output_structure:
+            return self._bind_output_tool(llm, tools + [self.output_structure])
+        elif len(tools) > 0:
+            return llm.bind_tools(tools)
+        return llm
+
+    def _bind_output_tool(self, llm, tools):
+        try:
+            # Forcing a tool call every turn means the model cannot end on plain text.
+            return llm.bind_tools(tools, tool_choice="any")
+        except ValueError as e:
+            print_debug_msg("Tool choice not supported, falling back to auto: %s", e)
+            return llm.bind_tools(tools)
+
+    def _prepare(self, state: AgentState):
+        if self.context is None:
+            return answer_tool_calls(state["messages"]), None, {}
+        messages, summary, update = self.context.prepare(state)
+        # Tool calls an interrupted turn left unanswered would fail the LLM call;
+        # answered after windowing, so summarized counts the stored messages.
+        return answer_tool_calls(messages), summary, update
+
+    async def _aprepare(self, state: AgentState):
+        if self.context is None:
+            return answer_tool_calls(state["messages"]), None, {}
+        messages, summary, update = await self.context.aprepare(state)
+        return answer_tool_calls(messages), summary, update
 
-    def output_parser(self, state: AgentState):
-        print_debug_msg(f"Output parser with state {state['messages']}")
-        llm_with_output_structure = self.llm.with_structured_output(
-            self.output_structure
+    def _with_system(self, messages, summary: Optional[str] = None):
+        system = self.system
+        if summary:
+            system = f"{system}\n\nSummary of the earlier conversation:\n{summary}"
+        if system:
+            messages = [SystemMessage(content=system)] + messages
+        return messages
+
+    def route_model(self, state: AgentState):
+        return {"tier": self.router.route(state["messages"])}
+
+    def _tier(self, state: AgentState) -> Optional[int]:
+        if self.router is None:
+            return None
+        return state.get("tier", self.router.top)
+
+    def _tier_llm(self, tier: Optional[int]):
+        # self.llm stays the one called without a router, so it can be swapped.
+        return self.llm if tier is None else self.llms[tier]
+
+    def _tier_structured_llm(self, tier: Optional[int]):
+        return self.structured_llm if tier is None else self.structured_llms[tier]
+
+    def _succeeded(self, tier: Optional[int]):
+        if tier is not None:
+            self.router.succeeded(tier)
+
+    def _llm_call(self, tier: Optional[int], messages, config) -> dict:
+        provider, model = llm_provider(self.models[-1 if tier is None else tier])
+        tokens = sum(approximate_tokens(m) for m in messages) + COMPLETION_TOKENS
+        return dict(
+            provider=provider,
+            model=model,
+            tokens=tokens,
+            session=thread_session(config),
+        )
+
+    def _escalate(self, tier: Optional[int], error: Exception) -> int:
+        # Without a router, or from the top tier, the error is the answer.
+        next_tier = None if tier is None else self.router.escalate(tier, error)
+        if next_tier is None:
+            raise error
+        return next_tier
+
+    def _rejected_answers(self, state: AgentState) -> int:
+        count = 0
+        for message in reversed(state["messages"]):
+            if isinstance(message, HumanMessage):
+                break
+            if isinstance(message, ToolMessage) and message.status == "error":
+                count += message.name == self.output_tool
+        return count
+
+    def _answer_tier(
+        self, state: AgentState, tier: Optional[int], error: Exception
+    ) -> Optional[int]:
+        if tier is not None:
+            next_tier = self.router.escalate(tier, error)
+            if next_tier is not None:
+                return next_tier
+        # Without a larger model, the same one is sent the errors, a few times.
+        if self._rejected_answers(state) >= ANSWER_RETRIES:
+            raise error
+        print_warning_msg("Asking for a valid answer: %s", error)
+        return tier
+
+    def respond(self, state: AgentState):
+        output_call, *extra_calls = [
+            t
+            for t in state["messages"][-1].tool_calls
+            if t["name"] == self.output_tool
+        ]
+        # Every call needs its result for the thread to stay valid; only the first
+        # answer is used. Its own result goes last, for route_answer.
+        messages = [
+            ToolMessage(
+                tool_call_id=t["id"],
+                name=self.output_tool,
+                content="Ignored, only the first answer is used",
+            )
+            for t in extra_calls
+        ]
+        tier = self._tier(state)
+        try:
+            structured_output = self.output_structure.model_validate(
+                output_call["args"]
+            )
+        except ValidationError as e:
+            # The failed call is answered with the errors, for the model to fix.
+            tier = self._answer_tier(state, tier, e)
+            messages.append(
+                ToolMessage(
+                    tool_call_id=output_call["id"],
+                    name=self.output_tool,
+                    content=f"Invalid answer, please fix it: {e}",
+                    status="error",
+                )
+            )
+            result = {"messages": messages}
+            if tier is not None:
+                result["tier"] = tier
+            return result
+        self._succeeded(tier)
+        # The answer itself is already in the call's arguments.
+        messages.append(
+            ToolMessage(
+                tool_call_id=output_call["id"],
+                name=self.output_tool,
+                content="Answer sent",
+            )
         )
-        structured_output = llm_with_output_structure.invoke(state["messages"])
-        return {"messages": structured_output.json()}
-
-    def should_act(self, state: AgentState):
-        print_debug_msg(f"Checking if action exists in {state['messages']}")
-        result = state["messages"][-1]
-        tool_calls_count = len(result.tool_calls)
-        return tool_calls_count > 0
-
-    def call_llm(self, state: AgentState):
-        print_debug_msg(f"Calling LLM with state {state}")
-        messages = state["messages"]
-        if self.system:
-            messages = [SystemMessage(content=self.system)] + messages
-        message = self.llm.invoke(messages)
-        return {"messages": [message]}
-
-    def act(self, state: AgentState):
-        print_debug_msg(f"Taking action on message {state['messages'][-1]}")
+        return {"messages": messages, "output": structured_output}
+
+    def route_answer(self, state: AgentState):
+        return self.name if state["messages"][-1].status == "error" else END
+
+    def output_parser(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Output parser with state %s", state["messages"])
+        messages, _, update = self._prepare(state)
+        tier = self._tier(state)
+        while True:
+            try:
+                with self.scheduler.slot(**self._llm_call(tier, messages, config)):
+                    structured_llm = self._tier_structured_llm(tier)
+                    structured_output = structured_llm.invoke(messages)
+                break
+            except (ValidationError, OutputParserException) as e:
+                tier = self._escalate(tier, e)
+        self._succeeded(tier)
+        return {"output": structured_output, **update}
+
+    async def aoutput_parser(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Output parser with state %s", state["messages"])
+        messages, _, update = await self._aprepare(state)
+        tier = self._tier(state)
+        while True:
+            call = self._llm_call(tier, messages, config)
+            try:
+                async with self.scheduler.aslot(**call):
+                    structured_llm = self._tier_structured_llm(tier)
+                    structured_output = await structured_llm.ainvoke(messages)
+                break
+            except (ValidationError, OutputParserException) as e:
+                tier = self._escalate(tier, e)
+        self._succeeded(tier)
+        return {"output": structured_output, **update}
+
+    def route(self, state: AgentState):
         tool_calls = state["messages"][-1].tool_calls
-        results = []
-        for t in tool_calls:
-            print_debug_msg(f"Calling: {t}")
-            if not t["name"] in self.tools:
-                print_error_msg(f"Tool {t['name']} not found")
-                result = "Tool not found, please try again"
-            else:
-                result = self.tools[t["name"]].invoke(t["args"])
-            results.append(
-                ToolMessage(tool_call_id=t["id"], name=t["name"], content=str(result))
+        if not tool_calls:
+            if self.output_structure:
+                return "output_parser"
+            self._succeeded(self._tier(state))
+            return END
+        names = {t["name"] for t in tool_calls}
+        if names == {self.output_tool}:
+            return "respond"
+        # Delegates and the action node run side by side in the same step.
+        destinations = [name for name in self.delegates if name in names]
+        if names - set(self.delegates):
+            destinations.append("action")
+        return destinations
+
+    def _tool_calls(self, state: AgentState):
+        tool_calls = [
+            t
+            for t in state["messages"][-1].tool_calls
+            if t["name"] not in self.delegates
+        ]
+        early = [t for t in tool_calls if t["name"] == self.output_tool]
+        # An answer given alongside other tool calls is premature; ask again after.
+        results = [
+            ToolMessage(
+                tool_call_id=t["id"],
+                name=t["name"],
+                content="Answer once the other tool results are in",
             )
+            for t in early
+        ]
+        return [t for t in tool_calls if t["name"] != self.output_tool], results
+
+    def _record_call(self, tier: Optional[int], started: float):
+        if tier is not None:
+            self.router.record_call(tier, time.perf_counter() - started)
+
+    def call_llm(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Calling LLM with state %s", state)
+        messages, summary, update = self._prepare(state)
+        messages = self._with_system(messages, summary)
+        tier = self._tier(state)
+        with self.scheduler.slot(**self._llm_call(tier, messages, config)) as ticket:
+            started = time.perf_counter()
+            message = self._tier_llm(tier).invoke(messages)
+            self._record_call(tier, started)
+            ticket.settle(used_tokens(message))
+        return {"messages": [message], **update}
+
+    async def acall_llm(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Calling LLM with state %s", state)
+        messages, summary, update = await self._aprepare(state)
+        messages = self._with_system(messages, summary)
+        tier = self._tier(state)
+        call = self._llm_call(tier, messages, config)
+        async with self.scheduler.aslot(**call) as ticket:
+            started = time.perf_counter()
+            message = await self._tier_llm(tier).ainvoke(messages)
+            self._record_call(tier, started)
+            ticket.settle(used_tokens(message))
+        return {"messages": [message], **update}
+
+    def act(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Taking action on message %s", state["messages"][-1])
+        tool_calls, early = self._tool_calls(state)
+        results = run_tool_calls(
+            self.tools,
+            tool_calls,
+            max_concurrency=self.max_concurrency,
+            timeout=self.tool_timeout,
+            scheduler=self.scheduler,
+            session=thread_session(config),
+        )
+        print_debug_msg("Back to model after action")
+        return {"messages": results + early}
+
+    async def aact(self, state: AgentState, config: RunnableConfig):
+        print_debug_msg("Taking action on message %s", state["messages"][-1])
+        tool_calls, early = self._tool_calls(state)
+        results = await arun_tool_calls(
+            self.tools,
+            tool_calls,
+            max_concurrency=self.max_concurrency,
+            timeout=self.tool_timeout,
+            scheduler=self.scheduler,
+            session=thread_session(config),
+        )
         print_debug_msg("Back to model after action")
+        return {"messages": results + early}
+
+    def _delegate_calls(self, delegate_name: str, state: AgentState):
+        return [
+            t for t in state["messages"][-1].tool_calls if t["name"] == delegate_name
+        ]
+
+    def delegate(self, delegate_name: str, state: AgentState, config: RunnableConfig):
+        results = run_delegate_calls(
+            delegate_name,
+            self.delegates[delegate_name],
+            self._delegate_calls(delegate_name, state),
+            config,
+        )
         return {"messages": results}
 
+    async def adelegate(
+        self, delegate_name: str, state: AgentState, config: RunnableConfig
+    ):
+        results = await arun_delegate_calls(
+            delegate_name,
+            self.delegates[delegate_name],
+            self._delegate_calls(delegate_name, state),
+            config,
+        )
+        return {"messages": results}
+
+    def _config(
+        self, thread_id: Optional[str], config: Optional[RunnableConfig] = None
+    ) -> Optional[RunnableConfig]:
+        if thread_id is None:
+            return config
+        return merge_configs(config, thread_config(thread_id))
+
+    def _run_config(
+        self, thread_id: Optional[str], config: Optional[RunnableConfig] = None
+    ) -> RunnableConfig:
+        # Traced runs get their own callbacks, parented to the current span.
+        return merge_configs(
+            self._config(thread_id, config), tracing_config(self.name)
+        )
+
+    def _thread_values(self, thread_id: Optional[str]) -> dict:
+        if thread_id is None or self.graph.checkpointer is None:
+            return {}
+        return self.graph.get_state(self._config(thread_id)).values
+
+    async def _athread_values(self, thread_id: Optional[str]) -> dict:
+        if thread_id is None or self.graph.checkpointer is None:
+            return {}
+        return (await self.graph.aget_state(self._config(thread_id))).values
+
+    def _repair(self, messages) -> Optional[dict]:
+        missing = missing_tool_results(messages or [])
+        if not missing:
+            return None
+        print_warning_msg(
+            "Answering %s tool calls left by an interrupted turn", len(missing)
+        )
+        return {"messages": missing}
+
+    def repair_thread(self, thread_id: Optional[str] = None):
+        """
+        Repair Thread: Answer with errors the tool calls a turn interrupted between
+        the LLM and its tools left at the end of the thread, before the next run
+        """
+        update = self._repair(self._thread_values(thread_id).get("messages"))
+        if update is not None:
+            # As the action node, so the thread reads as a finished tool step.
+            self.graph.update_state(self._config(thread_id), update, as_node="action")
+
+    async def arepair_thread(self, thread_id: Optional[str] = None):
+        values = await self._athread_values(thread_id)
+        update = self._repair(values.get("messages"))
+        if update is not None:
+            await self.graph.aupdate_state(
+                self._config(thread_id), update, as_node="action"
+            )
+
+    async def afirst_turn(self, thread_id: Optional[str] = None) -> bool:
+        """
+        First Turn: Whether the thread has no earlier exchange, so a reply depends
+        on the prompt alone
+        """
+        return is_first_turn((await self._athread_values(thread_id)).get("messages"))
+
+    def _cached_result(self, message: HumanMessage, answer: Optional[str]):
+        if answer is None:
+            return None
+        result = {"messages": [message, AIMessage(content=answer)]}
+        if self.output_structure:
+            result["output"] = self.output_structure.model_validate_json(answer)
+        return result
+
+    def _cached_node(self) -> str:
+        # A finishing node, so the thread reads as a completed turn.
+        return "output_parser" if self.output_structure else self.name
+
+    def persist_cached(self, cached: dict, thread_id: Optional[str] = None):
+        """
+        Semantic Cache: Write a cached exchange into the thread, as if answered, so
+        later turns see it
+        """
+        if thread_id is None or self.graph.checkpointer is None:
+            return
+        self.graph.update_state(
+            self._config(thread_id), cached, as_node=self._cached_node()
+        )
+
+    async def apersist_cached(self, cached: dict, thread_id: Optional[str] = None):
+        if thread_id is None or self.graph.checkpointer is None:
+            return
+        await self.graph.aupdate_state(
+            self._config(thread_id), cached, as_node=self._cached_node()
+        )
+
+    async def apersist_answer(
+        self, message: HumanMessage, answer: str, thread_id: Optional[str] = None
+    ):
+        """
+        Persist Answer: Write an answer given elsewhere (the semantic cache, a shared
+        generation) to message into the thread
+        """
+        await self.apersist_cached(self._cached_result(message, answer), thread_id)
+
+    def lookup_cached(
+        self, message: HumanMessage, thread_id: Optional[str] = None
+    ) -> Optional[dict]:
+        """
+        Semantic Cache: The cached result for a first turn prompt close to this one
+        """
+        if self.semantic_cache is None or not is_first_turn(
+            self._thread_values(thread_id).get("messages")
+        ):
+            return None
+        answer = self.semantic_cache.lookup(self.name, message.content)
+        return self._cached_result(message, answer)
+
+    async def alookup_cached(
+        self, message: HumanMessage, thread_id: Optional[str] = None
+    ) -> Optional[dict]:
+        if self.semantic_cache is None or not is_first_turn(
+            (await self._athread_values(thread_id)).get("messages")
+        ):
+            return None
+        answer = await self.semantic_cache.alookup(self.name, message.content)
+        return self._cached_result(message, answer)
+
+    def store_cached(
+        self,
+        message: HumanMessage,
+        result: Optional[dict] = None,
+        thread_id: Optional[str] = None,
+    ):
+        """
+        Semantic Cache: Remember the answer of a first turn, taken from result or
+        else from the thread
+        """
+        if self.semantic_cache is None:
+            return
+        result = result or self._thread_values(thread_id)
+        # Later turns depend on the conversation, not just the prompt.
+        if result.get("messages") and is_first_turn(result["messages"]):
+            self.semantic_cache.store(
+                self.name, message.content, delegate_result(result)
+            )
+
+    async def astore_cached(
+        self,
+        message: HumanMessage,
+        result: Optional[dict] = None,
+        thread_id: Optional[str] = None,
+    ):
+        if self.semantic_cache is None:
+            return
+        result = result or await self._athread_values(thread_id)
+        if result.get("messages") and is_first_turn(result["messages"]):
+            await self.semantic_cache.astore(
+                self.name, message.content, delegate_result(result)
+            )
+
     def __call__(
-        self, message: HumanMessage, stream=False, debug=False
+        self,
+        message: HumanMessage,
+        stream=False,
+        debug=False,
+        thread_id=None,
+        use_cache=True,
     ) -> Iterator[dict]:
+        config = self._run_config(thread_id)
+        cached = self.lookup_cached(message, thread_id) if use_cache else None
+        if cached is None:
+            self.repair_thread(thread_id)
+        else:
+            self.persist_cached(cached, thread_id)
         if stream:
-            results = self.graph.stream(dict(messages=message), debug=debug)
+            if cached is not None:
+                return iter([{"semantic_cache": cached}])
+            results = self.graph.stream(dict(messages=message), config, debug=debug)
             return results
         else:
-            results = self.graph.invoke(dict(messages=message), debug=debug)
+            if cached is not None:
+                return cached
+            results = self.graph.invoke(dict(messages=message), config, debug=debug)
+            if use_cache:
+                self.store_cached(message, results)
             return results
+
+    async def ainvoke(
+        self, message: HumanMessage, debug=False, thread_id=None, use_cache=True
+    ) -> dict:
+        cached = await self.alookup_cached(message, thread_id) if use_cache else None
+        if cached is not None:
+            await self.apersist_cached(cached, thread_id)
+            return cached
+        await self.arepair_thread(thread_id)
+        results = await self.graph.ainvoke(
+            dict(messages=message), self._run_config(thread_id), debug=debug
+        )
+        if use_cache:
+            await self.astore_cached(message, results)
+        return results
+
+    async def astream(
+        self, message: HumanMessage, debug=False, thread_id=None
+    ) -> AsyncIterator[dict]:
+        await self.arepair_thread(thread_id)
+        results = self.graph.astream(
+            dict(messages=message), self._run_config(thread_id), debug=debug
+        )
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()
+
+    async def astream_tokens(
+        self,
+        message: HumanMessage,
+        thread_id: Optional[str] = None,
+        config: Optional[RunnableConfig] = None,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        await self.arepair_thread(thread_id)
+        events = astream_graph_tokens(
+            self.graph,
+            dict(messages=message),
+            nodes=[self.name],
+            config=self._run_config(thread_id, config),
+            answer_tool=self.output_tool,
+        )
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
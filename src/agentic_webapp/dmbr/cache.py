@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    TTL Cache: Bounded LRU cache whose entries expire, with single-flight loading
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        # Key -> [load task, callers awaiting it]
+        self._ainflight: Dict[Hashable, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable, default=None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Any],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            future = self._inflight.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            value = load()
+            if cacheable(value):
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def _aload(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool],
+    ) -> Any:
+        try:
+            value = await load()
+            if cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                flight = self._ainflight.get(key)
+                if flight is not None and flight[0] is asyncio.current_task():
+                    del self._ainflight[key]
+
+    async def aget_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            flight = self._ainflight.get(key)
+            if flight is None:
+                self.misses += 1
+                # Owned by the cache, not by the first caller, so one caller
+                # going away does not fail everyone waiting on the same load.
+                task = asyncio.get_running_loop().create_task(
+                    self._aload(key, load, cacheable)
+                )
+                flight = self._ainflight[key] = [task, 0]
+            else:
+                self.coalesced += 1
+            flight[1] += 1
+        task = flight[0]
+        try:
+            return await asyncio.shield(task)
+        finally:
+            with self._lock:
+                flight[1] -= 1
+                abandoned = flight[1] == 0 and not task.done()
+                if abandoned and self._ainflight.get(key) is flight:
+                    del self._ainflight[key]
+            # The load is only cancelled once nobody is waiting for it.
+            if abandoned:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return dict(
+                size=len(self._entries),
+                maxsize=self.maxsize,
+                ttl=self.ttl,
+                hits=self.hits,
+                misses=self.misses,
+                coalesced=self.coalesced,
+                evictions=self.evictions,
+                expirations=self.expirations,
+                hit_rate=(self.hits + self.coalesced) / lookups if lookups else 0.0,
+            )
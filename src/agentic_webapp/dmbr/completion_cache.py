@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import cache
+from pathlib import Path
+from typing import Any, Callable, Optional, Protocol, Sequence
+from uuid import uuid4
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+from agentic_webapp.dmbr.cache import TTLCache
+from agentic_webapp.utils import ROOT_DIR
+
+
+completions_db_path = f"{ROOT_DIR}/data/completions.sqlite"
+
+
+# Message fields that differ between runs without changing what the model is asked
+VOLATILE_FIELDS = ("id", "response_metadata", "usage_metadata")
+
+
+def _canonical_prompt(prompt: str) -> str:
+    # Graph state gives every message a random id, so ids are left out of the key.
+    messages = json.loads(prompt)
+    for message in messages:
+        kwargs = message.get("kwargs", {})
+        for field in VOLATILE_FIELDS:
+            kwargs.pop(field, None)
+    return json.dumps(messages, sort_keys=True, separators=(",", ":"))
+
+
+def completion_key(prompt: str, llm_string: str) -> str:
+    """
+    Completion Key: Hash of the serialized messages (system prompt included) and of
+    the model parameters, which carry the model name and any bound tools
+    """
+    digest = hashlib.sha256()
+    digest.update(llm_string.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(_canonical_prompt(prompt).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _without_ids(generations: Sequence) -> list:
+    # A replayed message must get a fresh id, or add_messages would overwrite the
+    # original one when both end up in the same thread.
+    return [
+        g.copy(update=dict(message=g.message.copy(update=dict(id=None))))
+        if hasattr(g, "message")
+        else g
+        for g in generations
+    ]
+
+
+def _fresh_id(tool_call_id: str) -> str:
+    # Same provider prefix (call_, toolu_), new random part
+    prefix, separator, _ = tool_call_id.partition("_")
+    return f"{prefix}{separator}{uuid4().hex}"
+
+
+def _renamed(items: list, ids: dict) -> list:
+    return [
+        {**t, "id": ids[t["id"]]} if isinstance(t, dict) and t.get("id") in ids else t
+        for t in items
+    ]
+
+
+def _fresh_tool_call_ids(generations: Sequence) -> list:
+    # Replayed tool calls need fresh ids as well, or threads replaying the same
+    # completion would share them; every copy of the ids in the message changes.
+    fresh = []
+    for g in generations:
+        message = getattr(g, "message", None)
+        calls = [
+            *(getattr(message, "tool_calls", None) or []),
+            *(getattr(message, "tool_call_chunks", None) or []),
+        ]
+        ids = {t["id"]: _fresh_id(t["id"]) for t in calls if t.get("id")}
+        if not ids:
+            fresh.append(g)
+            continue
+        update = dict(tool_calls=_renamed(message.tool_calls, ids))
+        if getattr(message, "tool_call_chunks", None):
+            update["tool_call_chunks"] = _renamed(message.tool_call_chunks, ids)
+        if message.additional_kwargs.get("tool_calls"):
+            update["additional_kwargs"] = {
+                **message.additional_kwargs,
+                "tool_calls": _renamed(message.additional_kwargs["tool_calls"], ids),
+            }
+        if isinstance(message.content, list):
+            # Anthropic keeps its calls as tool_use content blocks as well.
+            update["content"] = _renamed(message.content, ids)
+        fresh.append(g.copy(update=dict(message=message.copy(update=update))))
+    return fresh
+
+
+class CompletionBackend(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str): ...
+
+    def clear(self): ...
+
+    def stats(self) -> dict: ...
+
+
+class MemoryBackend:
+    """
+    Memory Backend: LRU of serialized completions with a TTL, per process
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        return self.entries.get(key)
+
+    def set(self, key: str, value: str):
+        self.entries.set(key, value)
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return dict(backend="memory", **self.entries.stats())
+
+
+class SQLiteBackend:
+    """
+    SQLite Backend: Completions on disk, so they survive reloads; evicts the least
+    recently used (or oldest, with eviction="fifo") entries past maxsize
+    """
+
+    def __init__(
+        self,
+        path: str = completions_db_path,
+        maxsize: int = 10_000,
+        ttl: float = 24 * 3600,
+        eviction: str = "lru",
+        clock: Callable[[], float] = time.time,
+    ):
+        if eviction not in ("lru", "fifo"):
+            raise ValueError(f"Eviction {eviction} not supported")
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.order = "used" if eviction == "lru" else "created"
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM completions WHERE key = ? AND created > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Only LRU eviction reads the last use; FIFO hits stay read-only.
+            if self.order == "used":
+                self._conn.execute(
+                    "UPDATE completions SET used = ? WHERE key = ?", (now, key)
+                )
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM completions WHERE created <= ?", (now - self.ttl,)
+            )
+            self._conn.execute(
+                f"DELETE FROM completions WHERE key IN (SELECT key FROM completions "
+                f"ORDER BY {self.order} DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return dict(
+            backend="sqlite",
+            size=size,
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+        )
+
+
+class CompletionCache(BaseCache):
+    """
+    Completion Cache: LangChain cache answering identical requests, tool calls
+    included, from a pluggable backend instead of the provider
+    """
+
+    def __init__(self, backend: CompletionBackend):
+        self.backend = backend
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        value = self.backend.get(completion_key(prompt, llm_string))
+        if value is None:
+            return None
+        # Deserialized per hit, so callers never share message objects.
+        return _fresh_tool_call_ids(loads(value))
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        self.backend.set(
+            completion_key(prompt, llm_string), dumps(_without_ids(return_val))
+        )
+
+    def clear(self, **kwargs: Any):
+        self.backend.clear()
+
+    async def alookup(
+        self, prompt: str, llm_string: str
+    ) -> Optional[RETURN_VAL_TYPE]:
+        if isinstance(self.backend, MemoryBackend):
+            return self.lookup(prompt, llm_string)
+        return await super().alookup(prompt, llm_string)
+
+    async def aupdate(
+        self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE
+    ):
+        if isinstance(self.backend, MemoryBackend):
+            return self.update(prompt, llm_string, return_val)
+        return await super().aupdate(prompt, llm_string, return_val)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+@cache
+def get_completion_cache() -> CompletionCache:
+    """
+    Completion Cache: The process wide cache, memory or sqlite backed per
+    COMPLETION_CACHE_BACKEND
+    """
+    backend = os.getenv("COMPLETION_CACHE_BACKEND", "memory")
+    if backend == "sqlite":
+        return CompletionCache(
+            SQLiteBackend(
+                maxsize=int(os.getenv("COMPLETION_CACHE_SIZE", "10000")),
+                ttl=float(os.getenv("COMPLETION_CACHE_TTL", "86400")),
+                eviction=os.getenv("COMPLETION_CACHE_EVICTION", "lru"),
+            )
+        )
+    if backend == "memory":
+        return CompletionCache(
+            MemoryBackend(
+                maxsize=int(os.getenv("COMPLETION_CACHE_SIZE", "1024")),
+                ttl=float(os.getenv("COMPLETION_CACHE_TTL", "3600")),
+            )
+        )
+    raise ValueError(f"Completion cache backend {backend} not found")
+
+
+def completion_cache_for(temperature: Optional[float]) -> Optional[CompletionCache]:
+    """
+    Completion Cache: Used for deterministic (temperature=0) models unless
+    COMPLETION_CACHE=0, and for every model with COMPLETION_CACHE=1
+    """
+    mode = os.getenv("COMPLETION_CACHE", "auto")
+    if mode == "1" or (mode == "auto" and temperature == 0):
+        return get_completion_cache()
+    return None
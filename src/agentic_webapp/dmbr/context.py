@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from agentic_webapp.dmbr.llm import get_llm, LLMModel
+from agentic_webapp.dmbr.streaming import NOSTREAM_TAG
+from agentic_webapp.dmbr.term import print_debug_msg
+
+
+SUMMARY_PROMPT = """
+    Summarize the conversation below for an assistant that will continue it.
+    Keep the user's requests, locations, numbers and conclusions,
+    and drop raw tool payloads.
+    Extend the existing summary, if any, rather than repeating it.
+    """
+
+
+def approximate_tokens(message: AnyMessage) -> int:
+    # ~4 characters per token is close enough to budget a window.
+    size = len(str(message.content))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        size += len(str(message.tool_calls))
+    return size // 4 + 4
+
+
+def message_units(messages: Sequence[AnyMessage]) -> List[Tuple[int, int]]:
+    """
+    Units: (start, end) slices that must be kept or dropped together, so a tool
+    calling AIMessage always travels with its ToolMessages
+    """
+    units = []
+    start = 0
+    while start < len(messages):
+        end = start + 1
+        if isinstance(messages[start], AIMessage) and messages[start].tool_calls:
+            while end < len(messages) and isinstance(messages[end], ToolMessage):
+                end += 1
+        units.append((start, end))
+        start = end
+    return units
+
+
+class ContextWindow:
+    """
+    Context Window: Token budgeted sliding window over the conversation, with tool
+    result truncation and optional rolling summarization of what falls out of it
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        max_tool_chars: int = 1000,
+        summary_model: Optional[LLMModel] = None,
+        token_counter: Callable[[AnyMessage], int] = approximate_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.max_tool_chars = max_tool_chars
+        self.summary_model = summary_model
+        self.token_counter = token_counter
+
+    def window_start(self, messages: Sequence[AnyMessage], budget: int) -> int:
+        units = message_units(messages)
+        if not units:
+            return 0
+        start, end = units[-1]
+        # The latest unit is always sent, even when it alone is over budget.
+        used = sum(self.token_counter(m) for m in messages[start:end])
+        for unit_start, unit_end in reversed(units[:-1]):
+            cost = sum(self.token_counter(m) for m in messages[unit_start:unit_end])
+            if used + cost > budget:
+                break
+            used += cost
+            start = unit_start
+        return start
+
+    def compact(
+        self, messages: Sequence[AnyMessage], keep_latest: bool = True
+    ) -> List[AnyMessage]:
+        # Results from earlier turns are truncated; the latest ones are sent whole.
+        latest_start = len(messages)
+        if keep_latest and messages:
+            latest_start, _ = message_units(messages)[-1]
+        compacted = []
+        for i, message in enumerate(messages):
+            content = message.content
+            if (
+                i < latest_start
+                and isinstance(message, ToolMessage)
+                and isinstance(content, str)
+                and len(content) > self.max_tool_chars
+            ):
+                message = message.copy(
+                    update=dict(
+                        content=f"{content[:self.max_tool_chars]}... [truncated]"
+                    )
+                )
+            compacted.append(message)
+        return compacted
+
+    def _summary_messages(
+        self, summary: Optional[str], dropped: Sequence[AnyMessage]
+    ) -> List[AnyMessage]:
+        transcript = "\n".join(
+            f"{m.type}: {m.content}" for m in self.compact(dropped, keep_latest=False)
+        )
+        if summary:
+            transcript = f"Existing summary: {summary}\n\n{transcript}"
+        return [SystemMessage(content=SUMMARY_PROMPT), HumanMessage(content=transcript)]
+
+    def _window(
+        self, state: dict
+    ) -> Tuple[List[AnyMessage], Optional[List[AnyMessage]]]:
+        messages = state["messages"]
+        summary = state.get("summary")
+        budget = self.max_tokens
+        if summary:
+            budget -= len(summary) // 4
+        compacted = self.compact(messages)
+        start = self.window_start(compacted, budget)
+        summarized = state.get("summarized") or 0
+        dropped = None
+        if self.summary_model is not None and start > summarized:
+            dropped = messages[summarized:start]
+        if start:
+            print_debug_msg(
+                "Context window drops %d of %d messages", start, len(messages)
+            )
+        return compacted[start:], dropped
+
+    def _update(self, state: dict, messages: List[AnyMessage], summary: str) -> dict:
+        return dict(summary=summary, summarized=len(state["messages"]) - len(messages))
+
+    def prepare(self, state: dict) -> Tuple[List[AnyMessage], Optional[str], dict]:
+        """
+        Prepare: (messages to send, summary of the older ones, state update)
+        """
+        messages, dropped = self._window(state)
+        if not dropped:
+            return messages, state.get("summary"), {}
+        summary = get_llm(self.summary_model, temperature=0).invoke(
+            self._summary_messages(state.get("summary"), dropped),
+            {"tags": [NOSTREAM_TAG]},
+        )
+        return messages, summary.content, self._update(state, messages, summary.content)
+
+    async def aprepare(
+        self, state: dict
+    ) -> Tuple[List[AnyMessage], Optional[str], dict]:
+        messages, dropped = self._window(state)
+        if not dropped:
+            return messages, state.get("summary"), {}
+        summary = await get_llm(self.summary_model, temperature=0).ainvoke(
+            self._summary_messages(state.get("summary"), dropped),
+            {"tags": [NOSTREAM_TAG]},
+        )
+        return messages, summary.content, self._update(state, messages, summary.content)
@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 
 
+import os
 from enum import Enum
 from functools import cache
+from importlib import import_module
+from typing import Callable, Iterable, Optional, Tuple, Union
 
-from langchain_anthropic import ChatAnthropic
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
+from agentic_webapp.dmbr.completion_cache import completion_cache_for
+from agentic_webapp.dmbr.routing import RoutingChatModel
 
 
 class LLMModel(str, Enum):
@@ -20,24 +22,104 @@ class LLMModel(str, Enum):
     LLAMA31_8b = "llama-3.1-8b-instant"
     LLAMA3_70b = "llama3-70b-8192"
     LLAMA3_8b = "llama3-8b-8192"
+    Mock = "mock"
+    Mock_Instant = "mock-instant"
+
+
+ANTHROPIC = ("langchain_anthropic", "ChatAnthropic")
+OPENAI = ("langchain_openai", "ChatOpenAI")
+GROQ = ("langchain_groq", "ChatGroq")
+MOCK = ("agentic_webapp.dmbr.mock_llm", "MockChatModel")
+
+# Provider modules are only imported when one of their models is first requested.
+LLM_REGISTRY: dict[LLMModel, Tuple[str, str]] = {
+    LLMModel.Claude3_Opus: ANTHROPIC,
+    LLMModel.Claude35_Sonnet: ANTHROPIC,
+    LLMModel.Claude3_Haiku: ANTHROPIC,
+    LLMModel.GPT4_Omni: OPENAI,
+    LLMModel.GPT4_Omni_mini: OPENAI,
+    LLMModel.GPT35_Turbo: OPENAI,
+    LLMModel.LLAMA31_70b: GROQ,
+    LLMModel.LLAMA31_8b: GROQ,
+    LLMModel.LLAMA3_70b: GROQ,
+    LLMModel.LLAMA3_8b: GROQ,
+    LLMModel.Mock: MOCK,
+    LLMModel.Mock_Instant: MOCK,
+}
 
 
 @cache
-def get_llm(model_name: LLMModel):
-    llm = {
-        LLMModel.Claude3_Opus: ChatAnthropic(model_name=LLMModel.Claude3_Opus),
-        LLMModel.Claude35_Sonnet: ChatAnthropic(model_name=LLMModel.Claude35_Sonnet),
-        LLMModel.Claude3_Haiku: ChatAnthropic(model_name=LLMModel.Claude3_Haiku),
-        LLMModel.GPT4_Omni: ChatOpenAI(model_name=LLMModel.GPT4_Omni),
-        LLMModel.GPT4_Omni_mini: ChatOpenAI(model_name=LLMModel.GPT4_Omni_mini),
-        LLMModel.GPT35_Turbo: ChatOpenAI(model_name=LLMModel.GPT35_Turbo),
-        LLMModel.LLAMA31_70b: ChatGroq(model_name=LLMModel.LLAMA31_70b),
-        LLMModel.LLAMA31_8b: ChatGroq(model_name=LLMModel.LLAMA31_8b),
-        LLMModel.LLAMA3_70b: ChatGroq(model_name=LLMModel.LLAMA3_70b),
-        LLMModel.LLAMA3_8b: ChatGroq(model_name=LLMModel.LLAMA3_8b),
-    }.get(model_name, None)
-
-    if llm is None:
+def get_llm(
+    model_name: Union[LLMModel, Tuple[LLMModel, ...]],
+    temperature: Optional[float] = None,
+):
+    if isinstance(model_name, tuple):
+        return get_routing_llm(model_name, temperature)
+    # LLM_OVERRIDE=mock runs every graph offline, whatever model it asks for.
+    model_name = LLMModel(os.getenv("LLM_OVERRIDE") or model_name)
+    provider = LLM_REGISTRY.get(model_name, None)
+
+    if provider is None:
         raise ValueError(f"Model {model_name} not found")
 
+    module_name, class_name = provider
+    llm_class = getattr(import_module(module_name), class_name)
+    params = {} if temperature is None else dict(temperature=temperature)
+    llm = llm_class(model_name=model_name, **params)
+    # Shared by every bind_tools / with_structured_output built on this client.
+    llm.cache = completion_cache_for(temperature)
     return llm
+
+
+def llm_provider(model_name: Union[LLMModel, Tuple[LLMModel, ...]]) -> Tuple[str, str]:
+    """
+    LLM Provider: The provider and model a call to this model is rate limited as
+    """
+    if isinstance(model_name, tuple):
+        # Routed calls count against the preferred model, which serves most of them.
+        model_name = model_name[0]
+    model_name = LLMModel(os.getenv("LLM_OVERRIDE") or model_name)
+    module_name, _ = LLM_REGISTRY[model_name]
+    if module_name == MOCK[0]:
+        return "mock", model_name.value
+    return module_name.removeprefix("langchain_"), model_name.value
+
+
+def get_routing_llm(
+    model_names: Tuple[LLMModel, ...], temperature: Optional[float] = None
+) -> RoutingChatModel:
+    """
+    Routing LLM: Equivalent models in order of preference, with failover, and
+    hedging of slow first tokens when LLM_HEDGE=1
+    """
+    return RoutingChatModel(
+        models=[get_llm(m, temperature) for m in model_names],
+        names=[LLMModel(m).value for m in model_names],
+        hedge=os.getenv("LLM_HEDGE", "0") == "1",
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        hedge_after=float(os.getenv("LLM_HEDGE_AFTER", "2.0")),
+    )
+
+
+def warm_up(models: Iterable[LLMModel], temperature: Optional[float] = None):
+    """
+    Warm Up: Construct the clients for the given models ahead of the first request
+    """
+    for model in models:
+        get_llm(model, temperature)
+
+
+def warm_up_handler(
+    models: Iterable[LLMModel], temperature: Optional[float] = None
+) -> Callable[[], None]:
+    """
+    Warm Up Handler: App startup handler warming the models up when LLM_WARM_UP=1,
+    leaving them to their first use otherwise
+    """
+    models = tuple(models)
+
+    def handler():
+        if os.getenv("LLM_WARM_UP", "0") == "1":
+            warm_up(models, temperature)
+
+    return handler
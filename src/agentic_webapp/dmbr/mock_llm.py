@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+from uuid import uuid4
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agentic_webapp.dmbr.streaming import message_text
+
+
+# Model name -> (seconds to the first token, tokens per second); 0 means instant.
+# MOCK_LLM_LATENCY and MOCK_LLM_TOKENS_PER_SECOND override the profile.
+MOCK_PROFILES: Dict[str, tuple] = {
+    "mock-instant": (0.0, 0.0),
+    "mock": (0.4, 60.0),
+}
+
+# Values for string arguments the mock has to make up, by argument name
+MOCK_VALUES: Dict[str, str] = {
+    "city": "Abidjan",
+    "country": "CI",
+    "description": "broken clouds",
+    "icon": "04d",
+    "url": "https://openweathermap.org/img/wn/04d@2x.png",
+}
+
+
+def _turn(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    # Everything since the last user message: the tool calls of the current turn.
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            return list(messages[i + 1 :])
+    return list(messages)
+
+
+def _prompt(messages: Sequence[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return message_text(message.content)
+    return ""
+
+
+def mock_arguments(schema: dict, prompt: str = "") -> dict:
+    """
+    Mock Arguments: Required arguments made up from a tool's JSON schema, so the
+    call validates against it
+    """
+    definitions = schema.get("$defs", schema.get("definitions", {}))
+
+    def value(name: str, spec: dict) -> Any:
+        if "$ref" in spec:
+            spec = definitions[spec["$ref"].split("/")[-1]]
+        if "anyOf" in spec:
+            # Optional arguments are left out, as far as the schema allows.
+            if {"type": "null"} in spec["anyOf"]:
+                return None
+            return value(name, spec["anyOf"][0])
+        if "allOf" in spec:
+            return value(name, spec["allOf"][0])
+        if "enum" in spec:
+            return spec["enum"][0]
+        if "default" in spec:
+            return spec["default"]
+        kind = spec.get("type")
+        if kind == "object":
+            return obj(spec)
+        if kind == "array":
+            return [value(name, spec.get("items", {}))]
+        if kind == "string":
+            if name in ("task", "query", "question"):
+                return prompt
+            return MOCK_VALUES.get(name.split()[-1].casefold(), f"mock {name}")
+        if kind == "boolean":
+            return True
+        if kind == "null":
+            return None
+        # Numbers, and untyped (Any) arguments
+        return 1
+
+    def obj(spec: dict) -> dict:
+        properties = spec.get("properties", {})
+        return {
+            name: value(name, properties.get(name, {}))
+            for name in spec.get("required", [])
+        }
+
+    return obj(schema)
+
+
+class MockChatModel(BaseChatModel):
+    """
+    Mock LLM: Offline chat model for load tests; plays the script, if any, else
+    calls every bound tool once, then answers (with the forced output tool, or text)
+    """
+
+    model_name: str = "mock"
+    temperature: Optional[float] = None
+    # Replies in turn order: text, (tool name, args), or an AIMessage
+    script: List[Any] = []
+    latency: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return dict(model_name=self.model_name, script=repr(self.script))
+
+    @property
+    def first_token_delay(self) -> float:
+        if self.latency is not None:
+            return self.latency
+        default, _ = MOCK_PROFILES.get(self.model_name, MOCK_PROFILES["mock"])
+        return float(os.getenv("MOCK_LLM_LATENCY", default))
+
+    @property
+    def token_delay(self) -> float:
+        rate = self.tokens_per_second
+        if rate is None:
+            _, default = MOCK_PROFILES.get(self.model_name, MOCK_PROFILES["mock"])
+            rate = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", default))
+        return 1 / rate if rate > 0 else 0.0
+
+    def bind_tools(
+        self, tools: Sequence[Any], tool_choice: Optional[Any] = None, **kwargs
+    ):
+        return self.bind(
+            tools=[convert_to_openai_tool(t) for t in tools],
+            tool_choice=tool_choice,
+            **kwargs,
+        )
+
+    def _tool_call(self, name: str, args: dict) -> dict:
+        return dict(name=name, args=args, id=f"call_{uuid4().hex}")
+
+    def _reply(
+        self,
+        messages: List[BaseMessage],
+        tools: Optional[List[dict]] = None,
+        tool_choice: Optional[Any] = None,
+        **kwargs,
+    ) -> AIMessage:
+        turn = _turn(messages)
+        prompt = _prompt(messages)
+        step = sum(isinstance(m, ToolMessage) for m in turn)
+        if step < len(self.script):
+            reply = self.script[step]
+            if isinstance(reply, AIMessage):
+                return reply.copy(update=dict(id=None))
+            if isinstance(reply, tuple):
+                return AIMessage(content="", tool_calls=[self._tool_call(*reply)])
+            return AIMessage(content=str(reply))
+        functions = [t["function"] for t in tools or []]
+        # A forced tool choice means the last tool is the answer's schema.
+        forced = tool_choice not in (None, "auto", "none") and functions
+        answer = functions.pop() if forced else None
+        if functions and not any(isinstance(m, ToolMessage) for m in turn):
+            calls = [
+                self._tool_call(f["name"], mock_arguments(f["parameters"], prompt))
+                for f in functions
+            ]
+            return AIMessage(content="", tool_calls=calls)
+        if answer is not None:
+            call = self._tool_call(
+                answer["name"], mock_arguments(answer["parameters"], prompt)
+            )
+            return AIMessage(content="", tool_calls=[call])
+        return AIMessage(content=f"This is a mock answer to: {prompt}")
+
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            calls = [
+                dict(name=t["name"], args=json.dumps(t["args"]), id=t["id"], index=i)
+                for i, t in enumerate(message.tool_calls)
+            ]
+            return [AIMessageChunk(content="", tool_call_chunks=calls)]
+        words = re.findall(r"\S+\s*", message_text(message.content)) or [""]
+        return [AIMessageChunk(content=w) for w in words]
+
+    def _duration(self, message: AIMessage) -> float:
+        # Same timing as streaming the reply, delivered at once.
+        return self.first_token_delay + self.token_delay * (
+            len(self._chunks(message)) - 1
+        )
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        message = self._reply(messages, **kwargs)
+        time.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> ChatResult:
+        message = self._reply(messages, **kwargs)
+        await asyncio.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_delay)
+        for i, chunk in enumerate(self._chunks(self._reply(messages, **kwargs))):
+            if i:
+                time.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_delay)
+        for i, chunk in enumerate(self._chunks(self._reply(messages, **kwargs))):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield ChatGenerationChunk(message=chunk)
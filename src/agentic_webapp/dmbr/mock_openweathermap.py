@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Mock OpenWeatherMap: Deterministic stand-in for the current weather endpoint.
+
+In process, through the client's transport (OPENWEATHERMAP_MOCK=1), or served:
+
+    uvicorn agentic_webapp.dmbr.mock_openweathermap:app --port 8001
+    OPENWEATHERMAP_URL=http://127.0.0.1:8001/data/2.5/weather
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from typing import Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+# Cities answered with a 404, to exercise the error paths
+UNKNOWN_CITIES = frozenset({"nowhere", "atlantis"})
+
+CONDITIONS = (
+    ("clear sky", "01d"),
+    ("few clouds", "02d"),
+    ("scattered clouds", "03d"),
+    ("broken clouds", "04d"),
+    ("shower rain", "09d"),
+    ("rain", "10d"),
+    ("thunderstorm", "11d"),
+    ("snow", "13d"),
+    ("mist", "50d"),
+)
+
+
+def mock_weather(location: str) -> dict:
+    """
+    Mock Weather: The same prediction for the same "city,state,country" every time
+    """
+    city, *rest = [part.strip() for part in location.split(",")]
+    if not city or city.casefold() in UNKNOWN_CITIES:
+        return dict(cod="404", message="city not found")
+    seed = hashlib.sha256(city.casefold().encode("utf-8")).digest()
+    description, icon = CONDITIONS[seed[0] % len(CONDITIONS)]
+    return dict(
+        cod=200,
+        name=city.title(),
+        sys=dict(country=(rest[-1] if rest else "XX").upper()),
+        main=dict(
+            temp=round(253.15 + seed[1] / 255 * 60, 2),
+            humidity=seed[2] % 101,
+            pressure=980 + seed[3] % 60,
+        ),
+        weather=[dict(main=description.title(), description=description, icon=icon)],
+        wind=dict(speed=round(seed[4] / 25.5, 1), deg=seed[5] * 360 // 256),
+    )
+
+
+def _response(request: httpx.Request) -> httpx.Response:
+    prediction = mock_weather(request.url.params.get("q", ""))
+    return httpx.Response(int(prediction["cod"]), json=prediction, request=request)
+
+
+class MockWeatherTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Mock Transport: Answers the weather client without a network, after latency
+    seconds
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return _response(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        return _response(request)
+
+
+def mock_weather_transport() -> Optional[MockWeatherTransport]:
+    """
+    Mock Transport: Used by the weather client when OPENWEATHERMAP_MOCK=1, with
+    OPENWEATHERMAP_MOCK_LATENCY seconds per request
+    """
+    if os.getenv("OPENWEATHERMAP_MOCK", "0") != "1":
+        return None
+    latency = float(os.getenv("OPENWEATHERMAP_MOCK_LATENCY", "0.05"))
+    return MockWeatherTransport(latency)
+
+
+async def weather(request: Request) -> JSONResponse:
+    latency = float(os.getenv("OPENWEATHERMAP_MOCK_LATENCY", "0.05"))
+    await asyncio.sleep(latency)
+    prediction = mock_weather(request.query_params.get("q", ""))
+    return JSONResponse(prediction, status_code=int(prediction["cod"]))
+
+
+app = Starlette(routes=[Route("/data/2.5/weather", weather)])
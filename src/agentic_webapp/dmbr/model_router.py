@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import os
+import re
+from collections import defaultdict, deque
+from functools import cache
+from threading import Lock
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.streaming import message_text
+from agentic_webapp.dmbr.term import print_debug_msg, print_warning_msg
+
+
+Tier = Union[LLMModel, Tuple[LLMModel, ...]]
+
+# Words asking for more than a lookup: comparisons, reasoning, longer horizons
+HARD_WORDS = frozenset(
+    "compare comparison versus vs why explain difference better worse best worst "
+    "week weekend forecast plan trip recommend should".split()
+)
+PLACE_SEPARATORS = re.compile(r"[?;,\n]|\band\b|\bor\b", re.IGNORECASE)
+
+
+def request_complexity(text: str) -> int:
+    """
+    Request Complexity: Cheap local score of a prompt; roughly one point per
+    place asked about, plus one for reasoning words and one for long prompts
+    """
+    parts = [p for p in PLACE_SEPARATORS.split(text) if re.search(r"\w", p)]
+    words = set(re.findall(r"[a-z]+", text.casefold()))
+    score = max(1, len(parts))
+    if words & HARD_WORDS:
+        score += 1
+    if len(text) > 300:
+        score += 1
+    return score
+
+
+class TierStats:
+    """
+    Tier Stats: Routed turns, LLM call latencies, successes and escalations of
+    one model tier
+    """
+
+    def __init__(self, window: int = 500):
+        self.routed = 0
+        self.successes = 0
+        self.escalations = 0
+        self.latencies: deque = deque(maxlen=window)
+        self.scores: Dict[int, int] = defaultdict(int)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        samples = sorted(self.latencies)
+        return samples[int(q * (len(samples) - 1))]
+
+    def stats(self) -> dict:
+        outcomes = self.successes + self.escalations
+        return dict(
+            routed=self.routed,
+            calls=len(self.latencies),
+            p50_latency=self.quantile(0.5),
+            p95_latency=self.quantile(0.95),
+            successes=self.successes,
+            escalations=self.escalations,
+            success_rate=self.successes / outcomes if outcomes else None,
+            # Complexity score -> turns routed here with it, to tune thresholds
+            scores=dict(sorted(self.scores.items())),
+        )
+
+
+class ModelRouter:
+    """
+    Model Router: Picks the cheapest model tier able to handle a request, from
+    its complexity score, and escalates to the next tier when an answer fails
+    validation
+    """
+
+    def __init__(
+        self,
+        tiers: Sequence[Tier],
+        thresholds: Sequence[int] = (2,),
+        classify: Callable[[str], int] = request_complexity,
+    ):
+        """
+        Tiers go from the cheapest to the most capable model; a request scoring
+        at most thresholds[i] starts on tiers[i], anything above on the last one
+        """
+        if not tiers:
+            raise ValueError("A model router needs at least one tier")
+        self.tiers = tuple(tiers)
+        self.thresholds = tuple(thresholds)
+        self.classify = classify
+        self.tier_stats = [TierStats() for _ in self.tiers]
+        self._lock = Lock()
+
+    @property
+    def top(self) -> int:
+        return len(self.tiers) - 1
+
+    def tier_name(self, tier: int) -> str:
+        model = self.tiers[tier]
+        if isinstance(model, tuple):
+            return "+".join(LLMModel(m).value for m in model)
+        return LLMModel(model).value
+
+    def route(self, messages) -> int:
+        """
+        Route: The starting tier for the latest user message
+        """
+        text = next(
+            (message_text(m.content) for m in reversed(messages) if m.type == "human"),
+            "",
+        )
+        score = self.classify(text)
+        tier = next(
+            (i for i, limit in enumerate(self.thresholds) if score <= limit),
+            len(self.thresholds),
+        )
+        tier = min(tier, self.top)
+        with self._lock:
+            self.tier_stats[tier].routed += 1
+            self.tier_stats[tier].scores[score] += 1
+        print_debug_msg(
+            "Routing request scoring %s to %s", score, self.tier_name(tier)
+        )
+        return tier
+
+    def record_call(self, tier: int, seconds: float):
+        with self._lock:
+            self.tier_stats[tier].latencies.append(seconds)
+
+    def succeeded(self, tier: int):
+        with self._lock:
+            self.tier_stats[tier].successes += 1
+
+    def escalate(self, tier: int, error: BaseException) -> Optional[int]:
+        """
+        Escalate: The next tier after a failed answer, or None from the top one
+        """
+        with self._lock:
+            self.tier_stats[tier].escalations += 1
+        if tier >= self.top:
+            return None
+        print_warning_msg(
+            "Escalating from %s to %s: %s",
+            self.tier_name(tier),
+            self.tier_name(tier + 1),
+            error,
+        )
+        return tier + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                self.tier_name(i): s.stats() for i, s in enumerate(self.tier_stats)
+            }
+
+
+@cache
+def get_model_router() -> Optional[ModelRouter]:
+    # MODEL_ROUTER=0 sends every request to the agent's own model.
+    if os.getenv("MODEL_ROUTER", "1") == "0":
+        return None
+    tiers = os.getenv("MODEL_ROUTER_TIERS", "gpt-4o-mini,gpt-4o").split(",")
+    thresholds = os.getenv("MODEL_ROUTER_THRESHOLDS", "2").split(",")
+    return ModelRouter(
+        [LLMModel(t.strip()) for t in tiers],
+        [int(t) for t in thresholds if t.strip()],
+    )
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import random
+import time
+from functools import cache
+from importlib.util import find_spec
+from typing import Optional, Tuple
+
+import httpx
+
+from agentic_webapp.dmbr.cache import TTLCache
+from agentic_webapp.dmbr.mock_openweathermap import mock_weather_transport
+from agentic_webapp.dmbr.term import print_warning_msg
+
+
+OPENWEATHERMAP_URL = "https://api.openweathermap.org/data/2.5/weather"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def location_key(
+    city: str, state: Optional[str] = None, country: Optional[str] = None
+) -> Tuple[str, Optional[str], Optional[str]]:
+    return tuple(
+        " ".join(part.split()).casefold() if part else None
+        for part in (city, state, country)
+    )
+
+
+def is_successful_prediction(prediction: dict) -> bool:
+    # Errors (unknown city, bad key) come back as JSON with a non-200 "cod".
+    return str(prediction.get("cod")) == "200"
+
+
+def response_prediction(response: httpx.Response) -> dict:
+    """
+    Response Prediction: The JSON body, or an error in the same shape as the API's
+    own for a body that is not JSON (a proxy's HTML error page, an empty 5xx)
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return dict(
+            cod=str(response.status_code),
+            message=f"Weather prediction failed with HTTP {response.status_code}",
+        )
+
+
+class OpenWeatherMapClient:
+    """
+    OpenWeatherMap: Pooled keep-alive client shared by the weather tools
+    """
+
+    def __init__(
+        self,
+        base_url: str = OPENWEATHERMAP_URL,
+        api_key: Optional[str] = None,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        retries: int = 2,
+        backoff: float = 0.25,
+        cache: Optional[TTLCache] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+    ):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = find_spec("h2") is not None
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.transport = transport
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._aclient_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+        return self._client
+
+    @property
+    def aclient(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them, so a new loop
+        # (asyncio.run in scripts) gets its own client.
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                transport=self.transport,
+            )
+            self._aclient_loop = loop
+        return self._aclient
+
+    def params(
+        self, city: str, state: Optional[str] = None, country: Optional[str] = None
+    ) -> dict:
+        location = ",".join(part for part in (city, state, country) if part)
+        app_id = self.api_key or os.getenv("OPENWEATHERMAP_API_KEY")
+        return dict(q=location, APPID=app_id)
+
+    def _delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        delay = self.backoff * 2**attempt
+        return delay + random.uniform(0, delay)
+
+    def _fetch_weather(
+        self, city: str, state: Optional[str] = None, country: Optional[str] = None
+    ) -> dict:
+        params = self.params(city, state, country)
+        attempt = 0
+        while True:
+            try:
+                response = self.client.get(self.base_url, params=params)
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                retry = response.status_code in RETRY_STATUS_CODES
+                if not retry or attempt >= self.retries:
+                    return response_prediction(response)
+                delay = self._delay(attempt, response)
+            print_warning_msg("Retrying weather for %s in %.2fs", params["q"], delay)
+            time.sleep(delay)
+            attempt += 1
+
+    async def _afetch_weather(
+        self, city: str, state: Optional[str] = None, country: Optional[str] = None
+    ) -> dict:
+        params = self.params(city, state, country)
+        attempt = 0
+        while True:
+            try:
+                response = await self.aclient.get(self.base_url, params=params)
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                retry = response.status_code in RETRY_STATUS_CODES
+                if not retry or attempt >= self.retries:
+                    return response_prediction(response)
+                delay = self._delay(attempt, response)
+            print_warning_msg("Retrying weather for %s in %.2fs", params["q"], delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def get_weather(
+        self, city: str, state: Optional[str] = None, country: Optional[str] = None
+    ) -> dict:
+        if self.cache is None:
+            return self._fetch_weather(city, state, country)
+        return self.cache.get_or_load(
+            location_key(city, state, country),
+            lambda: self._fetch_weather(city, state, country),
+            cacheable=is_successful_prediction,
+        )
+
+    async def aget_weather(
+        self, city: str, state: Optional[str] = None, country: Optional[str] = None
+    ) -> dict:
+        if self.cache is None:
+            return await self._afetch_weather(city, state, country)
+        return await self.cache.aget_or_load(
+            location_key(city, state, country),
+            lambda: self._afetch_weather(city, state, country),
+            cacheable=is_successful_prediction,
+        )
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+            self._aclient_loop = None
+
+
+@cache
+def get_weather_client() -> OpenWeatherMapClient:
+    return OpenWeatherMapClient(
+        base_url=os.getenv("OPENWEATHERMAP_URL", OPENWEATHERMAP_URL),
+        timeout=float(os.getenv("OPENWEATHERMAP_TIMEOUT", "10")),
+        retries=int(os.getenv("OPENWEATHERMAP_RETRIES", "2")),
+        cache=TTLCache(
+            maxsize=int(os.getenv("OPENWEATHERMAP_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("OPENWEATHERMAP_CACHE_TTL", "600")),
+        ),
+        transport=mock_weather_transport(),
+    )
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+from threading import RLock
+from typing import Callable, Dict
+
+from agentic_webapp.dmbr.agent import Agent
+from agentic_webapp.dmbr.term import print_debug_msg
+
+
+# Agent name -> function building it; see get_agent
+AGENT_FACTORIES: Dict[str, Callable[[], Agent]] = {}
+
+_agents: Dict[str, Agent] = {}
+# Reentrant, as a factory may build its delegates through get_agent.
+_agents_lock = RLock()
+
+
+def agent_factory(name: str):
+    """
+    Agent Factory: Declare how the named agent is built, the first time it is needed
+    """
+
+    def register(factory: Callable[[], Agent]) -> Callable[[], Agent]:
+        AGENT_FACTORIES[name] = factory
+        return factory
+
+    return register
+
+
+def get_agent(name: str) -> Agent:
+    """
+    Agent Registry: The named agent, built once and shared, since a compiled graph
+    keeps no per-run state and can serve concurrent invocations
+    """
+    agent = _agents.get(name)
+    if agent is not None:
+        return agent
+    if name not in AGENT_FACTORIES:
+        raise ValueError(f"Agent {name} not found")
+    with _agents_lock:
+        if name not in _agents:
+            print_debug_msg("Building agent %s", name)
+            _agents[name] = AGENT_FACTORIES[name]()
+        return _agents[name]
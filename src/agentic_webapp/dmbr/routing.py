@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import CallbackManager
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.chat_models import (
+    agenerate_from_stream,
+    generate_from_stream,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import Field
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from agentic_webapp.dmbr.streaming import NOSTREAM_TAG
+from agentic_webapp.dmbr.term import print_debug_msg, print_warning_msg
+
+
+class LatencyStats:
+    """
+    Latency Stats: Recent time to first token per model, and how often requests
+    failed over or were hedged
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self.first_token: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self.first_token[name].append(seconds)
+
+    def quantile(self, name: str, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.first_token[name])
+        if len(samples) < self.min_samples:
+            return None
+        return samples[int(q * (len(samples) - 1))]
+
+    def stats(self) -> dict:
+        return dict(
+            failovers=self.failovers,
+            hedges=self.hedges,
+            hedge_wins=self.hedge_wins,
+            p95_first_token={
+                name: self.quantile(name, 0.95) for name in list(self.first_token)
+            },
+        )
+
+
+class RoutingChatModel(BaseChatModel):
+    """
+    Routing LLM: Equivalent models in order of preference; fails over to the next
+    one on errors (429s included) before the first token, and can hedge a slow
+    first token with a duplicate request to the next model, keeping the faster
+    """
+
+    models: List[Runnable]
+    names: List[str]
+    # Hedge once the first token is later than this quantile of the model's
+    # recent first token latencies, or than hedge_after until enough are known.
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_after: float = 2.0
+    min_hedge_delay: float = 0.05
+    stats: LatencyStats = Field(default_factory=LatencyStats)
+
+    @property
+    def _llm_type(self) -> str:
+        return "routing-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return dict(models=self.names, hedge=self.hedge)
+
+    def bind_tools(
+        self, tools: Sequence[Any], tool_choice: Optional[Any] = None, **kwargs
+    ) -> "RoutingChatModel":
+        # Every binding shares the latency stats, as the providers are the same.
+        models = [self._bind(m, tools, tool_choice, **kwargs) for m in self.models]
+        # copy() would drop the callbacks and tags, which are excluded fields.
+        return self.__class__(**{**self.__dict__, "models": models})
+
+    def _bind(self, model, tools, tool_choice, **kwargs):
+        if tool_choice is None:
+            return model.bind_tools(tools, **kwargs)
+        try:
+            return model.bind_tools(tools, tool_choice=tool_choice, **kwargs)
+        except ValueError as e:
+            print_debug_msg("Tool choice not supported, falling back to auto: %s", e)
+            return model.bind_tools(tools, **kwargs)
+
+    def hedge_delay(self, name: str) -> float:
+        delay = self.stats.quantile(name, self.hedge_quantile)
+        return max(self.min_hedge_delay, self.hedge_after if delay is None else delay)
+
+    def _child_config(self, run_manager) -> RunnableConfig:
+        # The router reports the tokens; the chosen model's own events are kept
+        # out of the token stream, and no callbacks are inherited without a run.
+        if run_manager is None:
+            return dict(callbacks=[])
+        # LLM run managers have no get_child, the child manager is built alike.
+        manager = CallbackManager(handlers=[], parent_run_id=run_manager.run_id)
+        manager.set_handlers(run_manager.inheritable_handlers)
+        manager.add_tags(run_manager.inheritable_tags + [NOSTREAM_TAG])
+        manager.add_metadata(run_manager.inheritable_metadata)
+        return dict(callbacks=manager)
+
+    def _failed(self, i: int, error: BaseException):
+        self.stats.failovers += 1
+        print_warning_msg("LLM %s failed, failing over: %r", self.names[i], error)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs,
+    ) -> Iterator[ChatGenerationChunk]:
+        config = self._child_config(run_manager)
+        error = None
+        for i, model in enumerate(self.models):
+            started = time.perf_counter()
+            stream = model.stream(messages, config, stop=stop, **kwargs)
+            try:
+                first = next(stream)
+            except Exception as e:
+                self._failed(i, e)
+                error = e
+                continue
+            self.stats.record(self.names[i], time.perf_counter() - started)
+            yield ChatGenerationChunk(message=first)
+            for chunk in stream:
+                yield ChatGenerationChunk(message=chunk)
+            return
+        raise error
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs,
+    ) -> ChatResult:
+        return generate_from_stream(
+            self._stream(messages, stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _first_chunk(self, i: int, messages, config, **kwargs):
+        started = time.perf_counter()
+        stream = self.models[i].astream(messages, config, **kwargs)
+        first = await stream.__anext__()
+        self.stats.record(self.names[i], time.perf_counter() - started)
+        return stream, first
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        config = self._child_config(run_manager)
+        loop = asyncio.get_running_loop()
+        waiting = list(range(len(self.models)))
+        running: Dict[asyncio.Task, int] = {}
+        started: Dict[int, float] = {}
+        primary = None
+        hedged = False
+        error = None
+
+        def start(i: int):
+            task = asyncio.create_task(
+                self._first_chunk(i, messages, config, stop=stop, **kwargs)
+            )
+            running[task] = i
+            started[i] = time.perf_counter()
+
+        try:
+            while True:
+                if not running:
+                    if not waiting:
+                        raise error
+                    primary = waiting.pop(0)
+                    start(primary)
+                    deadline = loop.time() + self.hedge_delay(self.names[primary])
+                timeout = None
+                if self.hedge and not hedged and waiting:
+                    timeout = max(0.0, deadline - loop.time())
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    self.stats.hedges += 1
+                    print_debug_msg("Hedging with LLM %s", self.names[waiting[0]])
+                    start(waiting.pop(0))
+                    continue
+                ready = {}
+                for task in done:
+                    i = running.pop(task)
+                    try:
+                        ready[i] = task.result()
+                    except Exception as e:
+                        self._failed(i, e)
+                        error = e
+                if not ready:
+                    continue
+                # The first to produce a token wins; the others are cancelled.
+                winner = min(ready)
+                now = time.perf_counter()
+                for task, i in running.items():
+                    task.cancel()
+                    # Its first token would have come later still; the wait so
+                    # far is a lower bound, which keeps the slow tail in the
+                    # hedge quantile that winners alone would pull down.
+                    self.stats.record(self.names[i], now - started[i])
+                running.clear()
+                for i, (stream, _) in ready.items():
+                    if i != winner:
+                        await stream.aclose()
+                if winner != primary:
+                    self.stats.hedge_wins += 1
+                stream, first = ready[winner]
+                try:
+                    yield ChatGenerationChunk(message=first)
+                    async for chunk in stream:
+                        yield ChatGenerationChunk(message=chunk)
+                finally:
+                    await stream.aclose()
+                return
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        **kwargs,
+    ) -> ChatResult:
+        return await agenerate_from_stream(
+            self._astream(messages, stop, run_manager=run_manager, **kwargs)
+        )
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Scheduler: admission control for calls to rate limited providers.
+
+Every LLM and tool call takes a ticket on the lane of its provider and model
+first. A lane passes tickets when its token buckets (requests and tokens per
+minute) allow, taking turns between sessions so one busy conversation cannot
+starve the others. A call is rejected at once with Overloaded when its lane is
+full, or when it would wait past the deadline.
+
+Providers limit each model on its own, so a model's limits replace its
+provider's; models without limits of their own share the provider's buckets.
+
+Limits come from RATE_LIMITS, comma separated "provider[:model]=rpm[/tpm]",
+where "default" stands for DEFAULT_LIMITS; calls are not limited without it:
+
+    RATE_LIMITS="default,openai:gpt-4o=5000/450000"
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from functools import cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from agentic_webapp.dmbr.term import print_debug_msg, print_warning_msg
+
+
+# Requests and tokens per minute; the lowest tier of each provider's plans
+DEFAULT_LIMITS: Dict[str, Tuple[float, Optional[float]]] = {
+    "openai": (500, 30_000),
+    "openai:gpt-4o": (500, 30_000),
+    "openai:gpt-4o-mini": (500, 200_000),
+    "anthropic": (50, 40_000),
+    "groq": (30, 6_000),
+    "openweathermap": (60, None),
+}
+
+DEFAULT_SESSION = "default"
+
+
+class Overloaded(RuntimeError):
+    """
+    Overloaded: The call was shed instead of queued, try again later
+    """
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, Optional[float]]]:
+    limits = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        if entry.lower() == "default":
+            limits.update(DEFAULT_LIMITS)
+            continue
+        key, _, value = entry.partition("=")
+        rpm, _, tpm = value.partition("/")
+        limits[key.strip()] = (float(rpm), float(tpm) if tpm else None)
+    return limits
+
+
+class TokenBucket:
+    """
+    Token Bucket: Refills at per_minute / 60 a second, holding up to burst; a
+    call larger than the burst passes on a full bucket and leaves it in debt
+    """
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60
+        # Ten seconds worth by default, so bursts are spread over the minute.
+        self.capacity = burst or max(1.0, per_minute / 6)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        # Tickets queued on this bucket, from any lane, and the amount they ask for
+        self.waiters = 0
+        self.pending = 0.0
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, amount: float, now: float) -> float:
+        self.refill(now)
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def backlog(self, amount: float, now: float, share: float = 1.0) -> float:
+        """
+        Backlog: Time for this amount to get through, behind the given share of
+        the queued tickets
+        """
+        self.refill(now)
+        needed = (self.pending + min(amount, self.capacity)) * share - self.level
+        return max(0.0, needed / self.rate)
+
+
+class Ticket:
+    """
+    Ticket: One call waiting on a lane
+    """
+
+    __slots__ = ("lane", "session", "tokens", "enqueued", "deadline", "wake", "error")
+
+    def __init__(self, lane: "Lane", session: str, tokens: float, deadline: float):
+        self.lane = lane
+        self.session = session
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+        self.wake: Optional[Callable[[], None]] = None
+        self.error: Optional[Overloaded] = None
+
+    def amount(self, bucket: TokenBucket) -> float:
+        return 1 if bucket in self.lane.request_buckets else self.tokens
+
+    def settle(self, tokens: Optional[float]):
+        """
+        Settle: Charge the tokens actually used instead of the estimate
+        """
+        if tokens is None:
+            return
+        with self.lane.lock:
+            for bucket in self.lane.token_buckets:
+                bucket.level += self.tokens - tokens
+            self.tokens = tokens
+
+
+class Lane:
+    """
+    Lane: The queue of one provider and model, served round robin by session
+    """
+
+    def __init__(
+        self,
+        key: str,
+        request_buckets: List[TokenBucket],
+        token_buckets: List[TokenBucket],
+        lock: threading.Lock,
+        window: int = 1000,
+    ):
+        self.key = key
+        self.request_buckets = request_buckets
+        self.token_buckets = token_buckets
+        self.lock = lock
+        self.sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self.depth = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed_full = 0
+        self.shed_deadline = 0
+        self.expired = 0
+        self.queue_times: deque = deque(maxlen=window)
+
+    @property
+    def buckets(self) -> List[TokenBucket]:
+        return self.request_buckets + self.token_buckets
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.request_buckets or self.token_buckets)
+
+    @property
+    def idle(self) -> bool:
+        """
+        Idle: Nothing queued on the lane's buckets, in this lane or in the lanes of
+        the other models sharing them
+        """
+        return not any(bucket.waiters for bucket in self.buckets)
+
+    def wait(self, ticket: Ticket, now: float) -> float:
+        return max(
+            (b.wait(ticket.amount(b), now) for b in self.buckets), default=0.0
+        )
+
+    def share(self, ticket: Ticket) -> float:
+        """
+        Share: Fraction of the queue served before a new ticket; taking turns, at
+        most as many tickets of every other session as its own has queued, plus one
+        """
+        turns = len(self.sessions.get(ticket.session, ())) + 1
+        ahead = sum(
+            min(len(tickets), turns)
+            for session, tickets in self.sessions.items()
+            if session != ticket.session
+        )
+        return (ahead + turns) / (self.depth + 1)
+
+    def backlog(self, ticket: Ticket, now: float) -> float:
+        share = self.share(ticket)
+        return max(
+            (b.backlog(ticket.amount(b), now, share) for b in self.buckets),
+            default=0.0,
+        )
+
+    def push(self, ticket: Ticket):
+        self.sessions.setdefault(ticket.session, deque()).append(ticket)
+        self.depth += 1
+        self.queued += 1
+        for bucket in self.buckets:
+            bucket.waiters += 1
+            bucket.pending += ticket.amount(bucket)
+
+    def _forget(self, ticket: Ticket):
+        self.depth -= 1
+        for bucket in self.buckets:
+            bucket.waiters -= 1
+            bucket.pending -= ticket.amount(bucket)
+
+    def peek(self) -> Optional[Ticket]:
+        if not self.sessions:
+            return None
+        return self.sessions[next(iter(self.sessions))][0]
+
+    def pop(self) -> Ticket:
+        # The session served goes to the back of the line.
+        session, tickets = self.sessions.popitem(last=False)
+        ticket = tickets.popleft()
+        if tickets:
+            self.sessions[session] = tickets
+        self._forget(ticket)
+        return ticket
+
+    def remove(self, ticket: Ticket) -> bool:
+        tickets = self.sessions.get(ticket.session)
+        if tickets is None or ticket not in tickets:
+            return False
+        tickets.remove(ticket)
+        if not tickets:
+            del self.sessions[ticket.session]
+        self._forget(ticket)
+        return True
+
+    def grant(self, ticket: Ticket, now: float):
+        for bucket in self.buckets:
+            bucket.level -= ticket.amount(bucket)
+        self.admitted += 1
+        self.queue_times.append(now - ticket.enqueued)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.queue_times:
+            return None
+        samples = sorted(self.queue_times)
+        return samples[int(q * (len(samples) - 1))]
+
+    def stats(self) -> dict:
+        return dict(
+            depth=self.depth,
+            sessions=len(self.sessions),
+            admitted=self.admitted,
+            queued=self.queued,
+            shed_full=self.shed_full,
+            shed_deadline=self.shed_deadline,
+            expired=self.expired,
+            p50_queue_time=self.quantile(0.5),
+            p95_queue_time=self.quantile(0.95),
+            max_queue_time=max(self.queue_times, default=None),
+        )
+
+
+class Scheduler:
+    """
+    Scheduler: Lanes per provider and model, with the model's buckets or else the
+    provider's, served by one background thread for sync and async callers alike
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, Optional[float]]]] = None,
+        max_queue: int = 100,
+        max_wait: float = 10.0,
+    ):
+        self.limits = dict(limits or {})
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.lanes: Dict[str, Lane] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def _bucket(self, name: str, per_minute: Optional[float]) -> List[TokenBucket]:
+        if not per_minute:
+            return []
+        if name not in self.buckets:
+            self.buckets[name] = TokenBucket(per_minute)
+        return [self.buckets[name]]
+
+    def lane(self, provider: str, model: Optional[str] = None) -> Lane:
+        key = provider if model is None else f"{provider}:{model}"
+        lane = self.lanes.get(key)
+        if lane is not None:
+            return lane
+        with self._lock:
+            if key not in self.lanes:
+                name = key if key in self.limits else provider
+                rpm, tpm = self.limits.get(name, (None, None))
+                self.lanes[key] = Lane(
+                    key,
+                    self._bucket(f"{name} requests", rpm),
+                    self._bucket(f"{name} tokens", tpm),
+                    self._lock,
+                )
+            return self.lanes[key]
+
+    def _admit(self, ticket: Ticket) -> bool:
+        """
+        Admit: Grant the ticket now, queue it, or raise Overloaded; True if granted
+        """
+        lane = ticket.lane
+        now = time.monotonic()
+        if lane.idle and lane.wait(ticket, now) == 0:
+            lane.grant(ticket, now)
+            return True
+        if lane.depth >= self.max_queue:
+            lane.shed_full += 1
+            print_warning_msg("Shedding call on %s: queue full", lane.key)
+            raise Overloaded(f"{lane.key} queue is full ({lane.depth} calls)")
+        if now + lane.backlog(ticket, now) > ticket.deadline:
+            lane.shed_deadline += 1
+            print_warning_msg("Shedding call on %s: wait past deadline", lane.key)
+            raise Overloaded(f"{lane.key} is rate limited past the deadline")
+        lane.push(ticket)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, daemon=True)
+            self._thread.start()
+        self._wakeup.notify()
+        return False
+
+    def _dispatch(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                next_wake = None
+                for lane in list(self.lanes.values()):
+                    while (ticket := lane.peek()) is not None:
+                        wait = lane.wait(ticket, now)
+                        if wait > 0 and ticket.deadline < now:
+                            lane.pop()
+                            lane.expired += 1
+                            ticket.error = Overloaded(
+                                f"{lane.key} did not admit the call in time"
+                            )
+                            ticket.wake()
+                            continue
+                        if wait > 0:
+                            # Woken for the ticket's turn, or to expire it.
+                            wake = now + min(wait, ticket.deadline - now + 1e-3)
+                            next_wake = min(next_wake or wake, wake)
+                            break
+                        lane.pop()
+                        lane.grant(ticket, now)
+                        ticket.wake()
+                timeout = None if next_wake is None else max(0.0, next_wake - now)
+                self._wakeup.wait(timeout)
+
+    def _ticket(
+        self,
+        provider: str,
+        model: Optional[str],
+        tokens: float,
+        session: Optional[str],
+        max_wait: Optional[float],
+    ) -> Ticket:
+        wait = self.max_wait if max_wait is None else max_wait
+        return Ticket(
+            self.lane(provider, model),
+            session or DEFAULT_SESSION,
+            tokens,
+            time.monotonic() + wait,
+        )
+
+    def acquire(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        tokens: float = 0,
+        session: Optional[str] = None,
+        max_wait: Optional[float] = None,
+    ) -> Ticket:
+        """
+        Acquire: Block until the call may go, or raise Overloaded
+        """
+        ticket = self._ticket(provider, model, tokens, session, max_wait)
+        if not ticket.lane.limited:
+            ticket.lane.admitted += 1
+            return ticket
+        granted = threading.Event()
+        ticket.wake = granted.set
+        with self._lock:
+            if self._admit(ticket):
+                return ticket
+        print_debug_msg("Queued call on %s", ticket.lane.key)
+        granted.wait()
+        if ticket.error is not None:
+            raise ticket.error
+        return ticket
+
+    async def aacquire(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        tokens: float = 0,
+        session: Optional[str] = None,
+        max_wait: Optional[float] = None,
+    ) -> Ticket:
+        ticket = self._ticket(provider, model, tokens, session, max_wait)
+        if not ticket.lane.limited:
+            ticket.lane.admitted += 1
+            return ticket
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        ticket.wake = wake
+        with self._lock:
+            if self._admit(ticket):
+                return ticket
+        print_debug_msg("Queued call on %s", ticket.lane.key)
+        try:
+            await granted
+        except asyncio.CancelledError:
+            # A client gone while queued gives its place back.
+            with self._lock:
+                ticket.lane.remove(ticket)
+            raise
+        if ticket.error is not None:
+            raise ticket.error
+        return ticket
+
+    @contextmanager
+    def slot(self, provider: str, model: Optional[str] = None, **kwargs) -> Iterator:
+        yield self.acquire(provider, model, **kwargs)
+
+    @asynccontextmanager
+    async def aslot(self, provider: str, model: Optional[str] = None, **kwargs):
+        yield await self.aacquire(provider, model, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            return dict(
+                lanes={key: lane.stats() for key, lane in self.lanes.items()},
+                buckets={
+                    name: dict(level=b.level, capacity=b.capacity)
+                    for name, b in self.buckets.items()
+                },
+            )
+
+
+@cache
+def get_scheduler() -> Scheduler:
+    spec = os.getenv("RATE_LIMITS", "none")
+    limits = {} if spec.strip().lower() == "none" else parse_limits(spec)
+    print_debug_msg("Rate limits: %s", limits)
+    return Scheduler(
+        limits,
+        max_queue=int(os.getenv("SCHEDULER_MAX_QUEUE", "100")),
+        max_wait=float(os.getenv("SCHEDULER_MAX_WAIT", "10")),
+    )
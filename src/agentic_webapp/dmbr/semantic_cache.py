@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from functools import cache
+from importlib.util import find_spec
+from pathlib import Path
+from threading import Lock
+from typing import Callable, List, Optional
+
+import lancedb
+import numpy as np
+import pyarrow as pa
+from langchain_core.messages import HumanMessage
+
+from agentic_webapp.dmbr.term import print_debug_msg
+from agentic_webapp.utils import ROOT_DIR
+
+
+# Requests carrying this header with the value "bypass" skip the lookup.
+BYPASS_HEADER = "X-Semantic-Cache"
+
+# Filler that does not change what a weather or chat question asks for
+STOPWORDS = frozenset(
+    "a an and are be can could do does for how how's i in is it like me of on "
+    "please s tell the to today what what's whats will would you".split()
+)
+
+Embedding = Callable[[str], List[float]]
+
+
+def normalize_prompt(prompt: str) -> str:
+    words = re.sub(r"[^\w\s']", " ", prompt.casefold()).split()
+    kept = [w for w in words if w not in STOPWORDS]
+    return " ".join(kept or words)
+
+
+def hashing_embedding(dimensions: int = 256) -> Embedding:
+    """
+    Hashing Embedding: Deterministic, local bag of words and character trigrams;
+    catches rewordings of the same question, not true paraphrases
+    """
+
+    def embed(text: str) -> List[float]:
+        vector = np.zeros(dimensions, dtype=np.float32)
+        padded = f" {text} "
+        features = text.split() + [padded[i : i + 3] for i in range(len(padded) - 2)]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    return embed
+
+
+def sentence_transformer_embedding(model_name: str = "all-MiniLM-L6-v2") -> Embedding:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name)
+
+    def embed(text: str) -> List[float]:
+        return model.encode(text, normalize_embeddings=True).tolist()
+
+    return embed
+
+
+def default_embedding() -> Embedding:
+    # A local sentence model recognizes paraphrases; hashing is the fallback.
+    if find_spec("sentence_transformers") is not None:
+        return sentence_transformer_embedding()
+    return hashing_embedding()
+
+
+def is_first_turn(messages) -> bool:
+    """
+    First Turn: Whether the conversation has at most one user message, so its
+    answer depends on the prompt alone and can be shared across conversations
+    """
+    return sum(isinstance(m, HumanMessage) for m in messages or []) <= 1
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class SemanticCache:
+    """
+    Semantic Cache: Final answers stored in LanceDB by prompt embedding, returned
+    for later prompts that are close enough while the entry is fresh
+    """
+
+    def __init__(
+        self,
+        uri: str = f"{ROOT_DIR}/data/semantic_cache",
+        table_name: str = "answers",
+        embed: Optional[Embedding] = None,
+        threshold: float = 0.9,
+        ttl: float = 3600,
+        index_min_rows: int = 5000,
+        purge_every: int = 100,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.uri = uri
+        self.table_name = table_name
+        self.embed = embed or default_embedding()
+        self.dimensions = len(self.embed("dimensions"))
+        self.threshold = threshold
+        self.ttl = ttl
+        self.index_min_rows = index_min_rows
+        self.purge_every = purge_every
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self._indexed_rows = 0
+        self._lock = Lock()
+        self._table = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            Path(self.uri).mkdir(parents=True, exist_ok=True)
+            db = lancedb.connect(self.uri)
+            schema = pa.schema(
+                [
+                    pa.field("vector", pa.list_(pa.float32(), self.dimensions)),
+                    pa.field("namespace", pa.string()),
+                    pa.field("prompt", pa.string()),
+                    pa.field("answer", pa.string()),
+                    pa.field("created", pa.float64()),
+                ]
+            )
+            self._table = db.create_table(self.table_name, schema=schema, exist_ok=True)
+        return self._table
+
+    def lookup(self, namespace: str, prompt: str) -> Optional[str]:
+        normalized = normalize_prompt(prompt)
+        cutoff = self.clock() - self.ttl
+        with self._lock:
+            rows = (
+                self.table.search(self.embed(normalized))
+                .metric("cosine")
+                .where(
+                    f"namespace = {_quote(namespace)} AND created >= {cutoff}",
+                    prefilter=True,
+                )
+                .limit(1)
+                .to_list()
+            )
+        # Cosine distance is 1 - similarity.
+        if rows and 1 - rows[0]["_distance"] >= self.threshold:
+            self.hits += 1
+            print_debug_msg("Semantic cache hit: %r ~ %r", prompt, rows[0]["prompt"])
+            return rows[0]["answer"]
+        self.misses += 1
+        return None
+
+    def store(self, namespace: str, prompt: str, answer: str):
+        normalized = normalize_prompt(prompt)
+        row = dict(
+            vector=self.embed(normalized),
+            namespace=namespace,
+            prompt=prompt,
+            answer=answer,
+            created=self.clock(),
+        )
+        with self._lock:
+            self.table.add([row])
+            self.stores += 1
+            if self.stores % self.purge_every == 0:
+                self.table.delete(f"created < {self.clock() - self.ttl}")
+            self._maybe_index()
+
+    def _maybe_index(self):
+        # IVF-PQ needs enough rows to train on; rebuild as the table doubles.
+        rows = self.table.count_rows()
+        if rows < max(self.index_min_rows, 2 * self._indexed_rows):
+            return
+        self.table.create_index(
+            metric="cosine",
+            num_partitions=max(1, int(rows**0.5)),
+            num_sub_vectors=max(1, self.dimensions // 16),
+            replace=True,
+        )
+        self._indexed_rows = rows
+
+    async def alookup(self, namespace: str, prompt: str) -> Optional[str]:
+        return await asyncio.to_thread(self.lookup, namespace, prompt)
+
+    async def astore(self, namespace: str, prompt: str, answer: str):
+        await asyncio.to_thread(self.store, namespace, prompt, answer)
+
+    def bypass(self, headers) -> bool:
+        if headers.get(BYPASS_HEADER, "").lower() == "bypass":
+            self.bypassed += 1
+            return True
+        return False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            bypassed=self.bypassed,
+            stores=self.stores,
+            threshold=self.threshold,
+            ttl=self.ttl,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+        )
+
+
+@cache
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Semantic Cache: The process wide cache, or None unless SEMANTIC_CACHE=1
+    """
+    if os.getenv("SEMANTIC_CACHE", "0") != "1":
+        return None
+    return SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+    )
@@ -39,4 +39,4 @@ if __name__ == "__main__":
             break
         for event in simple_chat_flow.stream(dict(messages=("user", user_input))):
             for value in event.values():
-                print_assistant_msg(f"Assistant: {value['messages'].content}")
+                print_assistant_msg("Assistant: %s", value["messages"].content)
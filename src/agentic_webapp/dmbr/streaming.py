@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import json
+from typing import Any, AsyncIterator, Iterable, Optional, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+# Models called with this tag (e.g. for summaries) are never streamed to the user.
+NOSTREAM_TAG = "nostream"
+
+# Custom event carrying {delegate, task, result} as each delegate task finishes
+DELEGATE_RESULT_EVENT = "delegate_result"
+
+
+def message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # Anthropic style content blocks
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
+async def astream_graph_tokens(
+    graph: Runnable,
+    input: Any,
+    nodes: Optional[Iterable[str]] = None,
+    config: Optional[RunnableConfig] = None,
+    answer_tool: Optional[str] = None,
+) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Stream Tokens: Yield ("token", text) for each LLM delta produced inside the given
+    nodes (all nodes when None), ("answer", text) for each delta of the arguments
+    of answer_tool calls, ("delegate", {delegate, task, result}) as each delegate
+    task finishes, and ("update", {node: output}) as each node finishes
+    """
+    nodes = None if nodes is None else set(nodes)
+    streamed = set()
+    # (run id, tool call index) of the answer_tool calls being streamed
+    answering = set()
+
+    def answer_deltas(run_id, tool_call_chunks) -> str:
+        deltas = []
+        for chunk in tool_call_chunks:
+            # Only the first chunk of a call carries its name.
+            call = (run_id, chunk["index"])
+            if chunk.get("name") == answer_tool:
+                answering.add(call)
+            if call in answering and chunk.get("args"):
+                deltas.append(chunk["args"])
+        return "".join(deltas)
+
+    async for event in graph.astream_events(input, config, version="v2"):
+        kind = event["event"]
+        if kind in ("on_chat_model_stream", "on_chat_model_end"):
+            node = event["metadata"].get("langgraph_node")
+            if nodes is not None and node not in nodes:
+                continue
+            if NOSTREAM_TAG in event["tags"]:
+                continue
+            run_id = event["run_id"]
+            answer = ""
+            if kind == "on_chat_model_stream":
+                streamed.add(run_id)
+                chunk = event["data"]["chunk"]
+                text = message_text(chunk.content)
+                if answer_tool is not None:
+                    answer = answer_deltas(run_id, chunk.tool_call_chunks)
+            elif run_id not in streamed:
+                # Cached (or non-streaming) completions are replayed as one token.
+                output = event["data"]["output"]
+                text = message_text(output.content)
+                answer = "".join(
+                    json.dumps(t["args"])
+                    for t in output.tool_calls
+                    if t["name"] == answer_tool
+                )
+            else:
+                streamed.discard(run_id)
+                answering.difference_update([c for c in answering if c[0] == run_id])
+                continue
+            if text:
+                yield "token", text
+            if answer:
+                yield "answer", answer
+        elif kind == "on_custom_event" and event["name"] == DELEGATE_RESULT_EVENT:
+            yield "delegate", event["data"]
+        elif kind == "on_chain_stream" and not event["parent_ids"]:
+            yield "update", event["data"]["chunk"]
@@ -36,7 +36,8 @@ class MsgsState(TypedDict):
     code_sample: SampleCode
 
 
-llm = get_llm(LLMModel.GPT4_Omni_mini)
+# Deterministic, so repeated questions are answered from the completion cache.
+llm = get_llm(LLMModel.GPT4_Omni_mini, temperature=0)
 structured_llm = llm.with_structured_output(SampleCode)
 
 
@@ -70,7 +71,7 @@ if __name__ == "__main__":
             for value in event.values():
                 print_debug_msg(value)
                 if "code_sample" in value:
-                    print_assistant_msg(f"Professor:\n{value['code_sample'].markdown}")
-                    print_assistant_msg(f"Professor:\n{value['code_sample'].code}")
+                    print_assistant_msg("Professor:\n%s", value["code_sample"].markdown)
+                    print_assistant_msg("Professor:\n%s", value["code_sample"].code)
                 else:
-                    print_assistant_msg(f"Professor:\n{value['messages'].content}")
+                    print_assistant_msg("Professor:\n%s", value["messages"].content)
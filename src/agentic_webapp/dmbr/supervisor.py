@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from contextvars import copy_context
+from threading import BoundedSemaphore
+from typing import Dict, List, Optional
+
+from langchain_core.callbacks.manager import (
+    adispatch_custom_event,
+    dispatch_custom_event,
+)
+from langchain_core.messages import HumanMessage
+from langchain_core.messages.tool import ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from agentic_webapp.dmbr.streaming import DELEGATE_RESULT_EVENT, message_text
+from agentic_webapp.dmbr.term import print_debug_msg, print_error_msg
+
+
+def delegate_result(result: dict) -> str:
+    output = result.get("output")
+    if output is not None:
+        return output.model_dump_json()
+    return message_text(result["messages"][-1].content)
+
+
+class Delegate:
+    """
+    Delegate: An agent working for a supervising agent, running at most
+    max_concurrency tasks at a time across every run of the supervisor
+    """
+
+    def __init__(
+        self, agent, max_concurrency: int = 4, timeout: Optional[float] = None
+    ):
+        self.agent = agent
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(self.max_concurrency)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._aslots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def description(self) -> str:
+        return self.agent.description
+
+    @property
+    def aslots(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to the loop that first waits on them.
+        loop = asyncio.get_running_loop()
+        if self._aslots is None or self._loop is not loop:
+            self._loop = loop
+            self._aslots = asyncio.Semaphore(self.max_concurrency)
+        return self._aslots
+
+    def _input(self, task: str) -> dict:
+        return dict(messages=[HumanMessage(content=task)])
+
+    def run(self, task: str, config: Optional[RunnableConfig] = None) -> str:
+        with self._slots:
+            return delegate_result(self.agent.graph.invoke(self._input(task), config))
+
+    async def arun(self, task: str, config: Optional[RunnableConfig] = None) -> str:
+        async with self.aslots:
+            result = await asyncio.wait_for(
+                self.agent.graph.ainvoke(self._input(task), config), self.timeout
+            )
+        return delegate_result(result)
+
+
+def _task(tool_call: ToolCall) -> str:
+    return tool_call["args"].get("task", "")
+
+
+def _failed(name: str, error: BaseException) -> str:
+    print_error_msg("Delegate %s failed: %r", name, error)
+    return f"Delegate {name} failed, please try again"
+
+
+def _report(name: str, task: str, content: str, config: Optional[RunnableConfig]):
+    dispatch_custom_event(
+        DELEGATE_RESULT_EVENT,
+        dict(delegate=name, task=task, result=content),
+        config=config,
+    )
+
+
+async def _areport(
+    name: str, task: str, content: str, config: Optional[RunnableConfig]
+):
+    await adispatch_custom_event(
+        DELEGATE_RESULT_EVENT,
+        dict(delegate=name, task=task, result=content),
+        config=config,
+    )
+
+
+def _delegate_message(name: str, tool_call: ToolCall, content: str) -> ToolMessage:
+    return ToolMessage(tool_call_id=tool_call["id"], name=name, content=content)
+
+
+def run_delegate_calls(
+    name: str,
+    delegate: Delegate,
+    tool_calls: List[ToolCall],
+    config: Optional[RunnableConfig] = None,
+) -> List[ToolMessage]:
+    """
+    Fan Out: Run the delegate's tasks on a thread pool, reporting each result as it
+    finishes and returning the ToolMessages in tool_calls order
+    """
+    if not tool_calls:
+        return []
+    results: Dict[int, str] = {}
+    executor = ThreadPoolExecutor(max_workers=delegate.max_concurrency)
+    try:
+        futures = {}
+        for i, t in enumerate(tool_calls):
+            print_debug_msg("Delegating to %s: %s", name, t["args"])
+            # In the caller's context, so its span and context variables carry over.
+            run = copy_context().run
+            futures[executor.submit(run, delegate.run, _task(t), config)] = i
+        try:
+            for future in as_completed(futures, timeout=delegate.timeout):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = _failed(name, e)
+                _report(name, _task(tool_calls[i]), results[i], config)
+        except TimeoutError as e:
+            for i in set(range(len(tool_calls))) - set(results):
+                results[i] = _failed(name, e)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return [_delegate_message(name, t, results[i]) for i, t in enumerate(tool_calls)]
+
+
+async def arun_delegate_calls(
+    name: str,
+    delegate: Delegate,
+    tool_calls: List[ToolCall],
+    config: Optional[RunnableConfig] = None,
+) -> List[ToolMessage]:
+    """
+    Fan Out: Run the delegate's tasks concurrently, reporting each result as it
+    finishes; cancelling the caller cancels every task still running
+    """
+
+    async def run(t: ToolCall) -> ToolMessage:
+        print_debug_msg("Delegating to %s: %s", name, t["args"])
+        try:
+            content = await delegate.arun(_task(t), config)
+        except Exception as e:
+            content = _failed(name, e)
+        await _areport(name, _task(t), content, config)
+        return _delegate_message(name, t, content)
+
+    return list(await asyncio.gather(*(run(t) for t in tool_calls)))
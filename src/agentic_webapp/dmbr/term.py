@@ -1,17 +1,108 @@
 #!/usr/bin/env python3
+"""
+Terminal output, backed by logging: messages are only formatted when their
+level is enabled (LOG_LEVEL, INFO by default), and written to stdout by a
+listener thread so the event loop never blocks on it. Colored text on a
+terminal, one JSON object per line otherwise (LOG_FORMAT=text|json to choose).
 
+Pass the values to interpolate as arguments, not pre-formatted:
 
-from termcolor import colored, cprint
+    print_debug_msg("Calling LLM with state %s", state)
+"""
 
+import atexit
+import json
+import logging
+import os
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 
-print_user_msg = lambda msg: cprint(msg, "blue")
+from termcolor import colored
 
-print_assistant_msg = lambda msg: cprint(msg, "green")
 
-print_error_msg = lambda msg: cprint(msg, "red")
+logger = logging.getLogger("agentic_webapp")
 
-print_warning_msg = lambda msg: cprint(msg, "yellow")
+# Log record level and color for each kind of message
+USER = (logging.INFO, "blue")
+ASSISTANT = (logging.INFO, "green")
+ERROR = (logging.ERROR, "red")
+WARNING = (logging.WARNING, "yellow")
+INFO = (logging.INFO, "cyan")
+DEBUG = (logging.DEBUG, "magenta")
 
-print_info_msg = lambda msg: cprint(msg, "cyan")
 
-print_debug_msg = lambda msg: cprint(msg, "magenta")
+class ColorFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return colored(super().format(record), getattr(record, "color", None))
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = dict(
+            time=self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            level=record.levelname,
+            logger=record.name,
+            module=record.module,
+            line=record.lineno,
+            message=record.getMessage(),
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _formatter() -> logging.Formatter:
+    text = os.getenv("LOG_FORMAT", "text" if sys.stdout.isatty() else "json")
+    return ColorFormatter() if text == "text" else JSONFormatter()
+
+
+def setup_logging() -> QueueListener:
+    """
+    Logging: Route the agentic_webapp logger through a queue to a stdout writer
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_formatter())
+    queue = SimpleQueue()
+    listener = QueueListener(queue, handler)
+    logger.addHandler(QueueHandler(queue))
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    listener.start()
+    # Flush what is still queued when the process exits.
+    atexit.register(listener.stop)
+    return listener
+
+
+listener = setup_logging()
+
+
+def _log(kind: tuple, msg, args: tuple):
+    level, color = kind
+    if logger.isEnabledFor(level):
+        # stacklevel points module/line at the caller of print_*_msg.
+        logger.log(level, msg, *args, extra=dict(color=color), stacklevel=3)
+
+
+def print_user_msg(msg, *args):
+    _log(USER, msg, args)
+
+
+def print_assistant_msg(msg, *args):
+    _log(ASSISTANT, msg, args)
+
+
+def print_error_msg(msg, *args):
+    _log(ERROR, msg, args)
+
+
+def print_warning_msg(msg, *args):
+    _log(WARNING, msg, args)
+
+
+def print_info_msg(msg, *args):
+    _log(INFO, msg, args)
+
+
+def print_debug_msg(msg, *args):
+    _log(DEBUG, msg, args)
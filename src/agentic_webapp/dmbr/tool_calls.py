@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextvars import copy_context
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage
+from langchain_core.messages.tool import ToolCall, ToolMessage
+from langchain_core.tools import BaseTool
+
+from agentic_webapp.dmbr.scheduler import Scheduler
+from agentic_webapp.dmbr.term import print_debug_msg, print_error_msg
+
+
+TOOL_NOT_FOUND = "Tool not found, please try again"
+TOOL_INTERRUPTED = "The turn was interrupted before this tool call returned"
+
+# Rate limit lane of tools not declaring a provider in their metadata
+LOCAL_PROVIDER = "local"
+
+# Tool name -> function keeping only the parts of its result the model needs.
+TOOL_PROJECTIONS: Dict[str, Callable[[Any], Any]] = {}
+
+
+def tool_projection(name: str):
+    """
+    Tool Projection: Declare how the named tool's results are trimmed before they
+    enter the message history
+    """
+
+    def register(projection: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        TOOL_PROJECTIONS[name] = projection
+        return projection
+
+    return register
+
+
+def serialize_tool_result(name: str, result: Any) -> str:
+    projection = TOOL_PROJECTIONS.get(name)
+    if projection is not None:
+        result = projection(result)
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _tool_message(tool_call: ToolCall, content: str) -> ToolMessage:
+    return ToolMessage(
+        tool_call_id=tool_call["id"], name=tool_call["name"], content=content
+    )
+
+
+def _interrupted(tool_call: ToolCall) -> ToolMessage:
+    return ToolMessage(
+        tool_call_id=tool_call["id"],
+        name=tool_call["name"],
+        content=TOOL_INTERRUPTED,
+        status="error",
+    )
+
+
+def missing_tool_results(messages: Sequence[AnyMessage]) -> List[ToolMessage]:
+    """
+    Missing Tool Results: Error ToolMessages for the tool calls ending the history
+    that were never answered, as left by a turn interrupted between the LLM and
+    its tools
+    """
+    start = len(messages)
+    while start > 0 and isinstance(messages[start - 1], ToolMessage):
+        start -= 1
+    if start == 0 or not isinstance(messages[start - 1], AIMessage):
+        return []
+    answered = {m.tool_call_id for m in messages[start:]}
+    tool_calls = messages[start - 1].tool_calls
+    return [_interrupted(t) for t in tool_calls if t["id"] not in answered]
+
+
+def answer_tool_calls(messages: Sequence[AnyMessage]) -> Sequence[AnyMessage]:
+    """
+    Answer Tool Calls: The messages with an error ToolMessage after every tool call
+    left unanswered, which providers reject; messages itself when there are none
+    """
+    answered = []
+    missing = False
+    i = 0
+    while i < len(messages):
+        message = messages[i]
+        answered.append(message)
+        i += 1
+        if not isinstance(message, AIMessage) or not message.tool_calls:
+            continue
+        results = set()
+        while i < len(messages) and isinstance(messages[i], ToolMessage):
+            results.add(messages[i].tool_call_id)
+            answered.append(messages[i])
+            i += 1
+        for t in message.tool_calls:
+            if t["id"] not in results:
+                answered.append(_interrupted(t))
+                missing = True
+    return answered if missing else messages
+
+
+def tool_provider(tool: BaseTool) -> str:
+    return (tool.metadata or {}).get("provider", LOCAL_PROVIDER)
+
+
+def _invoke(
+    tool: BaseTool, args: dict, scheduler: Optional[Scheduler], session: Optional[str]
+) -> Any:
+    if scheduler is None:
+        return tool.invoke(args)
+    with scheduler.slot(tool_provider(tool), tool.name, session=session):
+        return tool.invoke(args)
+
+
+async def _ainvoke(
+    tool: BaseTool,
+    args: dict,
+    scheduler: Optional[Scheduler],
+    session: Optional[str],
+    timeout: Optional[float],
+) -> Any:
+    # The timeout is the tool's own; waiting for a slot is bounded by the scheduler.
+    if scheduler is None:
+        return await asyncio.wait_for(tool.ainvoke(args), timeout)
+    async with scheduler.aslot(tool_provider(tool), tool.name, session=session):
+        return await asyncio.wait_for(tool.ainvoke(args), timeout)
+
+
+def _timed_out(tool_call: ToolCall, timeout: float) -> str:
+    print_error_msg("Tool %s timed out after %ss", tool_call["name"], timeout)
+    return f"Tool timed out after {timeout}s, please try again"
+
+
+def run_tool_calls(
+    tools: Dict[str, BaseTool],
+    tool_calls: List[ToolCall],
+    max_concurrency: int = 4,
+    timeout: Optional[float] = None,
+    scheduler: Optional[Scheduler] = None,
+    session: Optional[str] = None,
+) -> List[ToolMessage]:
+    """
+    Run the tool calls on a thread pool, returning the ToolMessages in tool_calls order
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency))
+    try:
+        futures = []
+        # Each call's timeout runs from its submission, not from when the calls
+        # before it in the list returned.
+        deadlines = []
+        for t in tool_calls:
+            print_debug_msg("Calling: %s", t)
+            if t["name"] in tools:
+                # In the caller's context, so the tool run joins its callbacks.
+                run = copy_context().run
+                futures.append(
+                    executor.submit(
+                        run, _invoke, tools[t["name"]], t["args"], scheduler, session
+                    )
+                )
+            else:
+                print_error_msg("Tool %s not found", t["name"])
+                futures.append(None)
+            deadlines.append(None if timeout is None else time.monotonic() + timeout)
+        results = []
+        for t, future, deadline in zip(tool_calls, futures, deadlines):
+            if future is None:
+                result = TOOL_NOT_FOUND
+            else:
+                try:
+                    remaining = (
+                        None
+                        if deadline is None
+                        else max(0.0, deadline - time.monotonic())
+                    )
+                    result = serialize_tool_result(
+                        t["name"], future.result(timeout=remaining)
+                    )
+                except TimeoutError:
+                    result = _timed_out(t, timeout)
+            results.append(_tool_message(t, result))
+        return results
+    finally:
+        # Timed out calls keep their worker thread; don't wait on them.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def arun_tool_calls(
+    tools: Dict[str, BaseTool],
+    tool_calls: List[ToolCall],
+    max_concurrency: int = 4,
+    timeout: Optional[float] = None,
+    scheduler: Optional[Scheduler] = None,
+    session: Optional[str] = None,
+) -> List[ToolMessage]:
+    """
+    Run the tool calls concurrently, returning the ToolMessages in tool_calls order
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(t: ToolCall) -> ToolMessage:
+        print_debug_msg("Calling: %s", t)
+        if t["name"] not in tools:
+            print_error_msg("Tool %s not found", t["name"])
+            return _tool_message(t, TOOL_NOT_FOUND)
+        async with semaphore:
+            try:
+                result = await _ainvoke(
+                    tools[t["name"]], t["args"], scheduler, session, timeout
+                )
+                result = serialize_tool_result(t["name"], result)
+            except asyncio.TimeoutError:
+                result = _timed_out(t, timeout)
+        return _tool_message(t, result)
+
+    return list(await asyncio.gather(*(run(t) for t in tool_calls)))
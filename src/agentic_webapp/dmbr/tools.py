@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 
 import operator
-import os
 from typing import Any, Literal, Optional
 
-import httpx
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool, tool
 
+from agentic_webapp.dmbr.openweathermap import (
+    get_weather_client,
+    is_successful_prediction,
+)
 from agentic_webapp.dmbr.term import print_debug_msg
+from agentic_webapp.dmbr.tool_calls import tool_projection
 
 
 @tool("weather_icon")
@@ -18,37 +21,56 @@ def weather_icon(icon: str, size: Literal["2", "4"]) -> str:
     return f"https://openweathermap.org/img/wn/{icon}@{size}x.png"
 
 
-@tool("weather_prediction")
-def weather_prediction(city: str, state: Optional[str], country: Optional[str]) -> str:
+def _weather_prediction(city: str, state: Optional[str], country: Optional[str]) -> str:
     """
     Weather Prediction: Get the prediction for the weather
     """
-    app_id = os.getenv("OPENWEATHERMAP_API_KEY")
-    if state is None and country is None:
-        prediction = httpx.get(
-            f"https://api.openweathermap.org/data/2.5/weather?q={city}&APPID={app_id}"
-        ).json()
-        print_debug_msg(f"Weather Prediction for {city} is: {prediction}")
-    if state is not None and country is None:
-        prediction = httpx.get(
-            f"https://api.openweathermap.org/data/2.5/weather?q={city},{state}&APPID={app_id}"
-        ).json()
-        print_debug_msg(f"Weather Prediction for {city} {state} is: {prediction}")
-    if state is None and country is not None:
-        prediction = httpx.get(
-            f"https://api.openweathermap.org/data/2.5/weather?q={city},{country}&APPID={app_id}"
-        ).json()
-        print_debug_msg(f"Weather Prediction for {city} {country} is: {prediction}")
-    if state is not None and country is not None:
-        prediction = httpx.get(
-            f"https://api.openweathermap.org/data/2.5/weather?q={city},{state},{country}&APPID={app_id}"
-        ).json()
-        print_debug_msg(
-            f"Weather Prediction for {city} {state} {country} is: {prediction}"
-        )
+    prediction = get_weather_client().get_weather(city, state, country)
+    print_debug_msg(
+        "Weather Prediction for %s %s %s is: %s", city, state, country, prediction
+    )
     return prediction
 
 
+async def _aweather_prediction(
+    city: str, state: Optional[str], country: Optional[str]
+) -> str:
+    """
+    Weather Prediction: Get the prediction for the weather
+    """
+    prediction = await get_weather_client().aget_weather(city, state, country)
+    print_debug_msg(
+        "Weather Prediction for %s %s %s is: %s", city, state, country, prediction
+    )
+    return prediction
+
+
+weather_prediction = StructuredTool.from_function(
+    func=_weather_prediction,
+    coroutine=_aweather_prediction,
+    name="weather_prediction",
+    metadata=dict(provider="openweathermap"),
+)
+
+
+@tool_projection("weather_prediction")
+def project_weather_prediction(prediction: dict) -> dict:
+    """
+    Weather Prediction Projection: Keep what a Prediction is built from
+    """
+    if not is_successful_prediction(prediction):
+        return dict(error=prediction.get("message", "Weather prediction failed"))
+    weather = prediction.get("weather") or [{}]
+    return dict(
+        city=prediction.get("name"),
+        country=prediction.get("sys", {}).get("country"),
+        temperature_kelvin=prediction["main"]["temp"],
+        humidity=prediction["main"]["humidity"],
+        description=", ".join(w["description"] for w in weather if "description" in w),
+        icon=weather[0].get("icon"),
+    )
+
+
 @tool("add")
 def add(a: Any, b: Any) -> Any:
     """
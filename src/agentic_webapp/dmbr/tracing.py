@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+"""
+Tracing: spans for requests, agent runs, graph nodes, LLM and tool calls.
+
+Spans go to the exporter chosen with TRACE_EXPORTER: "none" (the default, spans
+are not even created), "memory" (kept in process, for tests), or "otlp" (one
+OTLP/JSON ExportTraceServiceRequest per line, to stdout or to TRACE_FILE).
+Trace ids come from the W3C traceparent request header when there is one.
+"""
+
+import atexit
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+from queue import SimpleQueue
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Tuple,
+)
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableConfig
+
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    """
+    Span: A timed operation of a trace, with attributes
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def __repr__(self):
+        return f"Span({self.name!r}, {self.duration_ms}ms, {self.attributes})"
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span): ...
+
+    def shutdown(self): ...
+
+
+class InMemoryExporter:
+    """
+    In Memory Exporter: Finished spans kept in a list, for tests and benchmarks
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def find(self, name: str) -> List[Span]:
+        return [s for s in self.spans if s.name == name]
+
+    def clear(self):
+        self.spans.clear()
+
+    def shutdown(self):
+        pass
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return dict(boolValue=value)
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64 bit integers as strings.
+        return dict(intValue=str(value))
+    if isinstance(value, float):
+        return dict(doubleValue=value)
+    return dict(stringValue=str(value))
+
+
+def otlp_json(span: Span, service_name: str = "agentic-webapp") -> dict:
+    """
+    OTLP JSON: The span as an ExportTraceServiceRequest, as an OTLP/HTTP
+    collector accepts it
+    """
+    otlp_span = dict(
+        traceId=span.trace_id,
+        spanId=span.span_id,
+        name=span.name,
+        kind=1,
+        startTimeUnixNano=str(span.start_ns),
+        endTimeUnixNano=str(span.end_ns),
+        attributes=[
+            dict(key=k, value=_otlp_value(v)) for k, v in span.attributes.items()
+        ],
+        status=dict(code=2, message=span.error) if span.error else dict(code=1),
+    )
+    if span.parent_id:
+        otlp_span["parentSpanId"] = span.parent_id
+    resource = dict(
+        attributes=[dict(key="service.name", value=dict(stringValue=service_name))]
+    )
+    return dict(
+        resourceSpans=[
+            dict(
+                resource=resource,
+                scopeSpans=[
+                    dict(scope=dict(name="agentic_webapp"), spans=[otlp_span])
+                ],
+            )
+        ]
+    )
+
+
+class OTLPFileExporter:
+    """
+    OTLP File Exporter: One OTLP/JSON line per span, to a file or stdout ("-"),
+    written by a background thread
+    """
+
+    def __init__(self, path: str = "-", service_name: str = "agentic-webapp"):
+        self.path = path
+        self.service_name = service_name
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        out = sys.stdout if self.path == "-" else open(self.path, "a")
+        try:
+            while (span := self._queue.get()) is not None:
+                out.write(json.dumps(otlp_json(span, self.service_name)) + "\n")
+                if self._queue.empty():
+                    out.flush()
+        finally:
+            out.flush()
+            if out is not sys.stdout:
+                out.close()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """
+    Tracer: Starts spans under the current one and hands finished spans to the
+    exporter; without an exporter, spans are never created
+    """
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        **attributes,
+    ) -> Span:
+        parent = parent or _current_span.get()
+        if parent is not None and trace_id is None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        return Span(name, trace_id or new_trace_id(), parent_id, attributes)
+
+    def finish(self, span: Span, error: Optional[BaseException] = None):
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.error = repr(error)
+        self.exporter.export(span)
+
+    @contextmanager
+    def span(self, name: str, **kwargs) -> Iterator[Optional[Span]]:
+        """
+        Span: Time the block as the current span, or do nothing when disabled
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = self.start(name, **kwargs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # A stream closed early (the client went away) is not a failure.
+            self.finish(span)
+            raise
+        except BaseException as e:
+            self.finish(span, e)
+            raise
+        else:
+            self.finish(span)
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # An abandoned generator is finalized outside the context it ran in.
+                pass
+
+
+@cache
+def get_tracer() -> Tracer:
+    exporter = os.getenv("TRACE_EXPORTER", "none")
+    if exporter == "none":
+        return Tracer()
+    if exporter == "memory":
+        return Tracer(InMemoryExporter())
+    if exporter == "otlp":
+        otlp = OTLPFileExporter(os.getenv("TRACE_FILE", "-"))
+        atexit.register(otlp.shutdown)
+        return Tracer(otlp)
+    raise ValueError(f"Trace exporter {exporter} not found")
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def trace_context(headers) -> Tuple[str, Optional[str]]:
+    """
+    Trace Context: The trace id and parent span id of the W3C traceparent header,
+    or a new trace
+    """
+    match = TRACEPARENT.match(headers.get(TRACEPARENT_HEADER, "").strip().lower())
+    if match is None:
+        return new_trace_id(), None
+    return match.group(1), match.group(2)
+
+
+async def traced_stream(
+    name: str,
+    frames: AsyncIterator[bytes],
+    trace_id: str,
+    parent_id: Optional[str] = None,
+    **attributes,
+) -> AsyncIterator[bytes]:
+    """
+    Traced Stream: Run the response stream, and the graph producing it, under a
+    request span recording TTFB, chunks and bytes sent
+    """
+    tracer = get_tracer()
+    with tracer.span(name, trace_id=trace_id, parent_id=parent_id, **attributes) as s:
+        started = time.perf_counter()
+        chunks = size = 0
+        async for frame in frames:
+            if s is not None:
+                if chunks == 0:
+                    s.set("sse.ttfb_ms", (time.perf_counter() - started) * 1000)
+                chunks += 1
+                size += len(frame)
+                s.set("sse.chunks", chunks)
+                s.set("sse.bytes", size)
+            yield frame
+
+
+def _usage(response) -> Dict[str, int]:
+    # OpenAI style token_usage, or the message's usage_metadata.
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return dict(
+            input_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+            total_tokens=usage.get("total_tokens", 0),
+        )
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None)
+            if metadata:
+                return dict(metadata)
+    return {}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Tracing Callbacks: Spans for a graph run, its nodes, and the LLM and tool
+    calls made in them, nested under the span current when the run started
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: Tracer, name: str):
+        self.tracer = tracer
+        self.name = name
+        # Run id -> span started for it, or the enclosing span for runs without
+        # one of their own (sequences, parsers inside a node)
+        self.spans: Dict[UUID, Optional[Span]] = {}
+        self.owned: Dict[UUID, Span] = {}
+
+    def _start(
+        self, run_id: UUID, parent_run_id: Optional[UUID], name: str, **attributes
+    ):
+        parent = self.spans.get(parent_run_id) if parent_run_id else None
+        span = self.tracer.start(name, parent=parent, **attributes)
+        self.spans[run_id] = self.owned[run_id] = span
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None):
+        self.spans.pop(run_id, None)
+        span = self.owned.pop(run_id, None)
+        if span is not None:
+            self.tracer.finish(span, error)
+        return span
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs
+    ):
+        tags = kwargs.get("tags") or []
+        if parent_run_id is None:
+            self._start(run_id, None, "agent.run", **{"agent.name": self.name})
+        elif any(tag.startswith("graph:step:") for tag in tags):
+            node = kwargs.get("name")
+            self._start(run_id, parent_run_id, f"node {node}", **{"graph.node": node})
+        else:
+            self.spans[run_id] = self.spans.get(parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None, **kwargs
+    ):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or params.get("_type")
+        self._start(
+            run_id,
+            parent_run_id,
+            "llm",
+            **{"llm.model": str(model), "llm.messages": len(messages[0])},
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self.owned.get(run_id)
+        if span is not None:
+            for key, value in _usage(response).items():
+                span.set(f"llm.{key}", value)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs
+    ):
+        tool = kwargs.get("name") or (serialized or {}).get("name")
+        self._start(run_id, parent_run_id, f"tool {tool}", **{"tool.name": tool})
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+def tracing_config(name: str) -> Optional[RunnableConfig]:
+    """
+    Tracing Config: Callbacks tracing a run of the named agent, when enabled
+    """
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return None
+    return dict(callbacks=[TracingCallbackHandler(tracer, name)])
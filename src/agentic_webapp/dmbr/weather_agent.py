@@ -1,20 +1,17 @@
 #!/usr/bin/env python3
 
-import operator
-from typing import Annotated, Any, Iterator, TypedDict
+from typing import Annotated, Iterator, Optional, TypedDict
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.messages.tool import ToolMessage, tool_call
 from langchain_core.messages.utils import AnyMessage
-from langchain_core.tools import tool
 from langgraph import graph
 from langgraph.constants import END
 from langgraph.graph import add_messages
 from agentic_webapp.dmbr.llm import get_llm, LLMModel
+from agentic_webapp.dmbr.tool_calls import run_tool_calls
 from agentic_webapp.dmbr.term import (
     print_user_msg,
     print_assistant_msg,
     print_debug_msg,
-    print_error_msg,
 )
 from agentic_webapp.dmbr.tools import weather_prediction, weather_icon
 
@@ -24,9 +21,18 @@ class AgentState(TypedDict):
 
 
 class Agent:
-    def __init__(self, model: LLMModel, system="", tools=[]):
-        print_debug_msg(f"Initializing agent with model {model}")
+    def __init__(
+        self,
+        model: LLMModel,
+        system="",
+        tools=[],
+        max_concurrency: int = 4,
+        tool_timeout: Optional[float] = None,
+    ):
+        print_debug_msg("Initializing agent with model %s", model)
         self.system = system
+        self.max_concurrency = max_concurrency
+        self.tool_timeout = tool_timeout
         llm = get_llm(model)
         graph_builder = graph.StateGraph(AgentState)
         graph_builder.add_node("llm", self.call_llm)
@@ -41,13 +47,13 @@ class Agent:
         self.llm = llm.bind_tools(tools)
 
     def should_act(self, state: AgentState):
-        print_debug_msg(f"Checking if action exists in {state['messages'][-1]}")
+        print_debug_msg("Checking if action exists in %s", state["messages"][-1])
         result = state["messages"][-1]
         tool_calls_count = len(result.tool_calls)
         return tool_calls_count > 0
 
     def call_llm(self, state: AgentState):
-        print_debug_msg(f"Calling LLM with state {state}")
+        print_debug_msg("Calling LLM with state %s", state)
         messages = state["messages"]
         if self.system:
             messages = [SystemMessage(content=self.system)] + messages
@@ -55,19 +61,13 @@ class Agent:
         return {"messages": [message]}
 
     def act(self, state: AgentState):
-        print_debug_msg(f"Taking action on message {state['messages'][-1]}")
-        tool_calls = state["messages"][-1].tool_calls
-        results = []
-        for t in tool_calls:
-            print_debug_msg(f"Calling: {t}")
-            if not t["name"] in self.tools:
-                print_error_msg(f"Tool {t['name']} not found")
-                result = "Tool not found, please try again"
-            else:
-                result = self.tools[t["name"]].invoke(t["args"])
-            results.append(
-                ToolMessage(tool_call_id=t["id"], name=t["name"], content=str(result))
-            )
+        print_debug_msg("Taking action on message %s", state["messages"][-1])
+        results = run_tool_calls(
+            self.tools,
+            state["messages"][-1].tool_calls,
+            max_concurrency=self.max_concurrency,
+            timeout=self.tool_timeout,
+        )
         print_debug_msg("Back to model after action")
         return {"messages": results}
 
@@ -94,4 +94,4 @@ if __name__ == "__main__":
         for event in weather_predict(HumanMessage(content=user_input)):
             for value in event.values():
                 print_debug_msg(value)
-                print_assistant_msg(f"Assistant: {value['messages']}")
+                print_assistant_msg("Assistant: %s", value["messages"])
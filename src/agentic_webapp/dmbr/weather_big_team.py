@@ -1,24 +1,27 @@
 #!/usr/bin/env python3
-from typing import Optional, Literal, List
+import asyncio
+from typing import Optional, List
 
 from langchain_core.messages import HumanMessage
-from langchain_core.tools import tool
 
-from pydantic import BaseModel, Field
-from pydantic_core import from_json
+from pydantic import BaseModel, ConfigDict, Field
 
 from agentic_webapp.dmbr.agent import Agent
 from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.registry import agent_factory, get_agent
+from agentic_webapp.dmbr.supervisor import Delegate
 from agentic_webapp.dmbr.term import (
     print_user_msg,
-    print_debug_msg,
     print_assistant_msg,
-    print_error_msg,
+    print_info_msg,
 )
 from agentic_webapp.dmbr.tools import weather_icon, weather_prediction
 
 
 class Prediction(BaseModel):
+    # Checkpoints store field names; validate them as well as the aliases.
+    model_config = ConfigDict(populate_by_name=True)
+
     humidity: float = Field(..., alias="humidity")
     temperature: float = Field(..., alias="temperature")
     description: str = Field(..., alias="description")
@@ -26,6 +29,8 @@ class Prediction(BaseModel):
 
 
 class WeatherPrediction(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     city: str = Field(..., alias="city")
     state: Optional[str] = Field(None, alias="state")
     country: Optional[str] = Field(None, alias="country")
@@ -33,12 +38,16 @@ class WeatherPrediction(BaseModel):
 
 
 class MultiLocationWeatherPrediction(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     predictions_list: List[WeatherPrediction] = Field(
         ..., alias="List of Weather Predictions"
     )
 
 
 class HumanFriendlyDescription(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     highly_detailed: str = Field(..., alias="highly detailed")
     concise: str = Field(..., alias="concise")
     terse: str = Field(..., alias="terse")
@@ -47,134 +56,79 @@ class HumanFriendlyDescription(BaseModel):
 
 
 class WeatherPredictionDescriptions(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     city: str = Field(..., alias="city")
     state: Optional[str] = Field(None, alias="state")
     country: Optional[str] = Field(None, alias="country")
     descriptions: List[HumanFriendlyDescription] = Field(..., alias="descriptions")
 
 
-if __name__ == "__main__":
-
-    @tool("predict_weather", return_direct=True)
-    def predict_weather(data: str) -> str:
-        """
-        Weather Prediction: Get the prediction for the weather
-        """
-        weather_predict = Agent(
-            "weather_predictor",
-            LLMModel.GPT4_Omni,
-            """
-            As a Weather Service Agent, I can provide weather information to users, based on their location.
-            Ensure that the weather information is accurate and up-to-date and contains the proper icons urls,
-            to illustrate the weather predictions. 
-            """,
-            [weather_icon, weather_prediction],
-            output_structure=MultiLocationWeatherPrediction,
-        )
-        for event in weather_predict(
-            HumanMessage(content=f"What's the weather like for {data}?"),
-            stream=True,
-            debug=True,
-        ):
-            for value in event.values():
-                try:
-                    weather_predictions = value["messages"]
-                    weather_predictions_obj = from_json(weather_predictions)
-                    print_assistant_msg(
-                        f"Assistant: {weather_predictions_obj.to_json(indent=4)}"
-                    )
-                    return f"The JSON data of the weather for {data} predictions is: {weather_predictions}"
-                except Exception as e:
-                    print_error_msg(e)
-
-    @tool("describe_weather", return_direct=True)
-    def describe_weather(data: str) -> str:
+@agent_factory("weather_predictor")
+def weather_predictor() -> Agent:
+    return Agent(
+        "weather_predictor",
+        LLMModel.GPT4_Omni,
         """
-        Weather Description: Describe the weather from the provided prediction data
+        As a Weather Service Agent, I can provide weather information to users, based on their location.
+        Ensure that the weather information is accurate and up-to-date and contains the proper icons urls,
+        to illustrate the weather predictions. 
+        """,
+        [weather_icon, weather_prediction],
+        output_structure=MultiLocationWeatherPrediction,
+        description="Weather Prediction: Get the prediction for the weather",
+    )
+
+
+@agent_factory("weather_describer")
+def weather_describer() -> Agent:
+    return Agent(
+        "weather_describer",
+        LLMModel.GPT4_Omni,
         """
-        weather_describe = Agent(
-            "weather_describer",
-            LLMModel.GPT4_Omni,
-            """
-            As a Weather Service Agent, I can provide human-friendly descriptions of the weather predictions to users, based on their location.
-            Ensure that the descriptions are accurate and up-to-date and contain the proper image urls to illustrate the weather predictions.
-            """,
-            output_structure=WeatherPredictionDescriptions,
-        )
-        for event in weather_describe(
-            HumanMessage(
-                content=f"Provide a human-friendly description of the weather from the raw data: {data}"
-            ),
-            stream=True,
-            debug=True,
-        ):
-            for value in event.values():
-                try:
-                    weather_descriptions = value["messages"]
-                    weather_descriptions_obj = from_json(weather_descriptions)
-                    print_assistant_msg(
-                        f"Assistant: {weather_descriptions_obj.to_json(indent=4)}"
-                    )
-                    return f"The JSON data containing the human-friendly descriptions of the weather for {data} is: {weather_descriptions}"
-                except Exception as e:
-                    print_error_msg(e)
-
-    weather_director = Agent(
+        As a Weather Service Agent, I can provide human-friendly descriptions of the weather predictions to users, based on their location.
+        Ensure that the descriptions are accurate and up-to-date and contain the proper image urls to illustrate the weather predictions.
+        """,
+        output_structure=WeatherPredictionDescriptions,
+        description="Weather Description: Describe the weather from the provided prediction data",
+    )
+
+
+@agent_factory("weather_director")
+def weather_director() -> Agent:
+    return Agent(
         "weather_director",
         LLMModel.GPT4_Omni,
         """
         As a Weather Service Agent, I can provide weather information to users, based on their location.
         Ensure that the weather information is accurate and up-to-date and contains the proper image urls to illustrate the weather predictions.
+        To assist me in providing the weather information, I have two delegates:
+        - weather_predictor: To predict the weather
+        - weather_describer: To describe the weather predictions
+        Predict all the locations at once, then call weather_describer once per location, all in the same turn.
         """,
-        tools=[predict_weather, describe_weather],
+        delegates={
+            "weather_predictor": Delegate(get_agent("weather_predictor")),
+            "weather_describer": Delegate(
+                get_agent("weather_describer"), max_concurrency=8, timeout=60
+            ),
+        },
     )
 
-    # weather_director = Agent(
-    #     "weather_director",
-    #     LLMModel.GPT4_Omni,
-    #     """
-    #     As a Weather Service Agent, I can provide weather information to users, based on their location.
-    #     Ensure that the weather information is accurate and up-to-date and contains the proper image urls to illustrate the weather predictions.
-    #     To assist me in providing the weather information, I have two delegates:
-    #     - weather_predictor: To predict the weather
-    #     - weather_describer: To describe the weather predictions
-    #     """,
-    #     # delegates={
-    #     #     "weather_predictor": weather_predict,
-    #     #     "weather_describer": weather_describe,
-    #     # }
-    # )
-
-    # while True:
-    #     user_input = input("User: ")
-    #     print_user_msg(user_input)
-    #     if user_input.lower() in ["exit", "quit"]:
-    #         print_debug_msg("Goodbye!")
-    #         break
-    #     for event in weather_predict(HumanMessage(content=user_input), stream=True, debug=True):
-    #         for value in event.values():
-    #             print_debug_msg(value)
-    #             print_assistant_msg(f"Assistant: {value['messages']}")
-    #             try:
-    #                 weather_predictions = MultiLocationWeatherPrediction.model_validate_json(value["messages"])
-    #                 print_assistant_msg(f"Assistant: {weather_predictions.predictions.to_json(indent=4)}")
-    #             except Exception as e:
-    #                 pass
-
-    # user_input = "What's the weather like in Abidjan? Nairobi? Cotonou? Pretoria?"
-    user_input = "What's the weather like in Abidjan?"
-    print_user_msg(user_input)
-    if user_input.lower() in ["exit", "quit"]:
-        print_debug_msg("Goodbye!")
-    for event in weather_director(
-        HumanMessage(content=user_input), stream=True, debug=True
+
+async def chat(user_input: str):
+    weather_director = get_agent("weather_director")
+    async for kind, event in weather_director.astream_tokens(
+        HumanMessage(content=user_input)
     ):
-        for value in event.values():
-            print_debug_msg(value)
-            print_assistant_msg(f"Assistant: {value['messages']}")
-            # try:
-            #     weather_predictions = from_json(value["messages"])
-            #     print_assistant_msg(f"Assistant: {weather_predictions.to_json(indent=4)}")
-            # except Exception as e:
-            #     print_error_msg(e)
-            #     print_error_msg(value['messages'])
+        if kind == "token":
+            print_assistant_msg(event)
+        elif kind == "delegate":
+            # Partial results, as each delegate task finishes
+            print_info_msg("%s: %s", event["delegate"], event["result"])
+
+
+if __name__ == "__main__":
+    user_input = "What's the weather like in Abidjan? Nairobi? Cotonou? Pretoria?"
+    print_user_msg(user_input)
+    asyncio.run(chat(user_input))
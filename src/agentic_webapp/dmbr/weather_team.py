@@ -4,7 +4,7 @@ from typing import Optional, Literal, List
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from pydantic_core import from_json
 
 from agentic_webapp.dmbr.agent import Agent
@@ -19,6 +19,9 @@ from agentic_webapp.dmbr.tools import weather_icon, weather_prediction
 
 
 class Prediction(BaseModel):
+    # Checkpoints store field names; validate them as well as the aliases.
+    model_config = ConfigDict(populate_by_name=True)
+
     humidity: float = Field(..., alias="humidity")
     temperature: float = Field(..., alias="temperature")
     description: str = Field(..., alias="description")
@@ -26,6 +29,8 @@ class Prediction(BaseModel):
 
 
 class WeatherPrediction(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     city: str = Field(..., alias="city")
     state: Optional[str] = Field(None, alias="state")
     country: Optional[str] = Field(None, alias="country")
@@ -33,12 +38,16 @@ class WeatherPrediction(BaseModel):
 
 
 class MultiLocationWeatherPrediction(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     predictions_list: List[WeatherPrediction] = Field(
         ..., alias="List of Weather Predictions"
     )
 
 
 class HumanFriendlyDescription(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     highly_detailed: str = Field(..., alias="highly detailed")
     concise: str = Field(..., alias="concise")
     terse: str = Field(..., alias="terse")
@@ -47,6 +56,8 @@ class HumanFriendlyDescription(BaseModel):
 
 
 class WeatherPredictionDescriptions(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     city: str = Field(..., alias="city")
     state: Optional[str] = Field(None, alias="state")
     country: Optional[str] = Field(None, alias="country")
@@ -76,7 +87,7 @@ if __name__ == "__main__":
     ):
         for value in event.values():
             print_debug_msg(value)
-            print_assistant_msg(f"Assistant: {value['messages']}")
+            print_assistant_msg("Assistant: %s", value["messages"])
             # try:
             #     weather_predictions = from_json(value["messages"])
             #     print_assistant_msg(f"Assistant: {weather_predictions.to_json(indent=4)}")
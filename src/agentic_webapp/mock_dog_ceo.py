@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Mock Dog CEO: Stand-in for the breed list endpoint of https://dog.ceo.
+
+In process, through the doggo stream's transport (DOG_CEO_MOCK=1), or served:
+
+    uvicorn agentic_webapp.mock_dog_ceo:app --port 8002
+    DOG_CEO_URL=http://127.0.0.1:8002/api/breeds/list/all
+"""
+
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+# Breed -> sub-breeds, a slice of the real list
+BREEDS = {
+    "akita": [],
+    "beagle": [],
+    "bulldog": ["boston", "english", "french"],
+    "collie": ["border"],
+    "corgi": ["cardigan"],
+    "dachshund": [],
+    "husky": [],
+    "labrador": [],
+    "poodle": ["medium", "miniature", "standard", "toy"],
+    "retriever": ["chesapeake", "curly", "flatcoated", "golden"],
+    "shiba": [],
+    "terrier": ["border", "irish", "scottish", "yorkshire"],
+}
+
+
+def mock_breeds() -> dict:
+    return dict(message=BREEDS, status="success")
+
+
+class MockDogCeoTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Mock Transport: Answers the breed list without a network, after latency seconds
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self.latency)
+        return httpx.Response(200, json=mock_breeds(), request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self.latency)
+        return httpx.Response(200, json=mock_breeds(), request=request)
+
+
+def mock_dog_ceo_transport() -> Optional[MockDogCeoTransport]:
+    """
+    Mock Transport: Used by the doggo stream when DOG_CEO_MOCK=1, with
+    DOG_CEO_MOCK_LATENCY seconds per request
+    """
+    if os.getenv("DOG_CEO_MOCK", "0") != "1":
+        return None
+    latency = float(os.getenv("DOG_CEO_MOCK_LATENCY", "0.05"))
+    return MockDogCeoTransport(latency)
+
+
+async def breeds(request: Request) -> JSONResponse:
+    await asyncio.sleep(float(os.getenv("DOG_CEO_MOCK_LATENCY", "0.05")))
+    return JSONResponse(mock_breeds())
+
+
+app = Starlette(routes=[Route("/api/breeds/list/all", breeds)])
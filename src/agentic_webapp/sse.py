@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+import asyncio
+import re
+from functools import cache, lru_cache
+from html import escape
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from fasthtml import Div
+from fasthtml.common import to_xml
+
+
+# CRLF and lone CR end a line too; they become LF before splitting into fields.
+LINE_BREAKS = re.compile(rb"\r\n?")
+
+
+def _line(name: bytes, value: str) -> bytes:
+    if "\n" in value or "\r" in value:
+        raise ValueError(f"SSE {name.decode()!r} field cannot span lines: {value!r}")
+    return b"%s: %s\n" % (name, value.encode("utf-8"))
+
+
+@cache
+def event_line(event: str) -> bytes:
+    # Apps send a handful of event names, encoded once each.
+    return _line(b"event", event)
+
+
+def _data(encoded: bytes) -> bytes:
+    if b"\r" in encoded:
+        encoded = LINE_BREAKS.sub(b"\n", encoded)
+    # One data: field per line; the client joins them back with newlines.
+    return encoded.replace(b"\n", b"\ndata: ")
+
+
+def encode_event(
+    data: str = "", event: Optional[str] = None, id: Optional[Any] = None
+) -> bytes:
+    """
+    SSE Event: One event frame, with its data split over as many data: fields
+    as it has lines, and an id: field when given
+    """
+    parts = []
+    if event is not None:
+        parts.append(event_line(event))
+    if id is not None:
+        parts.append(_line(b"id", str(id)))
+    parts += (b"data: ", _data(data.encode("utf-8")), b"\n\n")
+    return b"".join(parts)
+
+
+@cache
+def _div(target_id: str, hx_swap_oob: str) -> Tuple[bytes, bytes]:
+    # The markup before and after the element's text, rendered once per target.
+    html = to_xml(Div("\0", id=target_id, hx_swap_oob=hx_swap_oob))
+    head, _, tail = html.partition("\0")
+    return head.encode("utf-8"), tail.rstrip("\n").encode("utf-8")
+
+
+def html_frame(
+    event: str,
+    target_id: str,
+    content,
+    hx_swap_oob: str = "true",
+    id: Optional[Any] = None,
+) -> bytes:
+    """
+    HTML Frame: An event swapping content into the element target_id; text is
+    escaped into a cached <div>, components are rendered with to_xml
+    """
+    parts = [event_line(event)]
+    if id is not None:
+        parts.append(_line(b"id", str(id)))
+    if isinstance(content, str):
+        head, tail = _div(target_id, hx_swap_oob)
+        body = _data(escape(content).encode("utf-8"))
+        parts += (b"data: ", head, body, tail, b"\n\n")
+    else:
+        html = to_xml(Div(content, id=target_id, hx_swap_oob=hx_swap_oob))
+        parts += (b"data: ", _data(html.rstrip("\n").encode("utf-8")), b"\n\n")
+    return b"".join(parts)
+
+
+@lru_cache(maxsize=256)
+def static_html_frame(
+    event: str, target_id: str, text: str, hx_swap_oob: str = "true"
+) -> bytes:
+    """
+    Static HTML Frame: html_frame for the constant frames sent on every request
+    (status updates, terminate), encoded once
+    """
+    return html_frame(event, target_id, text, hx_swap_oob)
+
+
+class _Done:
+    def __init__(self, error: Optional[BaseException] = None):
+        self.error = error
+
+
+class SSEEmitter:
+    """
+    SSE Emitter: Send frames as soon as they are ready, coalescing bursts of small
+    frames and holding the producer back while the client is slow to read
+    """
+
+    def __init__(
+        self,
+        coalesce_window: float = 0.01,
+        max_bytes: int = 16 * 1024,
+        max_pending: int = 64,
+    ):
+        self.coalesce_window = coalesce_window
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+
+    async def _produce(self, frames: AsyncIterator[bytes], queue: asyncio.Queue):
+        try:
+            async for frame in frames:
+                # Blocks once max_pending frames are waiting on a slow client.
+                await queue.put(frame)
+        except Exception as e:
+            await queue.put(_Done(e))
+        else:
+            await queue.put(_Done())
+        finally:
+            if hasattr(frames, "aclose"):
+                await frames.aclose()
+
+    async def _next(self, queue: asyncio.Queue, timeout: float):
+        if timeout <= 0:
+            return queue.get_nowait()
+        return await asyncio.wait_for(queue.get(), timeout)
+
+    async def stream(self, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.max_pending)
+        producer = asyncio.create_task(self._produce(frames, queue))
+        try:
+            item = await queue.get()
+            while not isinstance(item, _Done):
+                batch = [item]
+                size = len(item)
+                deadline = loop.time() + self.coalesce_window
+                item = None
+                while size < self.max_bytes:
+                    try:
+                        frame = await self._next(queue, deadline - loop.time())
+                    except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                        break
+                    if isinstance(frame, _Done):
+                        item = frame
+                        break
+                    batch.append(frame)
+                    size += len(frame)
+                yield b"".join(batch)
+                if item is None:
+                    item = await queue.get()
+            if item.error is not None:
+                raise item.error
+        finally:
+            # The client went away or we finished; stop generating either way.
+            producer.cancel()
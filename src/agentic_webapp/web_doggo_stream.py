@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
-import asyncio
+import os
 
 import httpx
 from fasthtml import P, Link, Script, Titled, Div, H1, Hr, B, Br
-from fasthtml.common import to_xml
 from fasthtml.fastapp import fast_app, serve
 from starlette.responses import StreamingResponse
 
+from agentic_webapp.coalesce import StreamCoalescer
+from agentic_webapp.dmbr.term import print_debug_msg
+from agentic_webapp.dmbr.tracing import TRACE_ID_HEADER, trace_context, traced_stream
+from agentic_webapp.mock_dog_ceo import mock_dog_ceo_transport
+from agentic_webapp.sse import SSEEmitter, html_frame, static_html_frame
+
 
 app, route = fast_app(
     debug=True,
@@ -21,42 +26,45 @@ app, route = fast_app(
     ),
 )
 
+sse_emitter = SSEEmitter()
+
+coalescer = StreamCoalescer()
+
+DOG_CEO_URL = os.getenv("DOG_CEO_URL", "https://dog.ceo/api/breeds/list/all")
+
 
 async def gen_dog_breeds():
-    async with httpx.AsyncClient() as client:
-        breeds = (await client.get("https://dog.ceo/api/breeds/list/all")).json()
+    # DOG_CEO_MOCK=1 answers from the stub instead of the network.
+    async with httpx.AsyncClient(transport=mock_dog_ceo_transport()) as client:
+        breeds = (await client.get(DOG_CEO_URL)).json()
         for breed in breeds["message"].keys():
-            print(f"Yielding {breed}")
+            print_debug_msg("Yielding %s", breed)
             yield breed
 
 
-def render_sse_html_chunk(event: str, id: str, chunk: str) -> bytes:
-    return f"""
-event: {event}
-data: {to_xml(Div(chunk, id=id, hx_swap_oob='true'))}\n\n
-""".encode("utf-8")
-
-
 @route("/dogstream")
-def get():
+def get(request):
     async def dogbreeds_iter():
         async for breed in gen_dog_breeds():
-            await asyncio.sleep(0.2)
-            breed_status_chunk = render_sse_html_chunk(
+            yield static_html_frame(
                 "DogBreedNoMass", "DogBreedNoMass", "More doggo senior :-)"
             )
-            yield breed_status_chunk
-            await asyncio.sleep(0.2)
-            chunk = render_sse_html_chunk("DogBreed", "DogBreed", breed)
-            yield chunk
-        breed_status_chunk = render_sse_html_chunk(
+            yield html_frame("DogBreed", "DogBreed", breed)
+        yield static_html_frame(
             "DogBreedNoMass", "DogBreedNoMass", "No more doggo senior :-("
         )
-        yield breed_status_chunk
 
+    trace_id, parent_id = trace_context(request.headers)
     return StreamingResponse(
-        dogbreeds_iter(),
+        traced_stream(
+            "dogstream",
+            # Every request gets the same list; one fetch serves them all.
+            sse_emitter.stream(coalescer.stream("dogstream", dogbreeds_iter)),
+            trace_id,
+            parent_id,
+        ),
         media_type="text/event-stream",
+        headers={TRACE_ID_HEADER: trace_id},
     )
 
 
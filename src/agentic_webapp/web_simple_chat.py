@@ -1,6 +1,4 @@
 #!/usr/bin/env python3
-import asyncio
-
 from fasthtml import (
     Link,
     Script,
@@ -15,9 +13,8 @@ from fasthtml import (
     Button,
     Main,
 )
-from fasthtml.common import to_xml
 from fasthtml.fastapp import fast_app, serve
-from starlette.responses import StreamingResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 app, route = fast_app(
     debug=True,
@@ -32,22 +29,46 @@ app, route = fast_app(
     ),
 )
 
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables.config import merge_configs
 from langgraph.graph import (
     MessagesState,
     StateGraph,
 )
 
-from agentic_webapp.dmbr.llm import get_llm, LLMModel
+from agentic_webapp.coalesce import StreamCoalescer, prompt_key, publish_result
+from agentic_webapp.dmbr.llm import get_llm, warm_up_handler, LLMModel
+from agentic_webapp.dmbr.memory import (
+    get_async_sqlite_saver,
+    session_thread_id,
+    thread_config,
+)
+from agentic_webapp.dmbr.semantic_cache import get_semantic_cache, is_first_turn
+from agentic_webapp.dmbr.streaming import astream_graph_tokens
+from agentic_webapp.dmbr.tracing import (
+    TRACE_ID_HEADER,
+    trace_context,
+    traced_stream,
+    tracing_config,
+)
+from agentic_webapp.sse import SSEEmitter, html_frame, static_html_frame
 from agentic_webapp.dmbr.term import (
     print_user_msg,
     print_assistant_msg,
 )
 
-llm = get_llm(LLMModel.GPT4_Omni_mini)
+SIMPLE_CHAT_MODEL = LLMModel.GPT4_Omni_mini
+
+sse_emitter = SSEEmitter()
+
+coalescer = StreamCoalescer()
 
+semantic_cache = get_semantic_cache()
 
-def chatbot(state: MessagesState):
-    return dict(messages=llm.invoke(state["messages"]))
+
+async def chatbot(state: MessagesState):
+    llm = get_llm(SIMPLE_CHAT_MODEL)
+    return dict(messages=await llm.ainvoke(state["messages"]))
 
 
 simple_chat_flow_builder = StateGraph(MessagesState)
@@ -56,45 +77,92 @@ simple_chat_flow_builder.add_node("chatbot", chatbot)
 simple_chat_flow_builder.set_entry_point("chatbot")
 simple_chat_flow_builder.set_finish_point("chatbot")
 
-simple_chat_flow = simple_chat_flow_builder.compile()
+simple_chat_flow = simple_chat_flow_builder.compile(
+    checkpointer=get_async_sqlite_saver()
+)
 
+app.add_event_handler("shutdown", get_async_sqlite_saver().aclose)
+app.add_event_handler("startup", warm_up_handler([SIMPLE_CHAT_MODEL]))
 
-async def simple_chat(user_input: str):
-    print_user_msg(user_input)
-    for event in simple_chat_flow.stream(dict(messages=("user", user_input))):
-        for value in event.values():
-            content = value["messages"].content
-            print_assistant_msg(f"Assistant: {content}")
-            yield content
 
+async def persist_exchange(thread_id: str, user_input: str, answer: str):
+    """
+    Persist Exchange: Write an answer given elsewhere (the semantic cache, a shared
+    generation) into the thread, as if answered, so later turns see it
+    """
+    messages = [HumanMessage(content=user_input), AIMessage(content=answer)]
+    await simple_chat_flow.aupdate_state(
+        thread_config(thread_id), dict(messages=messages), as_node="chatbot"
+    )
 
-def render_sse_html_chunk(event: str, id: str, chunk: str, hx_swap_oob="true") -> bytes:
-    return f"""
-event: {event}
-data: {to_xml(Div(chunk, id=id, hx_swap_oob=hx_swap_oob))}\n\n
-""".encode("utf-8")
+
+async def simple_chat(user_input: str, thread_id: str, use_cache: bool = True):
+    print_user_msg(user_input)
+    config = thread_config(thread_id)
+    use_cache = use_cache and semantic_cache is not None
+    if use_cache:
+        # Only a first turn's answer depends on the prompt alone.
+        state = await simple_chat_flow.aget_state(config)
+        use_cache = is_first_turn(state.values.get("messages"))
+    if use_cache:
+        answer = await semantic_cache.alookup("simple_chat", user_input)
+        if answer is not None:
+            yield answer
+            await persist_exchange(thread_id, user_input, answer)
+            return
+    async for kind, event in astream_graph_tokens(
+        simple_chat_flow,
+        dict(messages=("user", user_input)),
+        config=merge_configs(config, tracing_config("simple_chat")),
+    ):
+        if kind == "token":
+            yield event
+            continue
+        for value in event.values():
+            answer = value["messages"].content
+            print_assistant_msg("Assistant: %s", answer)
+            if use_cache:
+                await semantic_cache.astore("simple_chat", user_input, answer)
 
 
 @route("/chatstream")
 def get(request):
     prompt = request.query_params["prompt"]
+    thread_id = session_thread_id(request.session)
+    use_cache = semantic_cache is not None and not semantic_cache.bypass(
+        request.headers
+    )
 
     async def chat_iter():
-        async for chat in simple_chat(prompt):
-            await asyncio.sleep(1)
-            chat_status_chunk = render_sse_html_chunk("Status", "Status", "Sending...")
-            yield chat_status_chunk
-            await asyncio.sleep(1)
-            chunk = render_sse_html_chunk("Chat", "Chat", chat, hx_swap_oob="beforeend")
-            yield chunk
-        chat_status_chunk = render_sse_html_chunk("Status", "Status", "Answered")
-        yield chat_status_chunk
-        terminating_chunk = render_sse_html_chunk("Terminate", "Terminate", "")
-        yield terminating_chunk
-
+        yield static_html_frame("Status", "Status", "Sending...")
+        answer = []
+        async for chat in simple_chat(prompt, thread_id, use_cache):
+            yield html_frame("Chat", "Chat", chat, hx_swap_oob="beforeend")
+            answer.append(chat)
+        publish_result("".join(answer))
+        yield static_html_frame("Status", "Status", "Answered")
+        yield static_html_frame("Terminate", "Terminate", "")
+
+    async def coalesced_iter():
+        # Later turns depend on the thread's history, they are never shared.
+        state = await simple_chat_flow.aget_state(thread_config(thread_id))
+        key = None
+        if is_first_turn(state.values.get("messages")):
+            key = ("simple_chat", use_cache, prompt_key(prompt))
+        async for frame in coalescer.stream(key, chat_iter, joined):
+            yield frame
+
+    async def joined(answer: str):
+        # The shared generation only wrote the thread that started it.
+        await persist_exchange(thread_id, prompt, answer)
+
+    trace_id, parent_id = trace_context(request.headers)
     return StreamingResponse(
-        chat_iter(),
+        traced_stream(
+            "chatstream", sse_emitter.stream(coalesced_iter()), trace_id, parent_id
+        ),
         media_type="text/event-stream",
+        headers={TRACE_ID_HEADER: trace_id},
     )
 
 
@@ -114,6 +182,13 @@ def post(prompt: str):
     )
 
 
+@route("/metrics/semantic-cache")
+def get():
+    if semantic_cache is None:
+        return JSONResponse(dict(enabled=False))
+    return JSONResponse(dict(enabled=True, **semantic_cache.stats()))
+
+
 @route("/")
 def get():
     chat_log = Div(id="chat-log")
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
-import asyncio
+from typing import List
 
 from fasthtml import (
+    Article,
+    Header,
+    Img,
+    Small,
     Link,
     Script,
     Titled,
@@ -14,17 +18,26 @@ from fasthtml import (
     Group,
     Button,
     Main,
+    P,
 )
-from fasthtml.common import to_xml
 from fasthtml.fastapp import fast_app, serve
-from pydantic_core import from_json
-from starlette.responses import StreamingResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 from langchain_core.messages import HumanMessage
+from langchain_core.utils.json import parse_partial_json
 
+from agentic_webapp.coalesce import StreamCoalescer, prompt_key, publish_result
 from agentic_webapp.dmbr.agent import Agent
+from agentic_webapp.dmbr.context import ContextWindow
+from agentic_webapp.dmbr.memory import get_async_sqlite_saver, session_thread_id
+from agentic_webapp.dmbr.model_router import get_model_router
+from agentic_webapp.dmbr.openweathermap import get_weather_client
+from agentic_webapp.dmbr.scheduler import Overloaded, get_scheduler
+from agentic_webapp.dmbr.semantic_cache import get_semantic_cache
 from agentic_webapp.dmbr.tools import weather_prediction, weather_icon
+from agentic_webapp.dmbr.tracing import TRACE_ID_HEADER, trace_context, traced_stream
 from agentic_webapp.dmbr.weather_team import MultiLocationWeatherPrediction
+from agentic_webapp.sse import SSEEmitter, html_frame, static_html_frame
 
 app, route = fast_app(
     debug=True,
@@ -39,8 +52,18 @@ app, route = fast_app(
     ),
 )
 
+sse_emitter = SSEEmitter()
 
-from agentic_webapp.dmbr.llm import get_llm, LLMModel
+coalescer = StreamCoalescer()
+
+semantic_cache = get_semantic_cache()
+
+model_router = get_model_router()
+
+app.add_event_handler("shutdown", get_async_sqlite_saver().aclose)
+
+
+from agentic_webapp.dmbr.llm import get_llm, warm_up_handler, LLMModel
 from agentic_webapp.dmbr.term import (
     print_user_msg,
     print_assistant_msg, print_error_msg,
@@ -56,63 +79,153 @@ weather_predict = Agent(
         """,
     [weather_icon, weather_prediction],
     output_structure=MultiLocationWeatherPrediction,
+    checkpointer=get_async_sqlite_saver(),
+    context=ContextWindow(summary_model=LLMModel.GPT4_Omni_mini),
+    semantic_cache=semantic_cache,
+    router=model_router,
 )
 
+# The agent's clients are built above; the summarizer's is otherwise built by the
+# first conversation outgrowing the context window.
+app.add_event_handler(
+    "startup", warm_up_handler([LLMModel.GPT4_Omni_mini], temperature=0)
+)
+
+
+PREDICTIONS_KEY = MultiLocationWeatherPrediction.model_fields["predictions_list"].alias
 
-async def weather_chat(user_input: str):
+
+def answered_cities(answer: str) -> List[str]:
+    """
+    Answered Cities: The cities a partial answer has finished naming so far
+    """
+    args = parse_partial_json(answer)
+    locations = args.get(PREDICTIONS_KEY) if isinstance(args, dict) else None
+    if not isinstance(locations, list):
+        return []
+    return [
+        location["city"]
+        for i, location in enumerate(locations)
+        # A city is only complete once something follows it.
+        if isinstance(location, dict)
+        and "city" in location
+        and (len(location) > 1 or i < len(locations) - 1)
+    ]
+
+
+async def weather_chat(user_input: str, thread_id: str, use_cache: bool = True):
     print_user_msg(user_input)
-    for event in weather_predict(HumanMessage(content=user_input), stream=True, debug=True):
-        for value in event.values():
-            content = value["messages"]
-            print_assistant_msg(f"Assistant: {content}")
-            try:
-                weather_predictions = value["messages"]
-                weather_predictions_obj = from_json(weather_predictions)
-                print_assistant_msg(
-                    f"Assistant: {weather_predictions_obj.to_json(indent=4)}"
-                )
-                yield weather_predictions
-            except Exception as e:
-                print_error_msg(e)
-            # if type(content) == list:
-            #     for c in content:
-            #         if 'content' in c:
-            #             yield c.content
-            #         else:
-            #             yield c
-            # elif 'content' in content:
-            #     yield content.content
-            # else:
-            #     yield content
-
-
-def render_sse_html_chunk(event: str, id: str, chunk: str, hx_swap_oob="true") -> bytes:
-    return f"""
-event: {event}
-data: {to_xml(Div(chunk, id=id, hx_swap_oob=hx_swap_oob))}\n\n
-""".encode("utf-8")
+    message = HumanMessage(content=user_input)
+    if use_cache:
+        cached = await weather_predict.alookup_cached(message, thread_id)
+        if cached is not None:
+            yield "Chat", cached["output"]
+            await weather_predict.apersist_cached(cached, thread_id)
+            return
+    answer, named = "", 0
+    async for kind, event in weather_predict.astream_tokens(
+        message, thread_id=thread_id
+    ):
+        if kind == "token":
+            yield "Token", event
+            continue
+        if kind == "answer":
+            # The answer is a tool call; name its cities while it is generated.
+            answer += event
+            if "," not in event and "}" not in event:
+                continue
+            cities = answered_cities(answer)
+            if len(cities) > named:
+                lead = "Predicting " if named == 0 else ", "
+                yield "Token", lead + ", ".join(cities[named:])
+                named = len(cities)
+            continue
+        # A rejected answer is generated again, from the start.
+        answer, named = "", 0
+        for node, value in event.items():
+            # A rejected answer has no output; a model tries again.
+            if node not in ("respond", "output_parser") or "output" not in value:
+                continue
+            weather_predictions = value["output"]
+            cities = ", ".join(p.city for p in weather_predictions.predictions_list)
+            print_assistant_msg("Assistant: predictions for %s", cities)
+            yield "Chat", weather_predictions
+    if use_cache:
+        await weather_predict.astore_cached(message, thread_id=thread_id)
+
+
+def weather_cards(weather_predictions: MultiLocationWeatherPrediction):
+    """
+    Weather Cards: One card per location, rendered straight from the typed result
+    """
+    cards = []
+    for location in weather_predictions.predictions_list:
+        place = ", ".join(p for p in (location.state, location.country) if p)
+        cards.append(
+            Article(
+                Header(B(location.city), Small(f" {place}") if place else ""),
+                *(
+                    P(
+                        Img(src=p.icon_url, alt=p.description),
+                        f"{p.description}, {p.temperature:g}°, "
+                        f"{p.humidity:g}% humidity",
+                    )
+                    for p in location.predictions
+                ),
+            )
+        )
+    return Div(*cards)
 
 
 @route("/chatstream")
 def get(request):
     prompt = request.query_params["prompt"]
+    thread_id = session_thread_id(request.session)
+    use_cache = semantic_cache is not None and not semantic_cache.bypass(
+        request.headers
+    )
 
     async def chat_iter():
-        async for chat in weather_chat(prompt):
-            await asyncio.sleep(1)
-            chat_status_chunk = render_sse_html_chunk("Status", "Status", "Sending...")
-            yield chat_status_chunk
-            await asyncio.sleep(1)
-            chunk = render_sse_html_chunk("Chat", "Chat", chat, hx_swap_oob="beforeend")
-            yield chunk
-        chat_status_chunk = render_sse_html_chunk("Status", "Status", "Answered")
-        yield chat_status_chunk
-        terminating_chunk = render_sse_html_chunk("Terminate", "Terminate", "")
-        yield terminating_chunk
+        status = "Answered"
+        # Sent before the model is called, so the first byte does not wait on it.
+        yield static_html_frame("Status", "Status", "Sending...")
+        try:
+            async for event, chat in weather_chat(prompt, thread_id, use_cache):
+                if event == "Token":
+                    yield html_frame("Token", "Token", chat, hx_swap_oob="beforeend")
+                    continue
+                yield html_frame(
+                    "Chat", "Chat", weather_cards(chat), hx_swap_oob="beforeend"
+                )
+                publish_result(chat.model_dump_json())
+        except Overloaded as e:
+            # Shed under load: say so now rather than after a long wait.
+            print_error_msg("Request shed: %s", e)
+            status = "Busy, please try again in a moment"
+        yield static_html_frame("Status", "Status", status)
+        yield static_html_frame("Terminate", "Terminate", "")
+
+    async def coalesced_iter():
+        # Only a first turn's answer depends on the prompt alone, so only first
+        # turns share an in-flight generation with identical requests.
+        key = None
+        if await weather_predict.afirst_turn(thread_id):
+            key = (weather_predict.name, use_cache, prompt_key(prompt))
+        async for frame in coalescer.stream(key, chat_iter, joined):
+            yield frame
+
+    async def joined(answer: str):
+        # The shared generation only wrote the thread that started it.
+        message = HumanMessage(content=prompt)
+        await weather_predict.apersist_answer(message, answer, thread_id)
 
+    trace_id, parent_id = trace_context(request.headers)
     return StreamingResponse(
-        chat_iter(),
+        traced_stream(
+            "chatstream", sse_emitter.stream(coalesced_iter()), trace_id, parent_id
+        ),
         media_type="text/event-stream",
+        headers={TRACE_ID_HEADER: trace_id},
     )
 
 
@@ -123,15 +236,45 @@ def post(prompt: str):
             id="Terminate",
             hx_ext="sse",
             sse_connect=f"/chatstream?prompt={prompt}",
-            sse_swap="Terminate,Status,Chat",
+            sse_swap="Terminate,Status,Token,Chat",
         ),
         B(id="Status", sse_swap="Status"),
         Br(),
+        P(id="Token", sse_swap="Token"),
         Div(id="Chat", sse_swap="Chat"),
         cls="container",
     )
 
 
+@route("/metrics/weather-cache")
+def get():
+    return JSONResponse(get_weather_client().cache.stats())
+
+
+@route("/metrics/semantic-cache")
+def get():
+    if semantic_cache is None:
+        return JSONResponse(dict(enabled=False))
+    return JSONResponse(dict(enabled=True, **semantic_cache.stats()))
+
+
+@route("/metrics/coalescing")
+def get():
+    return JSONResponse(coalescer.stats())
+
+
+@route("/metrics/scheduler")
+def get():
+    return JSONResponse(get_scheduler().stats())
+
+
+@route("/metrics/model-router")
+def get():
+    if model_router is None:
+        return JSONResponse(dict(enabled=False))
+    return JSONResponse(dict(enabled=True, tiers=model_router.stats()))
+
+
 @route("/")
 def get():
     chat_log = Div(id="chat-log")
@@ -0,0 +1,6 @@
+#!/usr/bin/env python3
+
+from agentic_webapp.bench.results import offline
+
+# The apps build their agents on import; the tests never reach a provider.
+offline()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import tool
+from langgraph.constants import END
+from pydantic import BaseModel, ValidationError
+
+from agentic_webapp.dmbr.agent import ANSWER_RETRIES, Agent
+from agentic_webapp.dmbr.context import ContextWindow
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.model_router import ModelRouter
+
+
+class Answer(BaseModel):
+    city: str
+    temperature: float
+
+
+def tool_call(id: str) -> dict:
+    return dict(name="weather_prediction", args=dict(city="Paris"), id=id)
+
+
+def answer_call(id: str, **args) -> dict:
+    return dict(name="Answer", args=args, id=id)
+
+
+@tool
+def weather(city: str) -> str:
+    """The weather in a city"""
+    return f"20 degrees in {city}"
+
+
+def answering_agent(**kwargs) -> Agent:
+    return Agent(
+        "agent",
+        LLMModel.Mock_Instant,
+        tools=[weather],
+        output_structure=Answer,
+        **kwargs,
+    )
+
+
+def scripted(*replies: AIMessage) -> RunnableLambda:
+    """
+    Scripted LLM: Gives the replies in order, and keeps what it was sent
+    """
+    remaining = list(replies)
+
+    def reply(messages):
+        scripted_llm.sent.append(messages)
+        return remaining.pop(0)
+
+    scripted_llm = RunnableLambda(reply)
+    scripted_llm.sent = []
+    return scripted_llm
+
+
+def weather_reply(id: str) -> AIMessage:
+    call = dict(name="weather", args=dict(city="Paris"), id=id)
+    return AIMessage("", tool_calls=[call])
+
+
+def answer_reply(id: str, **args) -> AIMessage:
+    return AIMessage("", tool_calls=[answer_call(id, **args)])
+
+
+def test_window_counts_the_stored_messages_not_the_answered_ones():
+    context = ContextWindow(
+        max_tokens=30,
+        summary_model=LLMModel.Mock_Instant,
+        token_counter=lambda message: 10,
+    )
+    agent = Agent("agent", LLMModel.Mock_Instant, context=context)
+    # The first turn was interrupted before its tool ran.
+    messages = [
+        HumanMessage(content="weather in Paris?"),
+        AIMessage(content="", tool_calls=[tool_call("1")]),
+        HumanMessage(content="and in Rome?"),
+        AIMessage(content="Sunny"),
+        HumanMessage(content="thanks"),
+    ]
+    window, summary, update = agent._prepare(dict(messages=messages))
+    assert window == messages[2:]
+    assert update["summarized"] == 2
+    assert summary
+
+
+def test_dangling_tool_calls_in_the_window_are_answered():
+    agent = Agent("agent", LLMModel.Mock_Instant)
+    messages = [
+        HumanMessage(content="weather in Paris?"),
+        AIMessage(content="", tool_calls=[tool_call("1")]),
+        HumanMessage(content="again?"),
+    ]
+    window, _, _ = agent._prepare(dict(messages=messages))
+    assert [type(m) for m in window] == [
+        HumanMessage,
+        AIMessage,
+        ToolMessage,
+        HumanMessage,
+    ]
+    assert window[2].tool_call_id == "1"
+
+
+def test_every_answer_call_gets_a_result():
+    agent = answering_agent()
+    calls = [
+        answer_call("1", city="Paris", temperature=20),
+        answer_call("2", city="Rome", temperature=25),
+    ]
+    state = dict(messages=[HumanMessage(content="hi"), AIMessage("", tool_calls=calls)])
+    result = agent.respond(state)
+    assert sorted(m.tool_call_id for m in result["messages"]) == ["1", "2"]
+    assert result["output"] == Answer(city="Paris", temperature=20)
+    state["messages"] += result["messages"]
+    assert agent.route_answer(state) == END
+
+
+def test_extra_answer_calls_are_answered_when_the_first_is_rejected():
+    agent = answering_agent()
+    calls = [answer_call("1", city="Paris"), answer_call("2", city="Rome")]
+    state = dict(messages=[HumanMessage(content="hi"), AIMessage("", tool_calls=calls)])
+    result = agent.respond(state)
+    assert sorted(m.tool_call_id for m in result["messages"]) == ["1", "2"]
+    assert "output" not in result
+    state["messages"] += result["messages"]
+    # Back to the model, to fix the answer
+    assert agent.route_answer(state) == "agent"
+
+
+def test_route_sends_each_kind_of_reply_on():
+    agent = answering_agent()
+    plain = Agent("plain", LLMModel.Mock_Instant, tools=[weather])
+
+    def route(agent: Agent, reply: AIMessage):
+        return agent.route(dict(messages=[HumanMessage(content="hi"), reply]))
+
+    assert route(plain, AIMessage("Sunny")) == END
+    assert route(agent, AIMessage("Sunny")) == "output_parser"
+    assert route(agent, weather_reply("1")) == ["action"]
+    assert route(agent, answer_reply("1", city="Paris", temperature=20)) == "respond"
+    # An answer next to other calls waits for their results.
+    early = weather_reply("1")
+    early.tool_calls.append(answer_call("2", city="Paris", temperature=20))
+    assert route(agent, early) == ["action"]
+
+
+def test_answer_comes_out_of_the_tool_calling_turn():
+    agent = answering_agent()
+    agent.llm = scripted(
+        weather_reply("1"), answer_reply("2", city="Paris", temperature=20)
+    )
+    result = asyncio.run(agent.ainvoke(HumanMessage(content="hi"), use_cache=False))
+    assert result["output"] == Answer(city="Paris", temperature=20)
+    assert len(agent.llm.sent) == 2
+    assert result["messages"][-1].content == "Answer sent"
+
+
+def test_rejected_answer_is_sent_back_to_be_fixed():
+    agent = answering_agent()
+    agent.llm = scripted(
+        answer_reply("1", city="Paris"),
+        answer_reply("2", city="Paris", temperature=20),
+    )
+    result = agent(HumanMessage(content="hi"), use_cache=False)
+    assert result["output"] == Answer(city="Paris", temperature=20)
+    # The second call saw why the first answer was rejected.
+    rejection = agent.llm.sent[1][-1]
+    assert rejection.status == "error"
+    assert "temperature" in rejection.content
+
+
+def test_rejected_answers_give_up_after_the_retries():
+    agent = answering_agent()
+    agent.llm = scripted(
+        *(answer_reply(str(i), city="Paris") for i in range(ANSWER_RETRIES + 1))
+    )
+    with pytest.raises(ValidationError):
+        agent(HumanMessage(content="hi"), use_cache=False)
+    assert len(agent.llm.sent) == ANSWER_RETRIES + 1
+
+
+def test_rejected_answer_escalates_to_the_next_tier():
+    router = ModelRouter([LLMModel.Mock_Instant, LLMModel.Mock])
+    agent = answering_agent(router=router)
+    agent.llms = [
+        scripted(answer_reply("1", city="Paris")),
+        scripted(answer_reply("2", city="Paris", temperature=20)),
+    ]
+    result = agent(HumanMessage(content="hi"), use_cache=False)
+    assert result["output"] == Answer(city="Paris", temperature=20)
+    assert [len(llm.sent) for llm in agent.llms] == [1, 1]
+    stats = router.stats()
+    assert stats["mock-instant"]["escalations"] == 1
+    assert stats["mock"]["successes"] == 1
+
+
+def test_delegates_run_as_sub_graph_nodes():
+    helper = Agent("helper", LLMModel.Mock_Instant)
+    helper.llm = scripted(AIMessage("22 degrees"), AIMessage("9 degrees"))
+    lead = Agent("lead", LLMModel.Mock_Instant, delegates=dict(helper=helper))
+    tasks = [
+        dict(name="helper", args=dict(task=f"weather in {city}"), id=city)
+        for city in ("Paris", "Oslo")
+    ]
+    lead.llm = scripted(AIMessage("", tool_calls=tasks), AIMessage("Warm, then cold"))
+    result = asyncio.run(lead.ainvoke(HumanMessage(content="hi"), use_cache=False))
+    assert result["messages"][-1].content == "Warm, then cold"
+    results = result["messages"][2:4]
+    assert sorted(m.content for m in results) == ["22 degrees", "9 degrees"]
+    # Each task is its own run of the helper, on the task alone.
+    assert sorted(sent[-1].content for sent in helper.llm.sent) == [
+        "weather in Oslo",
+        "weather in Paris",
+    ]
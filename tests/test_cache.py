@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agentic_webapp.dmbr.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_and_evict():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" was the least recently used.
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_get_or_load_single_flight():
+    cache = TTLCache()
+    calls = []
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return "v"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", load)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ["v"] * 5
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_aget_or_load_single_flight():
+    cache = TTLCache()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "v"
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.aget_or_load("k", load) for _ in range(5))
+        )
+
+    assert asyncio.run(main()) == ["v"] * 5
+    assert len(calls) == 1
+    assert cache.get("k") == "v"
+
+
+def test_aget_or_load_survives_leader_cancellation():
+    cache = TTLCache()
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "v"
+
+    async def main():
+        leader = asyncio.create_task(cache.aget_or_load("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_load("k", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "v"
+    assert not cache._ainflight
+
+
+def test_aget_or_load_cancels_abandoned_load():
+    cache = TTLCache()
+    cancelled = []
+
+    async def load():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        caller = asyncio.create_task(cache.aget_or_load("k", load))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+    assert not cache._ainflight
+
+
+def test_aget_or_load_errors_reach_every_caller():
+    cache = TTLCache()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("down")
+
+    async def main():
+        return await asyncio.gather(
+            *(cache.aget_or_load("k", load) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get("k") is None
+
+
+def test_uncacheable_values_are_not_kept():
+    cache = TTLCache()
+    assert cache.get_or_load("k", lambda: None, cacheable=bool) is None
+    assert cache.stats()["size"] == 0
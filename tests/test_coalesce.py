@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from agentic_webapp.coalesce import StreamCoalescer, prompt_key, publish_result
+
+
+def frames_factory(count: int, delay: float = 0.01, started: list = None):
+    def frames():
+        async def generate():
+            if started is not None:
+                started.append(1)
+            for i in range(count):
+                await asyncio.sleep(delay)
+                yield b"frame %d" % i
+
+        return generate()
+
+    return frames
+
+
+async def collect(stream) -> list:
+    return [frame async for frame in stream]
+
+
+def test_prompt_key_evens_out_retyped_prompts():
+    assert prompt_key("What's the weather in Paris?") == prompt_key(
+        "  what's the WEATHER in paris "
+    )
+
+
+def test_identical_requests_share_one_generation():
+    coalescer = StreamCoalescer()
+    started = []
+    frames = frames_factory(3, started=started)
+
+    async def main():
+        return await asyncio.gather(
+            *(collect(coalescer.stream("k", frames)) for _ in range(3))
+        )
+
+    results = asyncio.run(main())
+    assert results == [[b"frame 0", b"frame 1", b"frame 2"]] * 3
+    assert len(started) == 1
+    assert coalescer.stats() == dict(
+        inflight=0, subscribers=0, generations=1, joined=2
+    )
+
+
+def test_late_joiner_gets_the_frames_sent_so_far():
+    coalescer = StreamCoalescer()
+    frames = frames_factory(4, delay=0.02)
+
+    async def main():
+        first = asyncio.create_task(collect(coalescer.stream("k", frames)))
+        await asyncio.sleep(0.05)
+        late = await collect(coalescer.stream("k", frames))
+        return await first, late
+
+    first, late = asyncio.run(main())
+    assert late == first == [b"frame %d" % i for i in range(4)]
+
+
+def test_joiners_get_the_published_result():
+    coalescer = StreamCoalescer()
+    joined = []
+
+    def frames():
+        async def generate():
+            for i in range(2):
+                await asyncio.sleep(0.01)
+                yield b"frame %d" % i
+            publish_result("answer")
+
+        return generate()
+
+    async def on_joined(result):
+        joined.append(result)
+
+    async def main():
+        await asyncio.gather(
+            *(collect(coalescer.stream("k", frames, on_joined)) for _ in range(3))
+        )
+
+    asyncio.run(main())
+    # The leader's generation records its own exchange.
+    assert joined == ["answer"] * 2
+
+
+def test_none_key_never_coalesces():
+    coalescer = StreamCoalescer()
+    started = []
+    frames = frames_factory(2, started=started)
+
+    async def main():
+        streams = [collect(coalescer.stream(None, frames)) for _ in range(2)]
+        await asyncio.gather(*streams)
+
+    asyncio.run(main())
+    assert len(started) == 2
+    assert coalescer.stats()["generations"] == 0
+
+
+def test_generation_stops_when_every_client_leaves():
+    coalescer = StreamCoalescer()
+    cancelled = []
+
+    def frames():
+        async def generate():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield b"frame"
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+
+        return generate()
+
+    async def main():
+        stream = coalescer.stream("k", frames)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+    assert coalescer.stats()["inflight"] == 0
+
+
+def test_errors_reach_every_subscriber():
+    coalescer = StreamCoalescer()
+
+    def frames():
+        async def generate():
+            yield b"frame"
+            await asyncio.sleep(0.01)
+            raise RuntimeError("down")
+
+        return generate()
+
+    async def main():
+        return await asyncio.gather(
+            *(collect(coalescer.stream("k", frames)) for _ in range(2)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert "k" not in coalescer.inflight
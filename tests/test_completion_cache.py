@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk
+
+from agentic_webapp.dmbr.completion_cache import (
+    CompletionCache,
+    MemoryBackend,
+    SQLiteBackend,
+    completion_key,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def prompt(*messages) -> str:
+    return dumps(list(messages))
+
+
+PROMPT = prompt(HumanMessage(content="weather in Paris?"))
+
+
+def tool_call_message() -> AIMessage:
+    calls = [dict(name="weather", args=dict(city="Paris"), id="call_1")]
+    return AIMessage(
+        content=[dict(type="tool_use", id="call_1", name="weather", input={})],
+        tool_calls=calls,
+        additional_kwargs=dict(tool_calls=[dict(id="call_1", type="function")]),
+        id="run-1",
+    )
+
+
+def test_replayed_tool_calls_get_fresh_ids():
+    cache = CompletionCache(MemoryBackend())
+    cache.update(PROMPT, "llm", [ChatGeneration(message=tool_call_message())])
+    first, second = (cache.lookup(PROMPT, "llm")[0].message for _ in range(2))
+    assert first.id is None
+    (call,) = first.tool_calls
+    assert call["id"].startswith("call_") and call["id"] != "call_1"
+    assert call["id"] != second.tool_calls[0]["id"]
+    # Every copy of the id in the message is renamed the same way.
+    assert first.content[0]["id"] == call["id"]
+    assert first.additional_kwargs["tool_calls"][0]["id"] == call["id"]
+
+
+def test_replayed_tool_call_chunks_get_fresh_ids():
+    chunk = AIMessageChunk(
+        content="",
+        tool_call_chunks=[dict(name="weather", args="{}", id="call_1", index=0)],
+    )
+    cache = CompletionCache(MemoryBackend())
+    cache.update(PROMPT, "llm", [ChatGenerationChunk(message=chunk)])
+    replayed = cache.lookup(PROMPT, "llm")[0].message
+    assert replayed.tool_call_chunks[0]["id"] == replayed.tool_calls[0]["id"]
+    assert replayed.tool_calls[0]["id"] != "call_1"
+
+
+def test_fifo_hits_do_not_write(tmp_path):
+    clock = Clock()
+    backend = SQLiteBackend(str(tmp_path / "c.sqlite"), eviction="fifo", clock=clock)
+    backend.set("k", "v")
+    changes = backend._conn.total_changes
+    clock.now += 10
+    assert backend.get("k") == "v"
+    assert backend._conn.total_changes == changes
+
+
+def test_key_ignores_message_ids_and_metadata():
+    asked = prompt(HumanMessage(content="hi", id="1"))
+    again = prompt(HumanMessage(content="hi", id="2", response_metadata=dict(a=1)))
+    assert completion_key(asked, "gpt-4o") == completion_key(again, "gpt-4o")
+
+
+def test_key_follows_the_messages_and_the_model():
+    asked = prompt(HumanMessage(content="hi"))
+    assert completion_key(asked, "gpt-4o") != completion_key(asked, "gpt-4o-mini")
+    assert completion_key(asked, "gpt-4o") != completion_key(
+        prompt(HumanMessage(content="hello")), "gpt-4o"
+    )
+    answered = prompt(HumanMessage(content="hi"), AIMessage(content="hello"))
+    assert completion_key(asked, "gpt-4o") != completion_key(answered, "gpt-4o")
+
+
+def test_sqlite_entries_survive_reopening_and_expire(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    clock = Clock()
+    SQLiteBackend(path, ttl=60, clock=clock).set("k", "v")
+    reopened = SQLiteBackend(path, ttl=60, clock=clock)
+    assert reopened.get("k") == "v"
+    clock.now += 61
+    assert reopened.get("k") is None
+    assert reopened.stats()["hits"] == reopened.stats()["misses"] == 1
+
+
+def sqlite_eviction(tmp_path, eviction: str) -> SQLiteBackend:
+    clock = Clock()
+    backend = SQLiteBackend(
+        str(tmp_path / "c.sqlite"), maxsize=2, eviction=eviction, clock=clock
+    )
+    backend.set("old", "1")
+    clock.now += 1
+    backend.set("new", "2")
+    clock.now += 1
+    backend.get("old")
+    clock.now += 1
+    backend.set("newest", "3")
+    return backend
+
+
+def test_sqlite_lru_evicts_the_least_recently_used(tmp_path):
+    backend = sqlite_eviction(tmp_path, "lru")
+    assert backend.get("new") is None
+    assert backend.get("old") == "1"
+
+
+def test_sqlite_fifo_evicts_the_oldest(tmp_path):
+    backend = sqlite_eviction(tmp_path, "fifo")
+    assert backend.get("old") is None
+    assert backend.get("new") == "2"
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agentic_webapp.dmbr.context import ContextWindow, message_units
+from agentic_webapp.dmbr.llm import LLMModel
+
+
+def tool_turn(id: str, result: str) -> list:
+    call = dict(name="weather_prediction", args=dict(city="Paris"), id=id)
+    return [
+        AIMessage(content="", tool_calls=[call]),
+        ToolMessage(tool_call_id=id, content=result),
+    ]
+
+
+def conversation(turns: int) -> list:
+    messages = []
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"question {i}"))
+        messages.extend(tool_turn(str(i), f"result {i}"))
+        messages.append(AIMessage(content=f"answer {i}"))
+    return messages
+
+
+def window(max_tokens: int, **kwargs) -> ContextWindow:
+    # Ten tokens a message keeps the budgets readable.
+    return ContextWindow(max_tokens, token_counter=lambda message: 10, **kwargs)
+
+
+def test_tool_calls_travel_with_their_results():
+    messages = conversation(1)
+    assert message_units(messages) == [(0, 1), (1, 3), (3, 4)]
+
+
+def test_window_keeps_the_latest_messages_within_budget():
+    messages = conversation(3)
+    sent, summary, update = window(40).prepare(dict(messages=messages))
+    assert sent == messages[-4:]
+    assert summary is None
+    assert update == {}
+
+
+def test_window_never_splits_a_tool_call_from_its_results():
+    messages = conversation(2)
+    # 30 tokens fit the answer and the tool turn but not the question before.
+    sent, _, _ = window(30).prepare(dict(messages=messages))
+    assert sent == messages[-3:]
+    # 20 tokens cannot take the tool turn whole, so it is left out.
+    sent, _, _ = window(20).prepare(dict(messages=messages))
+    assert sent == messages[-1:]
+
+
+def test_latest_message_is_sent_even_over_budget():
+    messages = conversation(1)
+    sent, _, _ = window(0).prepare(dict(messages=messages))
+    assert sent == messages[-1:]
+
+
+def test_earlier_tool_results_are_truncated():
+    messages = [
+        HumanMessage(content="question"),
+        *tool_turn("1", "x" * 50),
+        HumanMessage(content="again"),
+        *tool_turn("2", "y" * 50),
+    ]
+    sent, _, _ = window(1000, max_tool_chars=10).prepare(dict(messages=messages))
+    assert sent[2].content == "x" * 10 + "... [truncated]"
+    # The latest results are sent whole, for the model to answer from.
+    assert sent[-1].content == "y" * 50
+
+
+def test_dropped_messages_are_summarized_once():
+    context = window(40, summary_model=LLMModel.Mock_Instant)
+    messages = conversation(3)
+    sent, summary, update = context.prepare(dict(messages=messages))
+    assert sent == messages[-4:]
+    assert summary
+    assert update == dict(summary=summary, summarized=8)
+    # With the summary in the budget, the next turn drops nothing new.
+    state = dict(messages=messages, **update)
+    _, again, more = window(1000, summary_model=LLMModel.Mock_Instant).prepare(
+        state
+    )
+    assert again == summary
+    assert more == {}
+
+
+def test_summaries_extend_from_where_the_last_one_stopped():
+    context = window(40, summary_model=LLMModel.Mock_Instant)
+    messages = conversation(4)
+    state = dict(messages=messages, summary="earlier", summarized=8)
+    dropped = []
+    summarize = context._summary_messages
+
+    def recording(summary, messages):
+        dropped.extend(messages)
+        return summarize(summary, messages)
+
+    context._summary_messages = recording
+    sent, _, update = asyncio.run(context.aprepare(state))
+    # The summary takes its share of the budget, so the last question goes too.
+    assert sent == messages[-3:]
+    assert dropped == messages[8:13]
+    assert update["summarized"] == 13
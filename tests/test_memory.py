@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import asyncio
+import sqlite3
+
+import aiosqlite
+
+from agentic_webapp.dmbr.memory import BatchedCommitConnection
+
+
+class CountingConnection:
+    def __init__(self, conn: aiosqlite.Connection):
+        self.conn = conn
+        self.commits = 0
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    async def commit(self):
+        self.commits += 1
+        await self.conn.commit()
+
+
+def test_concurrent_commits_are_grouped_and_on_disk_when_returned(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    counting = None
+
+    async def write(conn: BatchedCommitConnection, i: int):
+        await conn.execute("INSERT INTO t VALUES (?)", (i,))
+        await conn.commit()
+        # Another connection sees the row as soon as commit() returns.
+        with sqlite3.connect(path) as other:
+            assert other.execute("SELECT 1 FROM t WHERE i = ?", (i,)).fetchone()
+
+    async def main():
+        nonlocal counting
+        raw = await aiosqlite.connect(path)
+        await raw.execute("CREATE TABLE t (i INTEGER)")
+        await raw.commit()
+        counting = CountingConnection(raw)
+        conn = BatchedCommitConnection(counting)
+        await asyncio.gather(*(write(conn, i) for i in range(20)))
+        await conn.close()
+
+    asyncio.run(main())
+    assert 1 <= counting.commits < 20
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (20,)
+
+
+def test_idle_commit_goes_to_disk_at_once(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+
+    async def main():
+        conn = BatchedCommitConnection(await aiosqlite.connect(path))
+        await conn.execute("CREATE TABLE t (i INTEGER)")
+        await conn.commit()
+        await conn.execute("INSERT INTO t VALUES (1)")
+        await conn.commit()
+        with sqlite3.connect(path) as other:
+            count = other.execute("SELECT COUNT(*) FROM t").fetchone()
+        await conn.close()
+        return count
+
+    assert asyncio.run(main()) == (1,)
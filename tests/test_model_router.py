@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.model_router import ModelRouter, request_complexity
+
+
+def router(**kwargs) -> ModelRouter:
+    return ModelRouter([LLMModel.GPT4_Omni_mini, LLMModel.GPT4_Omni], **kwargs)
+
+
+def test_one_place_lookups_score_one():
+    assert request_complexity("What's the weather in Paris?") == 1
+
+
+def test_each_place_adds_a_point():
+    assert request_complexity("Weather in Paris, Rome and Oslo?") == 3
+
+
+def test_reasoning_words_and_long_prompts_add_a_point():
+    assert request_complexity("Should I go to Paris?") == 2
+    assert request_complexity("weather in Paris " * 20) == 2
+
+
+def test_routes_by_the_latest_user_message():
+    messages = [
+        HumanMessage(content="Compare Paris, Rome and Oslo"),
+        AIMessage(content="Done"),
+        HumanMessage(content="And Paris?"),
+    ]
+    assert router().route(messages) == 0
+    assert router().route(messages[:1]) == 1
+
+
+def test_thresholds_pick_the_tier():
+    tiered = router(thresholds=(3,))
+    assert tiered.route([HumanMessage(content="Paris, Rome and Oslo?")]) == 0
+    assert tiered.route([HumanMessage(content="Paris, Rome, Oslo, Lima?")]) == 1
+    stats = tiered.stats()
+    assert stats["gpt-4o-mini"]["scores"] == {3: 1}
+    assert stats["gpt-4o"]["scores"] == {4: 1}
+
+
+def test_escalate_goes_up_one_tier_until_the_top():
+    models = router()
+    error = ValueError("invalid answer")
+    assert models.escalate(0, error) == 1
+    assert models.escalate(1, error) is None
+    models.succeeded(1)
+    stats = models.stats()
+    assert stats["gpt-4o-mini"]["escalations"] == 1
+    assert stats["gpt-4o"]["escalations"] == 1
+    assert stats["gpt-4o"]["success_rate"] == 0.5
+
+
+def test_tiers_can_be_model_groups():
+    groups = ModelRouter([(LLMModel.GPT4_Omni_mini, LLMModel.Claude3_Haiku)])
+    assert groups.tier_name(0) == "gpt-4o-mini+claude-3-haiku-20240307"
+
+
+def test_a_router_needs_a_tier():
+    with pytest.raises(ValueError):
+        ModelRouter([])
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import httpx
+
+from agentic_webapp.dmbr.openweathermap import OpenWeatherMapClient
+from agentic_webapp.dmbr.tools import project_weather_prediction
+
+
+def html_error_transport(calls: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(503, text="<html>Service Unavailable</html>")
+
+    return httpx.MockTransport(handler)
+
+
+def test_non_json_errors_come_back_as_error_predictions():
+    calls = []
+    client = OpenWeatherMapClient(
+        transport=html_error_transport(calls), retries=1, backoff=0
+    )
+    prediction = client.get_weather("Paris")
+    assert len(calls) == 2
+    assert prediction["cod"] == "503"
+    assert project_weather_prediction(prediction) == dict(
+        error="Weather prediction failed with HTTP 503"
+    )
+
+
+def test_non_json_errors_come_back_as_error_predictions_async():
+    calls = []
+    client = OpenWeatherMapClient(
+        transport=html_error_transport(calls), retries=0, backoff=0
+    )
+    prediction = asyncio.run(client.aget_weather("Paris"))
+    assert len(calls) == 1
+    assert prediction["cod"] == "503"
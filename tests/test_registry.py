@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agentic_webapp.dmbr import registry
+from agentic_webapp.dmbr.agent import Agent
+from agentic_webapp.dmbr.llm import LLMModel
+from agentic_webapp.dmbr.registry import agent_factory, get_agent
+
+
+@pytest.fixture
+def factories(monkeypatch):
+    # Registrations and built agents are dropped after each test.
+    monkeypatch.setattr(registry, "AGENT_FACTORIES", {})
+    monkeypatch.setattr(registry, "_agents", {})
+    built = []
+
+    @agent_factory("helper")
+    def helper() -> Agent:
+        built.append("helper")
+        return Agent("helper", LLMModel.Mock_Instant)
+
+    @agent_factory("lead")
+    def lead() -> Agent:
+        built.append("lead")
+        # Factories may build their delegates through the registry.
+        return Agent(
+            "lead", LLMModel.Mock_Instant, delegates=dict(helper=get_agent("helper"))
+        )
+
+    return built
+
+
+def test_agents_are_built_once_and_shared(factories):
+    assert get_agent("lead") is get_agent("lead")
+    assert get_agent("lead").delegates["helper"].agent is get_agent("helper")
+    assert factories == ["lead", "helper"]
+
+
+def test_concurrent_first_requests_build_one_agent(factories):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        agents = list(executor.map(get_agent, ["lead"] * 8))
+    assert all(agent is agents[0] for agent in agents)
+    assert factories == ["lead", "helper"]
+
+
+def test_unknown_agents_are_an_error(factories):
+    with pytest.raises(ValueError):
+        get_agent("nobody")
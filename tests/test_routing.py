@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+
+from agentic_webapp.dmbr.mock_llm import MockChatModel
+from agentic_webapp.dmbr.routing import RoutingChatModel
+
+
+def routing_model(*latencies: float, **kwargs) -> RoutingChatModel:
+    return RoutingChatModel(
+        models=[MockChatModel(latency=latency) for latency in latencies],
+        names=[f"model{i}" for i in range(len(latencies))],
+        **kwargs,
+    )
+
+
+def test_fails_over_to_the_next_model():
+    def overloaded(messages):
+        raise RuntimeError("429")
+
+    model = routing_model(0, 0)
+    model.models[0] = RunnableLambda(overloaded)
+    reply = asyncio.run(model.ainvoke([HumanMessage(content="hi")]))
+    assert reply.content.startswith("This is a mock answer")
+    assert model.stats.failovers == 1
+
+
+def test_hedge_records_the_cancelled_wait():
+    model = routing_model(0.3, 0.01, hedge=True, hedge_after=0.05)
+    asyncio.run(model.ainvoke([HumanMessage(content="hi")]))
+    assert model.stats.hedges == model.stats.hedge_wins == 1
+    # The slow model's first token never came; it still counts as a sample of
+    # at least the time it was given.
+    (waited,) = model.stats.first_token["model0"]
+    assert waited >= 0.05
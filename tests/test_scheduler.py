@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agentic_webapp.dmbr import scheduler as scheduler_module
+from agentic_webapp.dmbr.scheduler import (
+    DEFAULT_LIMITS,
+    Lane,
+    Overloaded,
+    Scheduler,
+    Ticket,
+    parse_limits,
+)
+
+
+def test_parse_limits():
+    assert parse_limits("openai=500/30000, groq:llama=30,") == {
+        "openai": (500.0, 30000.0),
+        "groq:llama": (30.0, None),
+    }
+    limits = parse_limits("default,groq=60")
+    assert limits == {**DEFAULT_LIMITS, "groq": (60.0, None)}
+
+
+def test_no_limits_unless_configured(monkeypatch):
+    monkeypatch.delenv("RATE_LIMITS", raising=False)
+    scheduler_module.get_scheduler.cache_clear()
+    try:
+        assert scheduler_module.get_scheduler().limits == {}
+    finally:
+        scheduler_module.get_scheduler.cache_clear()
+
+
+def test_model_limits_replace_the_providers():
+    scheduler = Scheduler({"p": (60, 1000), "p:big": (600, 50_000)})
+    big = scheduler.lane("p", "big")
+    assert [b.rate for b in big.buckets] == [10, 50_000 / 60]
+    # Models without limits of their own share the provider's buckets.
+    assert scheduler.lane("p", "a").buckets == scheduler.lane("p", "b").buckets
+    assert scheduler.lane("p", "a").buckets[0].rate == 1
+
+
+def test_unlimited_lanes_admit_at_once():
+    scheduler = Scheduler()
+    with scheduler.slot("local", "tool"):
+        pass
+    assert scheduler.stats()["lanes"]["local:tool"]["admitted"] == 1
+
+
+def test_lane_takes_turns_between_sessions():
+    lane = Lane("test", [], [], threading.Lock())
+    tickets = [Ticket(lane, session, 0, 0) for session in "aaab"]
+    for ticket in tickets:
+        lane.push(ticket)
+    served = [lane.pop().session for _ in tickets]
+    assert served == ["a", "b", "a", "a"]
+    assert lane.depth == 0
+
+
+def test_queued_call_waits_for_its_bucket():
+    # Two requests a second
+    scheduler = Scheduler({"p": (120, None)})
+    scheduler.lane("p")
+    scheduler.buckets["p requests"].level = 0
+
+    async def main():
+        started = time.monotonic()
+        async with scheduler.aslot("p"):
+            return time.monotonic() - started
+
+    waited = asyncio.run(main())
+    assert 0.3 < waited < 2
+    assert scheduler.stats()["lanes"]["p"]["queued"] == 1
+
+
+def test_call_past_the_deadline_is_shed():
+    scheduler = Scheduler({"p": (6, None)}, max_wait=0.5)
+    scheduler.acquire("p")
+    with pytest.raises(Overloaded):
+        scheduler.acquire("p")
+    assert scheduler.stats()["lanes"]["p"]["shed_deadline"] == 1
+
+
+def test_full_queue_is_shed():
+    scheduler = Scheduler({"p": (6, None)}, max_queue=1, max_wait=60)
+    scheduler.acquire("p")
+
+    async def main():
+        queued = asyncio.create_task(scheduler.aacquire("p", session="a"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await scheduler.aacquire("p", session="b")
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+    asyncio.run(main())
+    lane = scheduler.lane("p")
+    assert lane.shed_full == 1
+    # The cancelled call gave its place back.
+    assert lane.depth == 0
+
+
+def test_settle_charges_actual_tokens():
+    scheduler = Scheduler({"p:m": (600, 6000)})
+    ticket = scheduler.acquire("p", "m", tokens=500)
+    bucket = scheduler.buckets["p:m tokens"]
+    level = bucket.level
+    ticket.settle(100)
+    assert bucket.level == pytest.approx(level + 400)
+
+
+def test_new_call_does_not_jump_a_sibling_lanes_queue():
+    # Both models share the provider's bucket, each with a queue of its own.
+    scheduler = Scheduler({"p": (60, None)}, max_wait=60)
+    scheduler.lane("p", "a")
+    bucket = scheduler.buckets["p requests"]
+    bucket.level = 0
+
+    async def main():
+        waiting = asyncio.create_task(scheduler.aacquire("p", "a"))
+        await asyncio.sleep(0.01)
+        # Enough for one call, which is the waiting ticket's
+        with scheduler._lock:
+            bucket.level = 1
+        newcomer = asyncio.create_task(scheduler.aacquire("p", "b"))
+        done, _ = await asyncio.wait([waiting, newcomer], timeout=0.5)
+        newcomer.cancel()
+        return done
+
+    assert [task.result().lane.key for task in asyncio.run(main())] == ["p:a"]
+    assert scheduler.lane("p", "b").queued == 1
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agentic_webapp.dmbr.semantic_cache import (
+    SemanticCache,
+    hashing_embedding,
+    is_first_turn,
+    normalize_prompt,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return SemanticCache(uri=str(tmp_path), embed=hashing_embedding(), clock=clock)
+
+
+def test_normalize_prompt_drops_filler():
+    assert normalize_prompt("What's the weather like in Paris?") == "weather paris"
+    # Nothing but filler is kept as is.
+    assert normalize_prompt("How are you?") == "how are you"
+
+
+def test_is_first_turn():
+    assert is_first_turn(None)
+    assert is_first_turn([HumanMessage(content="hi"), AIMessage(content="hello")])
+    assert not is_first_turn([HumanMessage(content="hi"), HumanMessage(content="so")])
+
+
+def test_rewordings_hit(cache):
+    cache.store("weather", "What's the weather like in Paris?", "sunny")
+    assert cache.lookup("weather", "weather in paris") == "sunny"
+    assert cache.lookup("weather", "Is it raining in Nairobi?") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_namespaces_are_kept_apart(cache):
+    cache.store("weather", "Paris", "sunny")
+    assert cache.lookup("chat", "Paris") is None
+
+
+def test_entries_expire(cache, clock):
+    cache.store("weather", "Paris", "sunny")
+    clock.now += cache.ttl + 1
+    assert cache.lookup("weather", "Paris") is None
+
+
+def test_async_lookup_and_store(cache):
+    async def main():
+        await cache.astore("weather", "Paris", "sunny")
+        return await cache.alookup("weather", "Paris")
+
+    assert asyncio.run(main()) == "sunny"
+
+
+def test_bypass_header(cache):
+    assert cache.bypass({"X-Semantic-Cache": "Bypass"})
+    assert not cache.bypass({})
+    assert cache.stats()["bypassed"] == 1
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+
+from agentic_webapp.sse import SSEEmitter, encode_event, html_frame
+
+
+async def frames_of(items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_encode_event_splits_lines_into_data_fields():
+    assert encode_event("a\r\nb\rc", event="Chat", id=3) == (
+        b"event: Chat\nid: 3\ndata: a\ndata: b\ndata: c\n\n"
+    )
+
+
+def test_event_names_cannot_span_lines():
+    with pytest.raises(ValueError):
+        encode_event("x", event="Chat\nid: 1")
+
+
+def test_html_frame_escapes_text():
+    frame = html_frame("Token", "Token", "<b>", hx_swap_oob="beforeend")
+    assert frame.startswith(b"event: Token\ndata: <div")
+    assert b"&lt;b&gt;" in frame
+    assert b'hx-swap-oob="beforeend"' in frame
+    assert frame.endswith(b"</div>\n\n")
+
+
+def test_emitter_coalesces_bursts():
+    emitter = SSEEmitter(coalesce_window=0.05)
+    chunks = asyncio.run(collect(emitter.stream(frames_of([b"a", b"b", b"c"]))))
+    assert chunks == [b"abc"]
+
+
+def test_emitter_sends_slow_frames_on_their_own():
+    emitter = SSEEmitter(coalesce_window=0.001)
+    stream = emitter.stream(frames_of([b"a", b"b"], delay=0.05))
+    assert asyncio.run(collect(stream)) == [b"a", b"b"]
+
+
+def test_emitter_caps_chunk_size():
+    emitter = SSEEmitter(coalesce_window=0.05, max_bytes=2)
+    stream = emitter.stream(frames_of([b"aa", b"bb", b"c"]))
+    assert asyncio.run(collect(stream)) == [b"aa", b"bb", b"c"]
+
+
+def test_emitter_raises_producer_errors():
+    async def failing():
+        yield b"a"
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(SSEEmitter().stream(failing())))
+
+
+def test_emitter_stops_the_producer_when_closed():
+    closed = []
+
+    async def endless():
+        try:
+            while True:
+                await asyncio.sleep(0.01)
+                yield b"a"
+        finally:
+            closed.append(1)
+
+    async def main():
+        stream = SSEEmitter(coalesce_window=0).stream(endless())
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert closed == [1]
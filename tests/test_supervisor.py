@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from agentic_webapp.dmbr.supervisor import (
+    Delegate,
+    arun_delegate_calls,
+    run_delegate_calls,
+)
+
+
+request: ContextVar[str] = ContextVar("request", default="none")
+
+
+def delegate_agent(**kwargs) -> Delegate:
+    """
+    Delegate: Over a graph answering "<task> done" after sleeping the task's
+    seconds, failing tasks saying "fail"
+    """
+
+    def answer(task: str) -> dict:
+        if task == "fail":
+            raise RuntimeError("down")
+        return dict(messages=[AIMessage(content=f"{task} done by {request.get()}")])
+
+    def run(state: dict) -> dict:
+        task = state["messages"][-1].content
+        time.sleep(float(task) if task[0].isdigit() else 0)
+        return answer(task)
+
+    async def arun(state: dict) -> dict:
+        task = state["messages"][-1].content
+        await asyncio.sleep(float(task) if task[0].isdigit() else 0)
+        return answer(task)
+
+    graph = RunnableLambda(run, afunc=arun)
+    return Delegate(SimpleNamespace(graph=graph, description=""), **kwargs)
+
+
+def calls(*tasks: str) -> list:
+    return [
+        dict(name="helper", args=dict(task=task), id=str(i))
+        for i, task in enumerate(tasks)
+    ]
+
+
+class Reports(BaseCallbackHandler):
+    def __init__(self):
+        self.results = []
+
+    def on_custom_event(self, name, data, **kwargs):
+        self.results.append(data["result"])
+
+
+def fan_out(delegate: Delegate, tool_calls: list, reports: Reports = None) -> list:
+    # Results are reported as events, which need a run to belong to.
+    run = RunnableLambda(
+        lambda _, config: run_delegate_calls("helper", delegate, tool_calls, config)
+    )
+    return run.invoke(None, dict(callbacks=[reports] if reports else []))
+
+
+def afan_out(delegate: Delegate, tool_calls: list) -> list:
+    async def run(_, config):
+        return await arun_delegate_calls("helper", delegate, tool_calls, config)
+
+    return asyncio.run(RunnableLambda(run).ainvoke(None))
+
+
+def test_delegate_runs_in_the_callers_context():
+    request.set("request 1")
+    (result,) = fan_out(delegate_agent(), calls("a"))
+    assert result.content == "a done by request 1"
+
+
+def test_tasks_run_side_by_side_and_come_back_in_order():
+    reports = Reports()
+    started = time.monotonic()
+    results = fan_out(delegate_agent(), calls("0.2", "0.1", "0.01"), reports)
+    assert time.monotonic() - started < 0.3
+    assert [r.tool_call_id for r in results] == ["0", "1", "2"]
+    assert [r.content.split()[0] for r in results] == ["0.2", "0.1", "0.01"]
+    # Reported as they finish
+    assert [r.split()[0] for r in reports.results] == ["0.01", "0.1", "0.2"]
+
+
+def test_delegate_concurrency_is_limited():
+    started = time.monotonic()
+    fan_out(delegate_agent(max_concurrency=1), calls("0.05", "0.05"))
+    assert time.monotonic() - started >= 0.1
+
+
+def test_failed_and_timed_out_tasks_get_error_results():
+    delegate = delegate_agent(timeout=0.2)
+    results = fan_out(delegate, calls("fail", "1", "0.01"))
+    assert results[0].content == results[1].content == (
+        "Delegate helper failed, please try again"
+    )
+    assert results[2].content.startswith("0.01 done")
+
+
+def test_async_tasks_run_side_by_side_with_timeouts():
+    delegate = delegate_agent(timeout=0.2)
+    started = time.monotonic()
+    results = afan_out(delegate, calls("0.1", "1", "fail", "0.1"))
+    assert time.monotonic() - started < 0.5
+    assert [r.content.split()[0] for r in results] == [
+        "0.1",
+        "Delegate",
+        "Delegate",
+        "0.1",
+    ]
+
+
+def test_async_delegate_concurrency_is_limited():
+    started = time.monotonic()
+    afan_out(delegate_agent(max_concurrency=1), calls("0.05", "0.05"))
+    assert time.monotonic() - started >= 0.1
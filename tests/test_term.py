@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import json
+import logging
+
+import pytest
+
+from agentic_webapp.dmbr.term import (
+    ColorFormatter,
+    JSONFormatter,
+    logger,
+    print_assistant_msg,
+    print_debug_msg,
+    print_error_msg,
+    print_info_msg,
+)
+
+
+class Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+class Costly:
+    """
+    Costly: Counts how many times it is turned into text
+    """
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self) -> str:
+        self.formatted += 1
+        return "costly"
+
+
+@pytest.fixture
+def records():
+    handler = Records()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield handler.records
+    logger.removeHandler(handler)
+    logger.setLevel(level)
+
+
+def test_messages_below_the_level_are_never_formatted(records):
+    costly = Costly()
+    print_debug_msg("State %s", costly)
+    assert records == []
+    assert costly.formatted == 0
+
+
+def test_messages_are_formatted_from_their_arguments(records):
+    print_info_msg("State %s", Costly())
+    (record,) = records
+    assert record.getMessage() == "State costly"
+
+
+def test_records_carry_the_level_color_and_caller(records):
+    print_error_msg("Failed: %s", "down")
+    print_assistant_msg("Answer")
+    error, answer = records
+    assert (error.levelno, error.color) == (logging.ERROR, "red")
+    assert (answer.levelno, answer.color) == (logging.INFO, "green")
+    # The line that called print_*_msg, not term.py
+    assert error.module == "test_term"
+
+
+def test_json_lines_hold_the_message_and_its_origin(records):
+    print_info_msg("Weather for %s", "Paris")
+    entry = json.loads(JSONFormatter().format(records[0]))
+    assert entry["message"] == "Weather for Paris"
+    assert entry["level"] == "INFO"
+    assert entry["module"] == "test_term"
+
+
+def test_text_lines_are_colored(records, monkeypatch):
+    # termcolor leaves out the colors when stdout is not a terminal.
+    monkeypatch.setenv("FORCE_COLOR", "1")
+    print_error_msg("Failed")
+    assert ColorFormatter().format(records[0]) == "\x1b[31mFailed\x1b[0m"
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import time
+from datetime import date
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from agentic_webapp.dmbr.mock_openweathermap import mock_weather
+from agentic_webapp.dmbr.scheduler import Scheduler
+from agentic_webapp.dmbr.tool_calls import (
+    TOOL_NOT_FOUND,
+    TOOL_PROJECTIONS,
+    answer_tool_calls,
+    arun_tool_calls,
+    missing_tool_results,
+    run_tool_calls,
+    serialize_tool_result,
+    tool_projection,
+)
+from agentic_webapp.dmbr.tools import project_weather_prediction
+
+
+@tool
+async def asleep(seconds: float) -> str:
+    """Sleep, then say for how long"""
+    await asyncio.sleep(seconds)
+    return f"slept {seconds}"
+
+
+@tool
+def sleep(seconds: float) -> str:
+    """Sleep, then say for how long"""
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+
+def call(name: str, seconds: float, id: str) -> dict:
+    return dict(name=name, args=dict(seconds=seconds), id=id)
+
+
+def test_arun_tool_calls_keeps_call_order():
+    tools = {"asleep": asleep}
+    calls = [call("asleep", 0.05, "1"), call("asleep", 0.01, "2"), call("x", 0, "3")]
+    started = time.monotonic()
+    results = asyncio.run(arun_tool_calls(tools, calls))
+    # Side by side, not one after the other
+    assert time.monotonic() - started < 0.1
+    assert [r.tool_call_id for r in results] == ["1", "2", "3"]
+    assert [r.content for r in results] == ["slept 0.05", "slept 0.01", TOOL_NOT_FOUND]
+
+
+def test_arun_tool_calls_times_out_slow_calls():
+    tools = {"asleep": asleep}
+    calls = [call("asleep", 1, "1"), call("asleep", 0.01, "2")]
+    started = time.monotonic()
+    results = asyncio.run(arun_tool_calls(tools, calls, timeout=0.1))
+    assert time.monotonic() - started < 0.5
+    assert results[0].content.startswith("Tool timed out")
+    assert results[1].content == "slept 0.01"
+
+
+def test_arun_tool_calls_timeout_excludes_the_scheduler_queue():
+    # Two requests a second, none left
+    scheduler = Scheduler({"local": (120, None)})
+    scheduler.lane("local", "asleep")
+    scheduler.buckets["local requests"].level = 0
+    calls = [call("asleep", 0.05, "1")]
+    started = time.monotonic()
+    results = asyncio.run(
+        arun_tool_calls({"asleep": asleep}, calls, timeout=0.2, scheduler=scheduler)
+    )
+    assert time.monotonic() - started > 0.3
+    assert results[0].content == "slept 0.05"
+
+
+def test_run_tool_calls_times_each_call_from_its_submission():
+    tools = {"sleep": sleep}
+    calls = [call("sleep", 0.3, "1"), call("sleep", 0.6, "2")]
+    started = time.monotonic()
+    results = run_tool_calls(tools, calls, timeout=0.4)
+    assert time.monotonic() - started < 0.55
+    assert results[0].content == "slept 0.3"
+    assert results[1].content.startswith("Tool timed out")
+
+
+def test_unanswered_tool_calls_get_error_results():
+    calls = [call("sleep", 0, "1"), call("sleep", 0, "2")]
+    messages = [
+        HumanMessage(content="hi"),
+        AIMessage(content="", tool_calls=calls),
+        ToolMessage(tool_call_id="1", content="slept 0"),
+    ]
+    missing = missing_tool_results(messages)
+    assert [(m.tool_call_id, m.status) for m in missing] == [("2", "error")]
+    answered = answer_tool_calls(messages + [HumanMessage(content="again")])
+    assert [getattr(m, "tool_call_id", None) for m in answered] == [
+        None,
+        None,
+        "1",
+        "2",
+        None,
+    ]
+    complete = messages + missing
+    assert answer_tool_calls(complete) is complete
+    assert missing_tool_results(complete) == []
+
+
+@tool
+def lookup(city: str) -> dict:
+    """Look a city up"""
+    return dict(city=city, population=2_100_000, history="x" * 1000)
+
+
+def test_tool_results_are_projected_before_entering_history(monkeypatch):
+    # Registered for this test only; monkeypatch removes it afterwards.
+    monkeypatch.setitem(TOOL_PROJECTIONS, "lookup", None)
+
+    @tool_projection("lookup")
+    def project_lookup(result: dict) -> dict:
+        return dict(city=result["city"], population=result["population"])
+
+    calls = [dict(name="lookup", args=dict(city="Zürich"), id="1")]
+    (result,) = run_tool_calls(dict(lookup=lookup), calls)
+    (aresult,) = asyncio.run(arun_tool_calls(dict(lookup=lookup), calls))
+    # Compact JSON, non-ASCII kept as is
+    assert result.content == '{"city":"Zürich","population":2100000}'
+    assert aresult.content == result.content
+
+
+def test_unprojected_results_are_serialized_compactly():
+    assert serialize_tool_result("echo", "as is") == "as is"
+    assert serialize_tool_result("echo", dict(on=date(2024, 8, 1), n=[1, 2])) == (
+        '{"on":"2024-08-01","n":[1,2]}'
+    )
+
+
+def test_weather_predictions_keep_what_a_prediction_needs():
+    projected = project_weather_prediction(mock_weather("Paris,,fr"))
+    assert set(projected) == {
+        "city",
+        "country",
+        "temperature_kelvin",
+        "humidity",
+        "description",
+        "icon",
+    }
+    assert projected["city"] == "Paris"
+    assert projected["country"] == "FR"
+    serialized = serialize_tool_result("weather_prediction", mock_weather("Paris"))
+    assert json.loads(serialized) == project_weather_prediction(mock_weather("Paris"))
+
+
+def test_weather_errors_are_projected_to_their_message():
+    assert project_weather_prediction(mock_weather("Atlantis")) == dict(
+        error="city not found"
+    )
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import asyncio
+
+import pytest
+
+from agentic_webapp.coalesce import StreamCoalescer
+from agentic_webapp.dmbr import tracing
+from agentic_webapp.dmbr.tracing import InMemoryExporter, Tracer, trace_context
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    monkeypatch.setenv("TRACE_EXPORTER", "memory")
+    tracing.get_tracer.cache_clear()
+    yield tracing.get_tracer().exporter
+    tracing.get_tracer.cache_clear()
+
+
+def test_spans_nest_under_the_current_one():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter)
+    with tracer.span("request", route="/chatstream") as request:
+        with tracer.span("llm") as llm:
+            llm.set("tokens", 3)
+    assert [s.name for s in exporter.spans] == ["llm", "request"]
+    assert llm.trace_id == request.trace_id
+    assert llm.parent_id == request.span_id
+    assert exporter.find("request")[0].attributes == {"route": "/chatstream"}
+    assert request.duration_ms >= llm.duration_ms
+    exporter.clear()
+    assert exporter.spans == []
+
+
+def test_failed_spans_record_the_error():
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter)
+    with pytest.raises(RuntimeError):
+        with tracer.span("tool"):
+            raise RuntimeError("down")
+    assert "down" in exporter.find("tool")[0].error
+
+
+def test_disabled_tracer_creates_no_spans():
+    with Tracer().span("request") as span:
+        assert span is None
+
+
+def test_trace_context_continues_traceparent():
+    trace_id, parent_id = "ab" * 16, "cd" * 8
+    headers = {"traceparent": f"00-{trace_id}-{parent_id}-01"}
+    assert trace_context(headers) == (trace_id, parent_id)
+    assert trace_context({})[1] is None
+
+
+def test_traced_stream_records_frames(exporter):
+    async def frames():
+        yield b"abc"
+        yield b"de"
+
+    async def main():
+        stream = tracing.traced_stream("chatstream", frames(), "ab" * 16)
+        return [frame async for frame in stream]
+
+    assert asyncio.run(main()) == [b"abc", b"de"]
+    span = exporter.find("chatstream")[0]
+    assert span.attributes["sse.chunks"] == 2
+    assert span.attributes["sse.bytes"] == 5
+    assert "sse.ttfb_ms" in span.attributes
+
+
+def test_coalesced_followers_are_flagged(exporter):
+    coalescer = StreamCoalescer()
+
+    def frames():
+        async def generate():
+            await asyncio.sleep(0.02)
+            yield b"frame"
+
+        return generate()
+
+    async def request():
+        stream = coalescer.stream("k", frames)
+        return [f async for f in tracing.traced_stream("chatstream", stream, "ab" * 16)]
+
+    async def main():
+        await asyncio.gather(request(), request())
+
+    asyncio.run(main())
+    flags = [s.attributes.get("coalesced") for s in exporter.find("chatstream")]
+    assert sorted(flags, key=bool) == [None, True]
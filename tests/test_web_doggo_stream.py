@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+
+from starlette.testclient import TestClient
+
+from agentic_webapp.mock_dog_ceo import BREEDS
+from agentic_webapp.web_doggo_stream import app
+
+
+def test_dogstream_offline(monkeypatch):
+    monkeypatch.setenv("DOG_CEO_MOCK", "1")
+    monkeypatch.setenv("DOG_CEO_MOCK_LATENCY", "0")
+    with TestClient(app) as client:
+        body = client.get("/dogstream").text
+    assert body.count("event: DogBreed\n") == len(BREEDS)
+    assert "No more doggo senior" in body
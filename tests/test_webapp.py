@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import asyncio
+import warnings
+
+from fasthtml.common import to_xml
+
+from agentic_webapp import webapp
+from agentic_webapp.dmbr.supervisor import delegate_result
+from agentic_webapp.dmbr.weather_team import MultiLocationWeatherPrediction
+from agentic_webapp.webapp import (
+    PREDICTIONS_KEY,
+    answered_cities,
+    weather_cards,
+    weather_chat,
+)
+
+
+def predictions() -> MultiLocationWeatherPrediction:
+    prediction = dict(
+        humidity=40, temperature=21.5, description="clear sky", icon_url="i.png"
+    )
+    return MultiLocationWeatherPrediction(
+        predictions_list=[
+            dict(city="Paris", country="FR", predictions=[prediction]),
+            dict(city="Oslo", predictions=[prediction]),
+        ]
+    )
+
+
+def test_cities_are_named_once_complete():
+    partial = '{"%s":[{"city":"Paris","country":"F' % PREDICTIONS_KEY
+    assert answered_cities(partial[: partial.index("is")]) == []
+    # Nothing follows the city yet, so it may still be cut short.
+    assert answered_cities(partial[: partial.index(",")]) == []
+    assert answered_cities(partial) == ["Paris"]
+
+
+def test_a_rejected_answer_is_named_again_from_the_start(monkeypatch):
+    async def astream_tokens(message, thread_id=None, config=None):
+        yield "answer", '{"%s":[{"city":"Paris","country":"FR"},' % PREDICTIONS_KEY
+        yield "answer", '{"city":"Rome","country":"IT"}'
+        # Rejected: the model answers again.
+        yield "update", {"respond": {"messages": []}}
+        yield "answer", '{"%s":[{"city":"Oslo","country":"NO"}' % PREDICTIONS_KEY
+
+    monkeypatch.setattr(webapp.weather_predict, "astream_tokens", astream_tokens)
+
+    async def tokens():
+        return [
+            event
+            async for kind, event in weather_chat("weather?", "t", use_cache=False)
+            if kind == "Token"
+        ]
+
+    assert asyncio.run(tokens()) == ["Predicting Paris", ", Rome", "Predicting Oslo"]
+
+
+def test_typed_answers_round_trip_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        answer = delegate_result(dict(output=predictions(), messages=[]))
+    assert MultiLocationWeatherPrediction.model_validate_json(answer) == predictions()
+
+
+def test_weather_cards_render_one_card_per_location():
+    html = to_xml(weather_cards(predictions()))
+    assert html.count("<article>") == 2
+    assert "<b>Paris</b>" in html
+    assert "clear sky, 21.5°, 40% humidity" in html